@@ -1,28 +1,142 @@
 import streamlit as st
 import requests
 import json
-from datetime import datetime, time, timezone
+from datetime import datetime, time, timezone, timedelta
 import base64
 import io
+import hashlib
+from time import monotonic, sleep
 from PIL import Image
 import calendar # NEW: For month and year selection
+from concurrent.futures import ThreadPoolExecutor
 
 # --- API Endpoints (REPLACE WITH YOUR ACTUAL API GATEWAY ENDPOINTS) ---
 # Existing Image Endpoints
 UPLOAD_IMAGE_API_URL = "https://l63kkw2lv5.execute-api.ap-southeast-2.amazonaws.com/prod/upload_image_lambda"
+UPLOAD_IMAGE_BATCH_API_URL = "YOUR_API_GATEWAY_URL/upload-image-batch" # upload_image_lambda.batch_lambda_handler
 GENERATE_CAPTION_API_URL = "https://r7frxw7h53.execute-api.ap-southeast-2.amazonaws.com/prod/generate_caption_lambda"  # For images
+GENERATE_CAPTION_STREAM_API_URL = "YOUR_LAMBDA_FUNCTION_URL/generate-caption-stream" # caption_stream_server.py (Function URL, RESPONSE_STREAM)
 
 # NEW Video Endpoints (assuming you might have separate Lambda for video upload)
 UPLOAD_VIDEO_API_URL = "YOUR_API_GATEWAY_URL/upload-video" # Make sure this points to your GCS-aware video upload lambda
 GENERATE_VIDEO_CAPTION_API_URL = "YOUR_API_GATEWAY_URL/generate-video-caption"
+VIDEO_CAPTION_JOBS_API_URL = "YOUR_API_GATEWAY_URL/video-caption-jobs" # video_caption_jobs_lambda: POST submits, GET ?job_id= polls
 
 # Common Scheduling and Listing Endpoints
 SCHEDULE_POST_API_URL = "https://dr0po98y5a.execute-api.ap-southeast-2.amazonaws.com/prod/schedule_post_lambda"
+SCHEDULE_POSTS_BULK_API_URL = "YOUR_API_GATEWAY_URL/schedule-posts-bulk" # schedule_post_lambda.bulk_lambda_handler
 GET_SCHEDULED_POSTS_API_URL = "https://u9m9l59p9k.execute-api.ap-southeast-2.amazonaws.com/prod/get_schedule_post_lambda"
+SCHEDULED_POSTS_PAGE_SIZE = 50 # Posts per request; 'Load More' fetches the next page
 
 # NEW: Calendar Generation Endpoint
 GENERATE_CALENDAR_API_URL = "YOUR_API_GATEWAY_URL/generate-calendar" # You'll define this later
 
+# Number of video parts pushed to S3 at the same time
+VIDEO_UPLOAD_CONCURRENCY = 4
+
+# Video caption job polling: start fast, back off to a relaxed interval, give up after the timeout
+VIDEO_JOB_POLL_INITIAL_SECONDS = 1.0
+VIDEO_JOB_POLL_MAX_SECONDS = 10.0
+VIDEO_JOB_POLL_TIMEOUT_SECONDS = 15 * 60
+
+# Keep each batch request under the 6 MB synchronous Lambda payload limit
+BATCH_UPLOAD_MAX_REQUEST_BYTES = 5 * 1024 * 1024
+
+
+def upload_images_in_batches(uploaded_files):
+    """Uploads many images with as few batch requests as the payload limit allows; returns per-file results."""
+    batches, current_batch, current_size = [], [], 0
+    for uploaded_file in uploaded_files:
+        image_data = base64.b64encode(uploaded_file.getvalue()).decode('utf-8')
+        if current_batch and current_size + len(image_data) > BATCH_UPLOAD_MAX_REQUEST_BYTES:
+            batches.append(current_batch)
+            current_batch, current_size = [], 0
+        current_batch.append({"image_data": image_data, "filename": uploaded_file.name})
+        current_size += len(image_data)
+    if current_batch:
+        batches.append(current_batch)
+
+    results = []
+    for batch in batches:
+        response = requests.post(UPLOAD_IMAGE_BATCH_API_URL, json={"files": batch})
+        if response.status_code in (200, 207):
+            results.extend(response.json().get('results', []))
+        else:
+            results.extend({'filename': f['filename'], 'status': 'error', 'message': response.text} for f in batch)
+    return results
+
+
+def run_video_caption_job(payload, on_update=None):
+    """Submits a video caption job and polls it with backoff until it finishes; returns the final job status."""
+    response = requests.post(VIDEO_CAPTION_JOBS_API_URL, json=payload, timeout=30)
+    response.raise_for_status()
+    job_id = response.json()['job_id']
+    delay = VIDEO_JOB_POLL_INITIAL_SECONDS
+    deadline = monotonic() + VIDEO_JOB_POLL_TIMEOUT_SECONDS
+    while True:
+        sleep(delay)
+        job = requests.get(VIDEO_CAPTION_JOBS_API_URL, params={'job_id': job_id}, timeout=30).json()
+        if on_update:
+            on_update(job)
+        if job.get('status') in ('succeeded', 'failed'):
+            return job
+        if monotonic() > deadline:
+            raise TimeoutError(f"Video caption job {job_id} still {job.get('stage')} after {VIDEO_JOB_POLL_TIMEOUT_SECONDS}s")
+        delay = min(delay * 1.5, VIDEO_JOB_POLL_MAX_SECONDS)
+
+
+def iter_caption_stream(payload):
+    """Yields (event_name, data) from the server-sent events stream of the caption stream endpoint."""
+    with requests.post(GENERATE_CAPTION_STREAM_API_URL, json=payload, stream=True, timeout=120) as response:
+        response.raise_for_status()
+        event_name = 'message'
+        for line in response.iter_lines(decode_unicode=True):
+            if line.startswith('event:'):
+                event_name = line[len('event:'):].strip()
+            elif line.startswith('data:'):
+                yield event_name, json.loads(line[len('data:'):].strip())
+                event_name = 'message'
+
+
+def upload_video_in_parts(file_name, video_bytes):
+    """Uploads a video straight to S3 via a presigned multipart session and returns its S3 URL."""
+    start_response = requests.post(UPLOAD_VIDEO_API_URL, json={
+        "action": "start_upload",
+        "file_name": file_name,
+        "file_size": len(video_bytes)
+    })
+    start_response.raise_for_status()
+    session = start_response.json()
+    part_size = session['part_size']
+
+    def put_part(part):
+        offset = (part['part_number'] - 1) * part_size
+        part_response = requests.put(part['url'], data=video_bytes[offset:offset + part_size])
+        part_response.raise_for_status()
+        return {'PartNumber': part['part_number'], 'ETag': part_response.headers['ETag']}
+
+    try:
+        with ThreadPoolExecutor(max_workers=VIDEO_UPLOAD_CONCURRENCY) as executor:
+            uploaded_parts = list(executor.map(put_part, session['parts']))
+    except Exception:
+        # Don't leave orphaned parts behind in the bucket
+        requests.post(UPLOAD_VIDEO_API_URL, json={
+            "action": "abort_upload",
+            "upload_id": session['upload_id'],
+            "s3_key": session['s3_key']
+        })
+        raise
+
+    complete_response = requests.post(UPLOAD_VIDEO_API_URL, json={
+        "action": "complete_upload",
+        "upload_id": session['upload_id'],
+        "s3_key": session['s3_key'],
+        "parts": uploaded_parts
+    })
+    complete_response.raise_for_status()
+    return complete_response.json().get('video_s3_url')
+
+
 st.set_page_config(layout="wide", page_title="AI Social Media Assistant")
 try:
     image = Image.open('logohog.jpg')
@@ -38,6 +152,10 @@ if 'uploaded_image_s3_url' not in st.session_state:
     st.session_state['uploaded_image_s3_url'] = None
 if 'uploaded_video_s3_url' not in st.session_state:
     st.session_state['uploaded_video_s3_url'] = None
+if 'uploaded_media_sha256' not in st.session_state:
+    st.session_state['uploaded_media_sha256'] = None
+if 'uploaded_image_renditions' not in st.session_state:
+    st.session_state['uploaded_image_renditions'] = {}
 if 'current_media_type' not in st.session_state:
     st.session_state['current_media_type'] = None
 if 'generated_captions' not in st.session_state:
@@ -48,6 +166,10 @@ if 'caption_style' not in st.session_state:
     st.session_state['caption_style'] = 'high_engagement'
 if 'generated_calendar' not in st.session_state: # NEW: To store generated calendar
     st.session_state['generated_calendar'] = None
+if 'scheduled_posts' not in st.session_state:
+    st.session_state['scheduled_posts'] = []
+if 'scheduled_posts_cursor' not in st.session_state:
+    st.session_state['scheduled_posts_cursor'] = None
 
 
 # --- Navigation ---
@@ -74,13 +196,20 @@ if page == "Post Scheduler":
 
             if st.button("Upload Image"):
                 with st.spinner("Uploading image..."):
-                    files = {'file': uploaded_image_file.getvalue()}
+                    payload = {
+                        "image_data": base64.b64encode(uploaded_image_file.getvalue()).decode('utf-8'),
+                        "filename": uploaded_image_file.name
+                    }
                     try:
-                        response = requests.post(UPLOAD_IMAGE_API_URL, files=files)
+                        response = requests.post(UPLOAD_IMAGE_API_URL, json=payload)
                         if response.status_code == 200:
-                            s3_url = response.json().get('image_s3_url')
+                            s3_url = response.json().get('s3_url')
                             st.session_state['uploaded_image_s3_url'] = s3_url
+                            st.session_state['uploaded_media_sha256'] = response.json().get('content_sha256')
+                            st.session_state['uploaded_image_renditions'] = response.json().get('renditions') or {}
                             st.session_state['current_media_type'] = 'image'
+                            if response.json().get('deduplicated'):
+                                st.info("This image was uploaded before; reusing the stored copy.")
                             st.success(f"Image uploaded! S3 URL: {s3_url}")
                             st.image(s3_url, caption="Uploaded Image", use_column_width=True)
                         else:
@@ -98,40 +227,57 @@ if page == "Post Scheduler":
             # Ensure only one type of media is active at a time
             if st.session_state['uploaded_image_s3_url']:
                 st.session_state['uploaded_image_s3_url'] = None
+                st.session_state['uploaded_media_sha256'] = None
+                st.session_state['uploaded_image_renditions'] = {}
                 st.session_state['current_media_type'] = None # Reset media type
 
             if st.button("Upload Video"):
                 with st.spinner("Uploading video..."):
                     try:
                         video_bytes = uploaded_video_file.getvalue()
-                        video_data_b64 = base64.b64encode(video_bytes).decode('utf-8')
-
-                        payload = {
-                            "video_data_b64": video_data_b64,
-                            "file_name": uploaded_video_file.name
-                        }
-                        headers = {"Content-Type": "application/json"}
-
-                        response = requests.post(UPLOAD_VIDEO_API_URL, json=payload, headers=headers)
-
-                        if response.status_code == 200:
-                            # Assuming your video upload lambda returns a GCS URL now
-                            gcs_url = response.json().get('video_gcs_url') # Changed key to reflect GCS
-                            st.session_state['uploaded_video_s3_url'] = gcs_url # Store in same variable, but it's GCS
+                        video_s3_url = upload_video_in_parts(uploaded_video_file.name, video_bytes)
+                        if video_s3_url:
+                            st.session_state['uploaded_video_s3_url'] = video_s3_url
+                            # Lets the caption lambda reuse its Gemini upload when we ask for another style
+                            st.session_state['uploaded_media_sha256'] = hashlib.sha256(video_bytes).hexdigest()
                             st.session_state['current_media_type'] = 'video'
-                            st.success(f"Video uploaded! GCS URL: {gcs_url}")
-                            st.video(gcs_url)
+                            st.success(f"Video uploaded! S3 URL: {video_s3_url}")
+                            st.video(video_s3_url)
                         else:
-                            st.error(f"Error uploading video: {response.text}")
+                            st.error("Error uploading video: no video_s3_url returned.")
                     except Exception as e:
                         st.error(f"Network error during video upload: {e}")
 
+    with st.expander("Batch upload campaign images"):
+        batch_image_files = st.file_uploader(
+            "Upload many images at once",
+            type=["png", "jpg", "jpeg", "gif"],
+            accept_multiple_files=True,
+            key="batch_image_uploader"
+        )
+        if batch_image_files and st.button(f"Upload {len(batch_image_files)} Images"):
+            with st.spinner("Uploading images..."):
+                try:
+                    batch_results = upload_images_in_batches(batch_image_files)
+                    failed = [r for r in batch_results if r.get('status') != 'success']
+                    if failed:
+                        st.warning(f"{len(failed)} of {len(batch_results)} images failed to upload.")
+                    else:
+                        st.success(f"All {len(batch_results)} images uploaded!")
+                    st.dataframe(
+                        [{'filename': r.get('filename'), 'status': r.get('status'),
+                          's3_url': r.get('s3_url'), 'message': r.get('message')} for r in batch_results]
+                    )
+                except Exception as e:
+                    st.error(f"Network error during batch upload: {e}")
+
     # --- Caption Generation Section ---
     st.header("2. Generate Social Media Captions")
 
     # Display uploaded media
     if st.session_state['current_media_type'] == 'image' and st.session_state['uploaded_image_s3_url']:
-        st.image(st.session_state['uploaded_image_s3_url'], caption="Currently Selected Image", use_column_width=True)
+        preview_url = st.session_state['uploaded_image_renditions'].get('feed_1080') or st.session_state['uploaded_image_s3_url']
+        st.image(preview_url, caption="Currently Selected Image", use_column_width=True)
     elif st.session_state['current_media_type'] == 'video' and st.session_state['uploaded_video_s3_url']:
         st.video(st.session_state['uploaded_video_s3_url'])
     else:
@@ -161,6 +307,33 @@ if page == "Post Scheduler":
         elif caption_style == 'A/B Test':
             num_variants = st.slider("Number of Caption Variants (for A/B Test):", 2, 5, 3)
 
+        compare_styles = []
+        if st.session_state['current_media_type'] == 'image':
+            compare_styles = st.multiselect(
+                "Compare side by side with (optional):",
+                [s for s in ('high_engagement', 'story_style', 'viral_potential', 'targeted', 'A/B Test')
+                 if s != caption_style],
+                key="compare_styles"
+            )
+
+        video_caption_mode = 'full'
+        if st.session_state['current_media_type'] == 'video':
+            video_caption_mode = st.radio(
+                "Video captioning mode:",
+                ('full', 'keyframes', 'segments'),
+                format_func=lambda mode: {'full': "Whole video (slower)", 'keyframes': "Sampled keyframes (faster)",
+                                          'segments': "Segment by segment (long videos)"}[mode],
+                horizontal=True,
+                key="video_caption_mode"
+            )
+
+        force_refresh = st.checkbox("Regenerate (ignore previously generated captions)", value=False,
+                                    key="force_refresh_captions")
+
+        stream_captions = False
+        if st.session_state['current_media_type'] == 'image' and not compare_styles:
+            stream_captions = st.checkbox("Show captions as they are written", value=False, key="stream_captions")
+
         if st.button("Generate Captions"):
             if st.session_state['current_media_type'] == 'image' and st.session_state['uploaded_image_s3_url']:
                 api_url_to_call = GENERATE_CAPTION_API_URL
@@ -168,8 +341,8 @@ if page == "Post Scheduler":
                 media_url_to_send = st.session_state['uploaded_image_s3_url']
             elif st.session_state['current_media_type'] == 'video' and st.session_state['uploaded_video_s3_url']:
                 api_url_to_call = GENERATE_VIDEO_CAPTION_API_URL
-                payload_media_key = "video_gcs_url" # Changed to reflect GCS for video
-                media_url_to_send = st.session_state['uploaded_video_s3_url'] # This holds the GCS URL now
+                payload_media_key = "video_s3_url"
+                media_url_to_send = st.session_state['uploaded_video_s3_url']
             else:
                 st.warning("Please upload an image or video first.")
                 st.stop()
@@ -186,42 +359,106 @@ if page == "Post Scheduler":
                 payload["business_goals"] = business_goals
             if caption_style == 'A/B Test':
                 payload["num_variants"] = num_variants
-
-            with st.spinner("Generating captions with AI..."):
+            if compare_styles:
+                payload["styles"] = [caption_style] + compare_styles # One call, all styles generated concurrently
+            if st.session_state['current_media_type'] == 'video':
+                payload["caption_mode"] = video_caption_mode
+            if force_refresh:
+                payload["force_refresh"] = True
+            if st.session_state['uploaded_media_sha256']:
+                payload["media_sha256"] = st.session_state['uploaded_media_sha256']
+            if st.session_state['current_media_type'] == 'image' and st.session_state['uploaded_image_renditions']:
+                payload["renditions"] = st.session_state['uploaded_image_renditions']
+
+            if stream_captions:
+                streamed_captions = []
+                stream_placeholder = st.empty()
                 try:
-                    response = requests.post(api_url_to_call, json=payload)
-                    if response.status_code == 200:
-                        st.session_state['generated_captions'] = response.json().get('captions', [])
+                    for event_name, data in iter_caption_stream(payload):
+                        if event_name == 'caption':
+                            streamed_captions.append(data)
+                            stream_placeholder.markdown("\n\n".join(f"**{i}.** {c['text']}"
+                                                                     for i, c in enumerate(streamed_captions, 1)))
+                        elif event_name == 'error':
+                            st.error(f"Error generating captions: {data.get('message')}")
+                    stream_placeholder.empty()
+                    st.session_state['generated_captions'] = streamed_captions
+                    if not streamed_captions:
+                        st.warning("AI generated no captions. Try a different style or prompt.")
+                    else:
+                        st.success("Captions generated!")
+                except Exception as e:
+                    st.error(f"Network error during caption generation: {e}")
+                    st.session_state['generated_captions'] = streamed_captions
+            elif st.session_state['current_media_type'] == 'video':
+                # Video captioning outlasts the API Gateway timeout: run it as a job and poll for the result
+                job_placeholder = st.empty()
+                try:
+                    job = run_video_caption_job(
+                        payload,
+                        on_update=lambda job: job_placeholder.info(f"Video caption job: {job.get('stage', 'queued')}...")
+                    )
+                    job_placeholder.empty()
+                    if job['status'] == 'succeeded':
+                        st.session_state['generated_captions'] = job['result'].get('captions', [])
                         if not st.session_state['generated_captions']:
                             st.warning("AI generated no captions. Try a different style or prompt.")
                         else:
                             st.success("Captions generated!")
                     else:
-                        st.error(f"Error generating captions: {response.text}")
+                        st.error(f"Error generating captions: {job.get('error')}")
                         st.session_state['generated_captions'] = []
                 except Exception as e:
-                    st.error(f"Network error during caption generation: {e}")
+                    job_placeholder.empty()
+                    st.error(f"Error during video caption generation: {e}")
                     st.session_state['generated_captions'] = []
+            else:
+                with st.spinner("Generating captions with AI..."):
+                    try:
+                        response = requests.post(api_url_to_call, json=payload)
+                        if response.status_code == 200:
+                            st.session_state['generated_captions'] = response.json().get('captions', [])
+                            for failed_style in response.json().get('failed_styles', []):
+                                message = response.json()['results_by_style'][failed_style].get('message')
+                                st.warning(f"No captions for style '{failed_style}': {message}")
+                            if not st.session_state['generated_captions']:
+                                st.warning("AI generated no captions. Try a different style or prompt.")
+                            elif response.json().get('cache', {}).get('hit'):
+                                st.success("Captions loaded from cache! Tick 'Regenerate' for fresh ones.")
+                            else:
+                                st.success("Captions generated!")
+                        else:
+                            st.error(f"Error generating captions: {response.text}")
+                            st.session_state['generated_captions'] = []
+                    except Exception as e:
+                        st.error(f"Network error during caption generation: {e}")
+                        st.session_state['generated_captions'] = []
 
         # Display generated captions for selection and editing
         if st.session_state['generated_captions']:
             st.subheader("Generated Captions:")
-            caption_options = [
-                f"Engagement Score: {c['engagement_score']} - {c['text']}" if c.get('engagement_score') else c['text'] for c
-                in st.session_state['generated_captions']]
+            generated_captions = st.session_state['generated_captions']
 
-            selected_caption_display = st.radio(
+            def format_caption_option(index):
+                c = generated_captions[index]
+                label = f"Engagement Score: {c['engagement_score']} - {c['text']}" if c.get('engagement_score') else c['text']
+                return f"[{c['style']}] {label}" if c.get('style') else label # Grouped by style in multi-style mode
+
+            selected_caption_index = st.radio(
                 "Choose a caption for your post:",
-                caption_options,
+                range(len(generated_captions)),
+                format_func=format_caption_option,
                 key="selected_caption_radio"
             )
 
-            initial_caption_for_editing = ""
-            for c in st.session_state['generated_captions']:
-                if (f"Engagement Score: {c['engagement_score']} - {c['text']}" == selected_caption_display or
-                        c['text'] == selected_caption_display):
-                    initial_caption_for_editing = c['text']
-                    break
+            selected_caption = generated_captions[selected_caption_index]
+            # Structured (JSON) captions carry their strategy notes separately from the caption text
+            for field, label in (('strategy', 'Strategy'), ('target_appeal', 'Target Appeal'),
+                                 ('business_impact', 'Business Impact')):
+                if selected_caption.get(field):
+                    st.caption(f"{label}: {selected_caption[field]}")
+
+            initial_caption_for_editing = selected_caption['text']
 
             st.session_state['selected_caption_text'] = initial_caption_for_editing
 
@@ -248,15 +485,16 @@ if page == "Post Scheduler":
             media_url_to_schedule = st.session_state['uploaded_image_s3_url']
             media_type_to_schedule = 'image'
         elif st.session_state['current_media_type'] == 'video' and st.session_state['uploaded_video_s3_url']:
-            media_url_to_schedule = st.session_state['uploaded_video_s3_url'] # This holds GCS URL
+            media_url_to_schedule = st.session_state['uploaded_video_s3_url']
             media_type_to_schedule = 'video'
         else:
             st.warning("Please upload an image or video and select a caption first.")
             st.stop()
 
-        platform = st.selectbox(
-            "Choose Platform:",
+        platforms = st.multiselect(
+            "Choose Platform(s):",
             ('Instagram', 'Facebook'),
+            default=['Instagram'],
             key="platform_select"
         )
 
@@ -265,26 +503,55 @@ if page == "Post Scheduler":
             scheduled_date = st.date_input("Schedule Date:", datetime.now().date(), key="schedule_date")
         with col_time:
             scheduled_time = st.time_input("Schedule Time (UTC):", time(10, 0), key="schedule_time")
+        repeat_weeks = st.number_input("Repeat weekly for (weeks):", min_value=1, max_value=52, value=1,
+                                       key="schedule_repeat_weeks")
 
         if st.button("Schedule Post"):
+            if not platforms:
+                st.warning("Choose at least one platform.")
+                st.stop()
             try:
-                scheduled_datetime_utc = datetime.combine(scheduled_date, scheduled_time, tzinfo=timezone.utc).isoformat()
-
-                schedule_payload = {
-                    "media_url": media_url_to_schedule,  # Generic media URL (S3 for image, GCS for video)
-                    "media_type": media_type_to_schedule,  # Type of media
-                    "caption": st.session_state['selected_caption_text'],
-                    "platform": platform,
-                    "scheduled_time_utc": scheduled_datetime_utc,
-                    "user_id": "demo_user_123"
-                }
-
-                with st.spinner("Scheduling post..."):
-                    response = requests.post(SCHEDULE_POST_API_URL, json=schedule_payload)
-                    if response.status_code == 200:
-                        st.success("Post scheduled successfully!")
+                first_post_time = datetime.combine(scheduled_date, scheduled_time, tzinfo=timezone.utc)
+
+                schedule_payloads = []
+                for week in range(int(repeat_weeks)):
+                    for platform in platforms:
+                        schedule_payload = {
+                            "media_s3_url": media_url_to_schedule,  # Generic media URL (image or video in S3)
+                            "media_type": media_type_to_schedule,  # Type of media
+                            "caption": st.session_state['selected_caption_text'],
+                            "platform": platform,
+                            "scheduled_time_utc": (first_post_time + timedelta(weeks=week)).isoformat(),
+                            "user_id": "demo_user_123"
+                        }
+                        if media_type_to_schedule == 'image' and st.session_state['uploaded_media_sha256']:
+                            schedule_payload["media_sha256"] = st.session_state['uploaded_media_sha256']
+                        if media_type_to_schedule == 'image' and st.session_state['uploaded_image_renditions']:
+                            schedule_payload["renditions"] = st.session_state['uploaded_image_renditions']
+                        schedule_payloads.append(schedule_payload)
+
+                with st.spinner(f"Scheduling {len(schedule_payloads)} post(s)..."):
+                    if len(schedule_payloads) == 1:
+                        response = requests.post(SCHEDULE_POST_API_URL, json=schedule_payloads[0])
+                        if response.status_code == 200 and response.json().get('replayed'):
+                            st.info("This post was already scheduled; nothing new was created.")
+                        elif response.status_code == 200:
+                            st.success("Post scheduled successfully!")
+                        else:
+                            st.error(f"Error scheduling post: {response.text}")
                     else:
-                        st.error(f"Error scheduling post: {response.text}")
+                        # One request for every platform/week instead of one round trip per post
+                        response = requests.post(SCHEDULE_POSTS_BULK_API_URL, json={"posts": schedule_payloads})
+                        if response.status_code == 200:
+                            replayed = sum(1 for r in response.json().get('results', []) if r.get('replayed'))
+                            st.success(f"All {len(schedule_payloads)} posts scheduled successfully!"
+                                       + (f" ({replayed} were already scheduled.)" if replayed else ""))
+                        elif response.status_code == 207:
+                            failed = [r for r in response.json().get('results', []) if r.get('status') != 'success']
+                            st.warning(f"{len(failed)} of {len(schedule_payloads)} posts could not be scheduled.")
+                            st.dataframe(failed)
+                        else:
+                            st.error(f"Error scheduling posts: {response.text}")
             except Exception as e:
                 st.error(f"Network error during scheduling: {e}")
 
@@ -296,21 +563,53 @@ if page == "Post Scheduler":
     # --- View Scheduled Posts Section ---
     st.header("4. View Scheduled Posts")
 
-    if st.button("Refresh Scheduled Posts"):
+    col_status, col_platform = st.columns(2)
+    with col_status:
+        status_filter = st.selectbox("Status:", ('All', 'pending', 'posted', 'failed', 'schedule_failed'),
+                                     key="posts_status_filter")
+    with col_platform:
+        platform_filter = st.selectbox("Platform:", ('All', 'Instagram', 'Facebook'), key="posts_platform_filter")
+    date_range = st.date_input("Scheduled between (optional):", value=(), key="posts_date_range")
+
+    def fetch_scheduled_posts(cursor=None):
+        """One page from the scheduled-posts API, appended to what is already shown."""
+        params = {'user_id': 'demo_user_123', 'limit': SCHEDULED_POSTS_PAGE_SIZE}
+        if status_filter != 'All':
+            params['status'] = status_filter
+        if platform_filter != 'All':
+            params['platform'] = platform_filter
+        if len(date_range) == 2:
+            params['from'] = datetime.combine(date_range[0], time(0, 0), tzinfo=timezone.utc).isoformat()
+            params['to'] = datetime.combine(date_range[1], time(23, 59, 59), tzinfo=timezone.utc).isoformat()
+        if cursor:
+            params['cursor'] = cursor
         with st.spinner("Fetching scheduled posts..."):
             try:
-                response = requests.get(GET_SCHEDULED_POSTS_API_URL, params={'user_id': 'demo_user_123'})
+                response = requests.get(GET_SCHEDULED_POSTS_API_URL, params=params)
                 if response.status_code == 200:
-                    scheduled_posts = response.json().get('posts', [])
-                    if scheduled_posts:
-                        st.dataframe(scheduled_posts)
-                    else:
-                        st.info("No scheduled posts found.")
+                    page_data = response.json()
+                    if not cursor:
+                        st.session_state['scheduled_posts'] = []
+                    st.session_state['scheduled_posts'].extend(page_data.get('posts', []))
+                    st.session_state['scheduled_posts_cursor'] = page_data.get('next_cursor')
                 else:
                     st.error(f"Error fetching scheduled posts: {response.text}")
             except Exception as e:
                 st.error(f"Network error during fetching scheduled posts: {e}")
 
+    if st.button("Refresh Scheduled Posts"):
+        fetch_scheduled_posts()
+    if st.session_state['scheduled_posts_cursor'] and st.button("Load More"):
+        fetch_scheduled_posts(st.session_state['scheduled_posts_cursor'])
+
+    if st.session_state['scheduled_posts']:
+        st.dataframe(
+            st.session_state['scheduled_posts'],
+            column_config={"thumbnail_url": st.column_config.ImageColumn("Preview")}
+        )
+    else:
+        st.info("No scheduled posts found.")
+
 elif page == "Content Calendar":
     st.title("📅 AI-Generated Content Calendar")
     st.write("Generate a monthly content plan based on your preferences using AI.")
@@ -0,0 +1,80 @@
+"""
+Throughput benchmark: N single-image uploads (one request each, as app.py did) vs one batch request.
+
+S3 is an in-process stand-in that sleeps S3_LATENCY_MS per call; each HTTP request from the app adds
+API_ROUNDTRIP_MS. Both are rough stand-ins for the real network, so compare the ratio, not absolutes.
+
+Usage: python benchmarks/bench_batch_upload.py [num_images ...]   (default: 30 100)
+"""
+import base64
+import io
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ.setdefault("S3_BUCKET_NAME", "benchmark-bucket")
+
+from PIL import Image  # noqa: E402
+from botocore.exceptions import ClientError  # noqa: E402
+import upload_image_lambda  # noqa: E402
+
+S3_LATENCY_MS = float(os.environ.get("S3_LATENCY_MS", 25))
+API_ROUNDTRIP_MS = float(os.environ.get("API_ROUNDTRIP_MS", 80))
+
+
+class SlowS3Client:
+    """Every call costs S3_LATENCY_MS; nothing is stored, so every upload is a cache miss."""
+
+    def head_object(self, **kwargs):
+        time.sleep(S3_LATENCY_MS / 1000)
+        raise ClientError({'Error': {'Code': '404'}}, 'HeadObject')
+
+    def put_object(self, **kwargs):
+        time.sleep(S3_LATENCY_MS / 1000)
+        return {}
+
+
+def make_images(count):
+    images = []
+    for i in range(count):
+        buffer = io.BytesIO()
+        Image.new('RGB', (1600, 1200), (i % 256, (i * 7) % 256, (i * 13) % 256)).save(buffer, format='JPEG')
+        images.append({'image_data': base64.b64encode(buffer.getvalue()).decode('ascii'), 'filename': f'img{i}.jpg'})
+    return images
+
+
+def run_single(images, renditions):
+    start = time.perf_counter()
+    for image in images:
+        time.sleep(API_ROUNDTRIP_MS / 1000)
+        event = {'body': json.dumps({**image, 'renditions': renditions})}
+        assert upload_image_lambda.lambda_handler(event, None)['statusCode'] == 200
+    return time.perf_counter() - start
+
+
+def run_batch(images, renditions):
+    start = time.perf_counter()
+    time.sleep(API_ROUNDTRIP_MS / 1000)
+    event = {'body': json.dumps({'files': [dict(image) for image in images], 'renditions': renditions})}
+    assert upload_image_lambda.batch_lambda_handler(event, None)['statusCode'] == 200
+    return time.perf_counter() - start
+
+
+def main(counts):
+    upload_image_lambda.s3_client = SlowS3Client()
+    print(f"workers={upload_image_lambda.UPLOAD_MAX_WORKERS} s3_latency={S3_LATENCY_MS}ms roundtrip={API_ROUNDTRIP_MS}ms")
+    print(f"{'images':>7} {'renditions':>10} {'single':>10} {'batch':>10} {'speedup':>8} {'batch img/s':>12}")
+    for count in counts:
+        images = make_images(count)
+        for renditions in (False, True):
+            single = run_single(images, renditions)
+            batch = run_batch(images, renditions)
+            print(f"{count:>7} {str(renditions):>10} {single:>9.2f}s {batch:>9.2f}s {single / batch:>7.1f}x "
+                  f"{count / batch:>12.1f}")
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [30, 100])
@@ -0,0 +1,156 @@
+"""
+Throughput benchmark: scheduling N posts one request each (as app.py did) vs one bulk request.
+
+DynamoDB is moto's server; EventBridge Scheduler is a local stand-in below that answers CreateSchedule after
+SCHEDULER_LATENCY_MS and throttles (HTTP 429 ThrottlingException) above SCHEDULER_TPS, so botocore's adaptive
+retries are exercised for real. Each app -> API Gateway request adds API_ROUNDTRIP_MS. All three are rough
+stand-ins for the real network, so compare the ratio, not absolutes.
+
+Requires: pip install "moto[server]"
+Usage: python benchmarks/bench_bulk_schedule.py [num_posts ...]   (default: 50 300)
+"""
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SCHEDULER_LATENCY_MS = float(os.environ.get("SCHEDULER_LATENCY_MS", 40))
+SCHEDULER_TPS = float(os.environ.get("SCHEDULER_TPS", 50))
+API_ROUNDTRIP_MS = float(os.environ.get("API_ROUNDTRIP_MS", 80))
+TABLE_NAME = 'BenchScheduledSocialPosts'
+
+
+class FakeSchedulerHandler(BaseHTTPRequestHandler):
+    """CreateSchedule only: POST /schedules/{Name}. Token bucket of SCHEDULER_TPS, burst of one second's worth."""
+    protocol_version = 'HTTP/1.1'
+    lock = threading.Lock()
+    tokens = SCHEDULER_TPS
+    refilled_at = time.monotonic()
+    created = set()
+    throttled = 0
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, payload, error_type=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        if error_type:
+            self.send_header('x-amzn-ErrorType', error_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _take_token(self):
+        cls = FakeSchedulerHandler
+        with cls.lock:
+            now = time.monotonic()
+            cls.tokens = min(SCHEDULER_TPS, cls.tokens + (now - cls.refilled_at) * SCHEDULER_TPS)
+            cls.refilled_at = now
+            if cls.tokens < 1:
+                cls.throttled += 1
+                return False
+            cls.tokens -= 1
+            return True
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        name = self.path.rsplit('/', 1)[-1]
+        time.sleep(SCHEDULER_LATENCY_MS / 1000)
+        if not self._take_token():
+            return self._reply(429, {'Message': 'Rate exceeded'}, 'ThrottlingException')
+        with FakeSchedulerHandler.lock:
+            if name in FakeSchedulerHandler.created:
+                return self._reply(409, {'Message': f'Schedule {name} already exists.'}, 'ConflictException')
+            FakeSchedulerHandler.created.add(name)
+        self._reply(200, {'ScheduleArn': f'arn:aws:scheduler:us-east-1:123456789012:schedule/default/{name}'})
+
+
+def start_stand_ins():
+    from moto.server import ThreadedMotoServer
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    moto_server = ThreadedMotoServer(port=0, verbose=False)
+    moto_server.start()
+    host, port = moto_server.get_host_and_port()
+    scheduler_server = ThreadingHTTPServer(('127.0.0.1', 0), FakeSchedulerHandler)
+    scheduler_server.daemon_threads = True
+    threading.Thread(target=scheduler_server.serve_forever, daemon=True).start()
+    os.environ.update({
+        'AWS_ENDPOINT_URL_DYNAMODB': f'http://{host}:{port}',
+        'AWS_ENDPOINT_URL_SCHEDULER': f'http://127.0.0.1:{scheduler_server.server_address[1]}',
+        'AWS_ACCESS_KEY_ID': 'bench', 'AWS_SECRET_ACCESS_KEY': 'bench', 'AWS_DEFAULT_REGION': 'us-east-1',
+        'DYNAMODB_TABLE_NAME': TABLE_NAME,
+        'SOCIAL_MEDIA_POSTER_LAMBDA_ARN': 'arn:aws:lambda:us-east-1:123456789012:function:poster',
+        'EVENTBRIDGE_SCHEDULE_ROLE_ARN': 'arn:aws:iam::123456789012:role/scheduler',
+    })
+    return moto_server, scheduler_server
+
+
+def make_posts(count):
+    start = datetime.now(timezone.utc) + timedelta(days=1)
+    return [{
+        'media_s3_url': f'https://bench-bucket.s3.amazonaws.com/uploads/{index:04d}.jpg',
+        'caption': f'Benchmark post {index}',
+        'platform': ('Instagram', 'Facebook')[index % 2],
+        'scheduled_time_utc': (start + timedelta(hours=index)).isoformat(),
+        'user_id': 'bench_user'
+    } for index in range(count)]
+
+
+def run_sequential(schedule_post_lambda, posts):
+    for post in posts:
+        time.sleep(API_ROUNDTRIP_MS / 1000)
+        response = schedule_post_lambda.lambda_handler({'body': json.dumps(post)}, None)
+        assert response['statusCode'] == 200, response['body']
+    return 0
+
+
+def run_bulk(schedule_post_lambda, posts):
+    time.sleep(API_ROUNDTRIP_MS / 1000)
+    response = schedule_post_lambda.bulk_lambda_handler({'body': json.dumps({'posts': posts})}, None)
+    body = json.loads(response['body'])
+    assert body['failed_count'] == 0, body['message']
+    return body['total_retries']
+
+
+def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or [50, 300]
+    moto_server, scheduler_server = start_stand_ins()
+
+    import boto3
+    boto3.client('dynamodb').create_table(
+        TableName=TABLE_NAME,
+        KeySchema=[{'AttributeName': 'post_id', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[{'AttributeName': 'post_id', 'AttributeType': 'S'}],
+        BillingMode='PAY_PER_REQUEST'
+    )
+    import schedule_post_lambda
+
+    print(f"Scheduler {SCHEDULER_LATENCY_MS:.0f} ms/call, throttled above {SCHEDULER_TPS:.0f} TPS; "
+          f"API round trip {API_ROUNDTRIP_MS:.0f} ms; {schedule_post_lambda.SCHEDULE_MAX_WORKERS} bulk workers")
+    print(f"{'posts':>6}  {'mode':<12}{'seconds':>9}{'posts/s':>9}{'retries':>9}{'throttled':>11}")
+    try:
+        for count in counts:
+            for mode, run in (('sequential', run_sequential), ('bulk', run_bulk)):
+                FakeSchedulerHandler.throttled = 0
+                started = time.perf_counter()
+                retries = run(schedule_post_lambda, make_posts(count))
+                elapsed = time.perf_counter() - started
+                print(f"{count:>6}  {mode:<12}{elapsed:>9.2f}{count / elapsed:>9.1f}{retries:>9}"
+                      f"{FakeSchedulerHandler.throttled:>11}")
+        stored = boto3.client('dynamodb').scan(TableName=TABLE_NAME, Select='COUNT')['Count']
+        print(f"\n{stored} posts stored, {len(FakeSchedulerHandler.created)} schedules created")
+    finally:
+        scheduler_server.shutdown()
+        moto_server.stop()
+
+
+if __name__ == '__main__':
+    main()
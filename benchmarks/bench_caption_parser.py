@@ -0,0 +1,69 @@
+"""
+Speed and accuracy of the two caption parsers on recorded Gemini responses.
+
+Each record in data/caption_responses.jsonl holds the same captions twice: as a free-text reply to the
+original "Caption 1: ..." prompts and as a schema-constrained JSON reply. A record counts as parsed correctly
+when the parser returns exactly the expected captions (text and engagement score, whitespace-normalized).
+
+Usage: python benchmarks/bench_caption_parser.py [ITERATIONS]
+"""
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from caption_schema import parse_structured_captions  # noqa: E402
+from generate_caption_lambda import _parse_captions  # noqa: E402
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'caption_responses.jsonl')
+
+
+def load_corpus():
+    with open(CORPUS_PATH, encoding='utf-8') as corpus_file:
+        return [json.loads(line) for line in corpus_file if line.strip()]
+
+
+def normalized(captions):
+    return [(' '.join(c['text'].split()), c.get('engagement_score')) for c in captions]
+
+
+def matches(parsed, expected):
+    return normalized(parsed) == normalized(expected)
+
+
+def time_parser(parse, responses, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for response in responses:
+            parse(response)
+    return (time.perf_counter() - start) / (iterations * len(responses)) * 1e6
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    corpus = load_corpus()
+    parsers = [
+        ('text heuristics', _parse_captions, 'text_response'),
+        ('structured JSON', parse_structured_captions, 'json_response'),
+    ]
+
+    print(f"{'case':<34}" + ''.join(f"{name:>18}" for name, _, _ in parsers))
+    correct = {name: 0 for name, _, _ in parsers}
+    for record in corpus:
+        row = f"{record['id']:<34}"
+        for name, parse, field in parsers:
+            ok = matches(parse(record[field]), record['expected'])
+            correct[name] += ok
+            row += f"{'ok' if ok else 'WRONG SPLIT':>18}"
+        print(row)
+
+    print()
+    for name, parse, field in parsers:
+        per_response_us = time_parser(parse, [record[field] for record in corpus], iterations)
+        print(f"{name:<18} accuracy {correct[name]}/{len(corpus)}  {per_response_us:8.1f} us/response")
+
+
+if __name__ == '__main__':
+    main()
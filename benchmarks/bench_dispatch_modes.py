@@ -0,0 +1,130 @@
+"""
+Per-post EventBridge schedules vs the bucketed sweeper, for N posts that all fall due within the lookback window.
+
+per_post: the bulk endpoint creates one schedule per post (the Scheduler stand-in from bench_bulk_schedule, with its
+latency and TPS throttle), and each schedule is a resource left in the account until it fires and is cleaned up.
+bucketed: the bulk endpoint only writes items; one dispatch_sweeper_lambda run then queries the due buckets and
+sends one async invoke per post to a Lambda stand-in (LAMBDA_INVOKE_LATENCY_MS per call).
+
+DynamoDB is moto's server, so absolute numbers mostly measure moto; compare the shape, not the seconds.
+Requires: pip install "moto[server]"
+Usage: python benchmarks/bench_dispatch_modes.py [num_posts]   (default: 1000)
+"""
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_bulk_schedule import FakeSchedulerHandler, TABLE_NAME, start_stand_ins  # noqa: E402
+
+LAMBDA_INVOKE_LATENCY_MS = float(os.environ.get("LAMBDA_INVOKE_LATENCY_MS", 20))
+
+
+class FakeLambdaHandler(BaseHTTPRequestHandler):
+    """Invoke only: POST /2015-03-31/functions/{name}/invocations, answered 202 like an Event invoke."""
+    protocol_version = 'HTTP/1.1'
+    lock = threading.Lock()
+    invoked = []
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+        time.sleep(LAMBDA_INVOKE_LATENCY_MS / 1000)
+        with FakeLambdaHandler.lock:
+            FakeLambdaHandler.invoked.append(payload['post_id'])
+        self.send_response(202)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+
+class FakeContext:
+    def get_remaining_time_in_millis(self):
+        return 60000
+
+
+def make_due_posts(count):
+    """Posts spread over the last ten minutes, so every one of them is due for the sweeper."""
+    start = datetime.now(timezone.utc) - timedelta(minutes=10)
+    return [{
+        'media_s3_url': f'https://bench-bucket.s3.amazonaws.com/uploads/{index:05d}.jpg',
+        'caption': f'Benchmark post {index}',
+        'platform': ('Instagram', 'Facebook')[index % 2],
+        'scheduled_time_utc': (start + timedelta(seconds=index * 540 / count)).isoformat(),
+        'user_id': 'bench_user'
+    } for index in range(count)]
+
+
+def bulk_schedule(schedule_post_lambda, posts):
+    started = time.perf_counter()
+    response = schedule_post_lambda.bulk_lambda_handler({'body': json.dumps({'posts': posts})}, None)
+    body = json.loads(response['body'])
+    assert body['failed_count'] == 0, body['message']
+    return time.perf_counter() - started
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    moto_server, scheduler_server = start_stand_ins()
+    lambda_server = ThreadingHTTPServer(('127.0.0.1', 0), FakeLambdaHandler)
+    lambda_server.daemon_threads = True
+    threading.Thread(target=lambda_server.serve_forever, daemon=True).start()
+    os.environ['AWS_ENDPOINT_URL_LAMBDA'] = f'http://127.0.0.1:{lambda_server.server_address[1]}'
+    os.environ['MAX_BULK_POSTS'] = str(count)
+
+    import boto3
+    from post_dispatch import DISPATCH_BUCKET_INDEX_NAME
+    boto3.client('dynamodb').create_table(
+        TableName=TABLE_NAME,
+        KeySchema=[{'AttributeName': 'post_id', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[{'AttributeName': name, 'AttributeType': 'S'}
+                              for name in ('post_id', 'dispatch_bucket', 'dispatch_at')],
+        GlobalSecondaryIndexes=[{
+            'IndexName': DISPATCH_BUCKET_INDEX_NAME,
+            'KeySchema': [{'AttributeName': 'dispatch_bucket', 'KeyType': 'HASH'},
+                          {'AttributeName': 'dispatch_at', 'KeyType': 'RANGE'}],
+            'Projection': {'ProjectionType': 'KEYS_ONLY'}
+        }],
+        BillingMode='PAY_PER_REQUEST'
+    )
+    import schedule_post_lambda
+    import dispatch_sweeper_lambda
+
+    try:
+        print(f"{count} posts; Scheduler stand-in {os.environ.get('SCHEDULER_LATENCY_MS', '40')} ms/call, "
+              f"invoke stand-in {LAMBDA_INVOKE_LATENCY_MS:.0f} ms/call\n")
+
+        schedule_post_lambda.DISPATCH_MODE = 'per_post'
+        per_post_seconds = bulk_schedule(schedule_post_lambda, make_due_posts(count))
+        print(f"per_post  schedule: {per_post_seconds:7.2f} s, {len(FakeSchedulerHandler.created)} schedules "
+              f"created ({FakeSchedulerHandler.throttled} throttled)")
+
+        schedule_post_lambda.DISPATCH_MODE = 'bucketed'
+        bucketed_seconds = bulk_schedule(schedule_post_lambda, make_due_posts(count))
+        print(f"bucketed  schedule: {bucketed_seconds:7.2f} s, 0 schedules created")
+
+        started = time.perf_counter()
+        result = json.loads(dispatch_sweeper_lambda.lambda_handler({}, FakeContext())['body'])
+        sweep_seconds = time.perf_counter() - started
+        print(f"bucketed  sweep:    {sweep_seconds:7.2f} s, {result} "
+              f"({result['dispatched'] / sweep_seconds:.0f} posts/s)")
+
+        started = time.perf_counter()
+        result = json.loads(dispatch_sweeper_lambda.lambda_handler({}, FakeContext())['body'])
+        print(f"bucketed  re-sweep: {time.perf_counter() - started:7.2f} s, {result}")
+        assert len(set(FakeLambdaHandler.invoked)) == len(FakeLambdaHandler.invoked) == count
+    finally:
+        lambda_server.shutdown()
+        scheduler_server.shutdown()
+        moto_server.stop()
+
+
+if __name__ == '__main__':
+    main()
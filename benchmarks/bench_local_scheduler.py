@@ -0,0 +1,112 @@
+"""
+Firing accuracy and throughput of local_scheduler.LocalScheduler with 100k pending posts.
+
+1. steady: NUM_POSTS schedules spread evenly over WINDOW_SECONDS, starting LEAD_SECONDS out; the engine is closed
+   and reopened from its journal before any fire (a restart), then lateness (fired at - due) is measured per post.
+2. burst: NUM_POSTS schedules that are all already due; measures how fast the worker pool drains them.
+
+The target stands in for the poster handler and sleeps TARGET_MS per post, so drain rate is about
+LOCAL_SCHEDULER_WORKERS / TARGET_MS once the pool is the bottleneck.
+Usage: python benchmarks/bench_local_scheduler.py [num_posts]   (default: 100000)
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from local_scheduler import LocalScheduler, LOCAL_SCHEDULER_WORKERS  # noqa: E402
+
+WINDOW_SECONDS = float(os.environ.get("WINDOW_SECONDS", 30))
+LEAD_SECONDS = float(os.environ.get("LEAD_SECONDS", 8))
+TARGET_MS = float(os.environ.get("TARGET_MS", 1))
+
+
+class RecordingTarget:
+    def __init__(self, due_by_post):
+        self.due_by_post = due_by_post
+        self.lateness = []
+
+    def __call__(self, payload):
+        fired_at = time.time()
+        time.sleep(TARGET_MS / 1000)
+        self.lateness.append(fired_at - self.due_by_post[payload['post_id']])
+
+
+def wait_until_fired(scheduler, count, target, timeout):
+    deadline = time.monotonic() + timeout
+    while len(target.lateness) < count and time.monotonic() < deadline:
+        time.sleep(0.05)
+    while scheduler.pending_count() and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+
+def percentiles(values):
+    ordered = sorted(values)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000  # noqa: E731
+    return f"p50 {pick(0.50):7.1f} ms  p99 {pick(0.99):7.1f} ms  max {ordered[-1] * 1000:7.1f} ms"
+
+
+def schedule_all(scheduler, due_by_post):
+    started = time.perf_counter()
+    for post_id, due in due_by_post.items():
+        scheduler.schedule(f"social-post-{post_id}", due, {'post_id': post_id})
+    return time.perf_counter() - started
+
+
+def run_steady(work_dir, count):
+    state_file = os.path.join(work_dir, 'steady.jsonl')
+    first_due = time.time() + LEAD_SECONDS
+    due_by_post = {f"post-{index}": first_due + index * WINDOW_SECONDS / count for index in range(count)}
+    target = RecordingTarget(due_by_post)
+
+    scheduler = LocalScheduler(target=target, state_file=state_file)
+    schedule_seconds = schedule_all(scheduler, due_by_post)
+    scheduler.close()
+    journal_mb = os.path.getsize(state_file) / 1e6
+
+    started = time.perf_counter()
+    scheduler = LocalScheduler(target=target, state_file=state_file)
+    reload_seconds = time.perf_counter() - started
+    restored = scheduler.pending_count()
+    assert time.time() < first_due, "scheduling + restart ran past the first due time; raise LEAD_SECONDS"
+
+    wait_until_fired(scheduler, count, target, LEAD_SECONDS + WINDOW_SECONDS + 60)
+    scheduler.close()
+    print(f"steady  scheduled {count} in {schedule_seconds:.2f} s ({count / schedule_seconds:,.0f}/s), "
+          f"journal {journal_mb:.1f} MB")
+    print(f"        restart restored {restored} in {reload_seconds:.2f} s")
+    print(f"        fired {len(target.lateness)} over {WINDOW_SECONDS:.0f} s ({count / WINDOW_SECONDS:,.0f}/s due), "
+          f"lateness {percentiles(target.lateness)}")
+
+
+def run_burst(work_dir, count):
+    state_file = os.path.join(work_dir, 'burst.jsonl')
+    now = time.time()
+    due_by_post = {f"post-{index}": now - 1 for index in range(count)}
+    target = RecordingTarget(due_by_post)
+    scheduler = LocalScheduler(target=target, state_file=state_file)
+    started = time.perf_counter()
+    schedule_all(scheduler, due_by_post)
+    wait_until_fired(scheduler, count, target, 600)
+    elapsed = time.perf_counter() - started
+    scheduler.close()
+    print(f"burst   {len(target.lateness)} already-due posts fired in {elapsed:.2f} s "
+          f"({len(target.lateness) / elapsed:,.0f}/s)")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    work_dir = tempfile.mkdtemp(prefix='bench_local_scheduler_')
+    print(f"{count} posts, {LOCAL_SCHEDULER_WORKERS} workers, target {TARGET_MS:.1f} ms/post\n")
+    try:
+        run_steady(work_dir, count)
+        run_burst(work_dir, count)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Request bytes, latency and caption parity: original image vs pre-processed image sent to Gemini.
+
+Sample set: every .jpg/.jpeg/.png in SAMPLE_DIR, or (if unset) a fixed set of synthetic 12 MP
+"phone photos" with EXIF. With GEMINI_API_KEY set, real model calls are made and caption parity is
+reported as the token overlap (Jaccard) between captions for the two inputs. Without a key, upload
+time is modelled at UPLOAD_MBPS and parity is skipped.
+
+Usage: python benchmarks/bench_model_preprocess.py
+"""
+import glob
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image  # noqa: E402
+from image_processing import prepare_model_image, model_preprocess_signature  # noqa: E402
+
+SAMPLE_DIR = os.environ.get("SAMPLE_DIR")
+UPLOAD_MBPS = float(os.environ.get("UPLOAD_MBPS", 50))
+PARITY_PROMPT = "Write one short Instagram caption for this food photo. Reply with the caption only."
+
+
+def load_samples():
+    if SAMPLE_DIR:
+        paths = sorted(glob.glob(os.path.join(SAMPLE_DIR, '*.[jp][pn]g')) + glob.glob(os.path.join(SAMPLE_DIR, '*.jpeg')))
+        return [(os.path.basename(path), open(path, 'rb').read()) for path in paths]
+    samples = []
+    for i in range(5):
+        image = Image.effect_noise((4032, 3024), 20 + i * 5).convert('RGB')
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Rotated, like most portrait phone shots
+        buffer = io.BytesIO()
+        image.save(buffer, format='JPEG', quality=92, exif=exif)
+        samples.append((f'synthetic_{i}.jpg', buffer.getvalue()))
+    return samples
+
+
+def tokens(text):
+    return {word.strip('.,!?#"\'').lower() for word in text.split() if word.strip('.,!?#"\'')}
+
+
+def main():
+    model = None
+    if os.environ.get("GEMINI_API_KEY"):
+        import google.generativeai as genai
+        genai.configure(api_key=os.environ["GEMINI_API_KEY"])
+        model = genai.GenerativeModel(os.environ.get("GEMINI_MODEL_NAME", "gemini-1.5-flash"))
+
+    print(f"preprocess={model_preprocess_signature()} model={'live' if model else f'modelled @ {UPLOAD_MBPS} Mbit/s'}")
+    print(f"{'sample':>16} {'orig bytes':>11} {'prep bytes':>11} {'prep ms':>8} {'orig s':>8} {'prep s':>8} {'parity':>7}")
+    for name, original in load_samples():
+        start = time.perf_counter()
+        prepared = prepare_model_image(original)
+        prep_ms = (time.perf_counter() - start) * 1000
+        parity = '-'
+        if model:
+            start = time.perf_counter()
+            original_caption = model.generate_content([PARITY_PROMPT, Image.open(io.BytesIO(original))]).text
+            original_seconds = time.perf_counter() - start
+            start = time.perf_counter()
+            prepared_caption = model.generate_content([PARITY_PROMPT, prepared]).text
+            prepared_seconds = time.perf_counter() - start + prep_ms / 1000
+            a, b = tokens(original_caption), tokens(prepared_caption)
+            parity = f"{len(a & b) / max(1, len(a | b)):.2f}"
+        else:
+            original_seconds = len(original) * 8 / (UPLOAD_MBPS * 1e6)
+            prepared_seconds = len(prepared['data']) * 8 / (UPLOAD_MBPS * 1e6) + prep_ms / 1000
+        print(f"{name:>16} {len(original):>11} {len(prepared['data']):>11} {prep_ms:>8.1f} "
+              f"{original_seconds:>8.2f} {prepared_seconds:>8.2f} {parity:>7}")
+
+
+if __name__ == '__main__':
+    main()
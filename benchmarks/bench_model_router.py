@@ -0,0 +1,89 @@
+"""
+Model router against the local fake Gemini server: the primary degrades (errors, then latency over the SLO)
+and recovers, and we compare routed traffic with primary-only traffic in each phase.
+
+Runs entirely offline; phase length and concurrency via ROUTER_BENCH_REQUESTS / ROUTER_BENCH_CONCURRENCY.
+
+Usage: python benchmarks/bench_model_router.py
+"""
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_model_server import start_server  # noqa: E402
+
+REQUESTS_PER_PHASE = int(os.environ.get("ROUTER_BENCH_REQUESTS", 60))
+CONCURRENCY = int(os.environ.get("ROUTER_BENCH_CONCURRENCY", 6))
+PRIMARY, FALLBACK = 'gemini-1.5-flash', 'gemini-1.5-flash-8b'
+
+server, fake_state = start_server()
+# Small SLO, deadline and cooldown so each phase takes seconds; must be set before the router modules load
+os.environ.update({
+    'GEMINI_API_ENDPOINT': f"http://127.0.0.1:{server.server_address[1]}",
+    'CAPTION_MODEL_PRIMARY': PRIMARY,
+    'CAPTION_MODEL_FALLBACK': FALLBACK,
+    'CAPTION_MODEL_LATENCY_SLO_SECONDS': '1.0',
+    'MODEL_CALL_DEADLINE_SECONDS': '4',
+    'MODEL_RETRY_BASE_DELAY_SECONDS': '0.05',
+    'BREAKER_MIN_CALLS': '10',
+    'BREAKER_COOLDOWN_SECONDS': '2',
+})
+
+from model_invoker import generate_text  # noqa: E402
+from model_router import ModelRouter, configure_gemini, get_model  # noqa: E402
+
+PHASES = [
+    ('healthy', {'latency': 0.2, 'error_rate': 0.0}),
+    ('primary 503s', {'latency': 0.2, 'error_rate': 1.0}),
+    ('primary slow (2s)', {'latency': 2.0, 'error_rate': 0.0}),
+    ('primary recovered', {'latency': 0.2, 'error_rate': 0.0}),
+]
+
+
+def call_primary_only(contents):
+    # Same deadline and retries, but straight to the primary: no breaker bookkeeping, no fallback
+    return generate_text(get_model(PRIMARY), contents), PRIMARY
+
+
+def run_phase(call):
+    def one_call(_):
+        started = time.perf_counter()
+        try:
+            _, model_used = call(['Write a caption'])
+        except Exception:
+            model_used = 'error'
+        return model_used, time.perf_counter() - started
+
+    with ThreadPoolExecutor(max_workers=CONCURRENCY) as executor:
+        results = list(executor.map(one_call, range(REQUESTS_PER_PHASE)))
+    latencies = sorted(latency for _, latency in results)
+    served = {}
+    for model_used, _ in results:
+        served[model_used] = served.get(model_used, 0) + 1
+    return served, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.95)]
+
+
+def main():
+    configure_gemini('fake-key')
+    routed = ModelRouter('caption')
+    fake_state.update(FALLBACK, latency=0.3, error_rate=0.0)
+
+    print(f"{REQUESTS_PER_PHASE} requests per phase, concurrency {CONCURRENCY}, SLO 1.0s, deadline 4s\n")
+    print(f"{'phase':<20}{'mode':<14}{'served by':<48}{'p50 s':>8}{'p95 s':>8}  breaker")
+    for phase, behaviour in PHASES:
+        for mode, call in (('primary only', call_primary_only), ('routed', routed.generate_text)):
+            fake_state.update(PRIMARY, **behaviour)
+            served, p50, p95 = run_phase(call)
+            breaker = routed.snapshot()[PRIMARY]['state']
+            print(f"{phase:<20}{mode:<14}{str(served):<48}{p50:8.2f}{p95:8.2f}  {breaker}")
+        # Let the cooldown pass so the next phase starts with a half-open probe
+        time.sleep(2.1)
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,267 @@
+"""
+S3 -> GCS staging for full-video captioning: download to /tmp then upload_from_filename, versus
+gcs_transfer.pipe_to_gcs (GetObject chunks piped into a resumable upload, no local file).
+
+Runs against local emulators: moto's S3 server and a minimal GCS JSON-API emulator below that supports
+resumable uploads. GCS_BENCH_MBPS throttles the emulator's upload bandwidth and S3_BENCH_MBPS throttles S3 reads
+(through a small TCP proxy in front of moto) to stand in for the cross-cloud hop; 0 = unthrottled. Reports wall
+time, peak local disk use and peak Python heap.
+
+Requires: pip install "moto[server]" google-cloud-storage
+Usage: python benchmarks/bench_s3_to_gcs.py [SIZE_MB ...]
+"""
+import base64
+import json
+import os
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import google_crc32c
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+GCS_BENCH_MBPS = float(os.environ.get("GCS_BENCH_MBPS", 100))
+S3_BENCH_MBPS = float(os.environ.get("S3_BENCH_MBPS", 100))
+BUCKET = 'bench-videos'
+GCS_BUCKET = 'bench-gemini-staging'
+
+
+class FakeGCSHandler(BaseHTTPRequestHandler):
+    """Just enough of the GCS JSON API for resumable/multipart uploads, metadata and deletes."""
+    protocol_version = 'HTTP/1.1'
+    objects = {}
+    sessions = {}
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, payload=None, headers=None):
+        body = json.dumps(payload).encode() if payload is not None else b''
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self):
+        length = int(self.headers.get('Content-Length', 0))
+        data = self.rfile.read(length) if length else b''
+        if GCS_BENCH_MBPS:
+            time.sleep(len(data) / (GCS_BENCH_MBPS * 1024 * 1024))
+        return data
+
+    def _resource(self, bucket, name):
+        data = self.objects[name]
+        # The client validates uploads against the crc32c in the response
+        crc32c = base64.b64encode(google_crc32c.value(data).to_bytes(4, 'big')).decode()
+        return {'kind': 'storage#object', 'bucket': bucket, 'name': name, 'size': str(len(data)),
+                'generation': '1', 'id': f'{bucket}/{name}/1', 'crc32c': crc32c}
+
+    def do_POST(self):
+        parsed = urlparse(self.path)
+        query = parse_qs(parsed.query)
+        bucket = re.match(r'^/upload/storage/v1/b/([^/]+)/o', parsed.path).group(1)
+        body = self._body()
+        if query.get('uploadType') == ['resumable']:
+            name = query.get('name', [None])[0] or json.loads(body or b'{}').get('name')
+            upload_id = uuid.uuid4().hex
+            with self.lock:
+                self.sessions[upload_id] = (name, bytearray())
+            location = f"http://{self.headers['Host']}{parsed.path}?uploadType=resumable&upload_id={upload_id}"
+            return self._reply(200, {}, {'Location': location})
+        # multipart: metadata part then media part
+        boundary = re.search(r'boundary="?([^";]+)', self.headers['Content-Type']).group(1).encode()
+        parts = body.split(b'--' + boundary)
+        metadata = json.loads(parts[1].split(b'\r\n\r\n', 1)[1])
+        media = parts[2].split(b'\r\n\r\n', 1)[1].rsplit(b'\r\n', 1)[0]
+        with self.lock:
+            self.objects[metadata['name']] = bytes(media)
+        return self._reply(200, self._resource(bucket, metadata['name']))
+
+    def do_PUT(self):
+        parsed = urlparse(self.path)
+        bucket = re.match(r'^/upload/storage/v1/b/([^/]+)/o', parsed.path).group(1)
+        upload_id = parse_qs(parsed.query)['upload_id'][0]
+        data = self._body()
+        name, buffer = self.sessions[upload_id]
+        buffer.extend(data)
+        total = self.headers.get('Content-Range', '').rsplit('/', 1)[-1]
+        if total != '*' and len(buffer) == int(total):
+            with self.lock:
+                self.objects[name] = bytes(buffer)
+                del self.sessions[upload_id]
+            return self._reply(200, self._resource(bucket, name))
+        return self._reply(308, None, {'Range': f'bytes=0-{len(buffer) - 1}'} if buffer else {})
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        match = re.match(r'^/storage/v1/b/([^/]+)/o/([^?]+)', path)
+        if not match:
+            # Bucket metadata, fetched by BlobWriter before it starts the upload
+            return self._reply(200, {'kind': 'storage#bucket', 'name': path.rsplit('/', 1)[-1]})
+        name = match.group(2).replace('%2F', '/')
+        if name not in self.objects:
+            return self._reply(404, {'error': {'code': 404, 'message': 'Not Found'}})
+        return self._reply(200, self._resource(match.group(1), name))
+
+    def do_DELETE(self):
+        match = re.match(r'^/storage/v1/b/([^/]+)/o/([^?]+)', urlparse(self.path).path)
+        if match:
+            with self.lock:
+                self.objects.pop(match.group(2).replace('%2F', '/'), None)
+        self._reply(204)
+
+
+def throttled_proxy(listen_port, target_port, mbps):
+    """Forwards TCP to target_port, capping the target -> client direction at mbps (S3 GetObject bodies)."""
+    def pump(source, sink, rate):
+        try:
+            while True:
+                data = source.recv(64 * 1024)
+                if not data:
+                    break
+                sink.sendall(data)
+                if rate:
+                    time.sleep(len(data) / (rate * 1024 * 1024))
+        except OSError:
+            pass
+        finally:
+            sink.close()
+            source.close()
+
+    listener = socket.create_server(('127.0.0.1', listen_port))
+    while True:
+        client, _ = listener.accept()
+        upstream = socket.create_connection(('127.0.0.1', target_port))
+        threading.Thread(target=pump, args=(client, upstream, 0), daemon=True).start()
+        threading.Thread(target=pump, args=(upstream, client, mbps), daemon=True).start()
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"emulator on port {port} did not start")
+
+
+def start_emulators():
+    """Both emulators run in child processes so their buffers stay out of this process's heap numbers."""
+    moto_port, s3_port, gcs_port = _free_port(), _free_port(), _free_port()
+    processes = [
+        subprocess.Popen([sys.executable, '-m', 'moto.server', '-H', '127.0.0.1', '-p', str(moto_port)],
+                         stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL),
+        subprocess.Popen([sys.executable, os.path.abspath(__file__), '--emulators', str(s3_port), str(moto_port),
+                          str(gcs_port)]),
+    ]
+    for port in (moto_port, s3_port, gcs_port):
+        _wait_for_port(port)
+    os.environ.update({
+        'AWS_ENDPOINT_URL_S3': f'http://127.0.0.1:{s3_port}',
+        'AWS_ACCESS_KEY_ID': 'bench', 'AWS_SECRET_ACCESS_KEY': 'bench', 'AWS_DEFAULT_REGION': 'us-east-1',
+    })
+    return processes, f'http://127.0.0.1:{gcs_port}'
+
+
+def disk_watcher(directory, stop, peak):
+    while not stop.is_set():
+        used = sum(os.path.getsize(os.path.join(directory, f)) for f in os.listdir(directory))
+        peak[0] = max(peak[0], used)
+        time.sleep(0.02)
+
+
+def measure(label, transfer, scratch_dir, expected_size):
+    stop, peak_disk = threading.Event(), [0]
+    watcher = threading.Thread(target=disk_watcher, args=(scratch_dir, stop, peak_disk), daemon=True)
+    watcher.start()
+    tracemalloc.start()
+    started = time.perf_counter()
+    blob = transfer()
+    elapsed = time.perf_counter() - started
+    _, peak_heap = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    stop.set()
+    watcher.join()
+    blob.reload()
+    assert blob.size == expected_size, f"{label}: uploaded {blob.size} of {expected_size} bytes"
+    blob.delete()
+    print(f"  {label:<30}{elapsed:8.2f} s{peak_disk[0] / 2**20:10.1f} MB{peak_heap / 2**20:10.1f} MB")
+
+
+def main():
+    if sys.argv[1:2] == ['--emulators']:
+        s3_port, moto_port, gcs_port = map(int, sys.argv[2:5])
+        threading.Thread(target=throttled_proxy, args=(s3_port, moto_port, S3_BENCH_MBPS), daemon=True).start()
+        ThreadingHTTPServer(('127.0.0.1', gcs_port), FakeGCSHandler).serve_forever()
+        return
+
+    sizes_mb = [int(arg) for arg in sys.argv[1:]] or [64, 256]
+    processes, gcs_endpoint = start_emulators()
+
+    import boto3
+    from google.auth.credentials import AnonymousCredentials
+    from google.cloud import storage
+    from media_fetch import fetch_to_file
+    from gcs_transfer import pipe_to_gcs, GCS_UPLOAD_CHUNK_SIZE
+
+    boto3.client('s3').create_bucket(Bucket=BUCKET)
+    gcs_bucket = storage.Client(project='bench', credentials=AnonymousCredentials(),
+                                client_options={'api_endpoint': gcs_endpoint}).bucket(GCS_BUCKET)
+    scratch_dir = tempfile.mkdtemp(prefix='bench_s3_gcs_')
+
+    print(f"S3 read {S3_BENCH_MBPS or 'unthrottled'} MB/s, GCS upload {GCS_BENCH_MBPS or 'unthrottled'} MB/s, "
+          f"upload chunk {GCS_UPLOAD_CHUNK_SIZE // 2**20} MB")
+    print(f"  {'path':<30}{'wall':>10}{'disk':>13}{'heap':>13}")
+    try:
+        for size_mb in sizes_mb:
+            key = f'uploads/video_{size_mb}mb.mp4'
+            boto3.client('s3').put_object(Bucket=BUCKET, Key=key, Body=os.urandom(size_mb * 2**20))
+            url = f's3://{BUCKET}/{key}'
+            print(f"{size_mb} MB video")
+
+            def staged():
+                # The old handler: whole video to /tmp, then a file upload
+                path = os.path.join(scratch_dir, os.path.basename(key))
+                fetch_to_file(url, path)
+                blob = gcs_bucket.blob(f'staged_{uuid.uuid4().hex}.mp4', chunk_size=GCS_UPLOAD_CHUNK_SIZE)
+                blob.upload_from_filename(path, content_type='video/mp4')
+                os.remove(path)
+                return blob
+
+            def piped():
+                blob = gcs_bucket.blob(f'piped_{uuid.uuid4().hex}.mp4')
+                pipe_to_gcs(url, gcs_bucket, blob.name, 'video/mp4')
+                return blob
+
+            measure('/tmp + upload_from_filename', staged, scratch_dir, size_mb * 2**20)
+            measure('pipe_to_gcs', piped, scratch_dir, size_mb * 2**20)
+    finally:
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+        for process in processes:
+            process.terminate()
+
+
+if __name__ == '__main__':
+    main()
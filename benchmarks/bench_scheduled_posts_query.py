@@ -0,0 +1,134 @@
+"""
+Listing one user's scheduled posts: the old full-table scan + in-memory sort vs one page of the user_id GSI query.
+
+The table holds USERS users with POSTS_PER_USER posts each; the old path's cost grows with the whole table, the new
+one with the page. "items read" is ScannedCount summed over calls, which is what DynamoDB bills read capacity on.
+DynamoDB is moto's server, so latencies are moto's; the items-read column carries over to the real service.
+Requires: pip install "moto[server]"
+Usage: python benchmarks/bench_scheduled_posts_query.py [users ...]   (default: 10 100 400)
+"""
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_bulk_schedule import TABLE_NAME, start_stand_ins  # noqa: E402
+
+POSTS_PER_USER = int(os.environ.get("POSTS_PER_USER", 50))
+REPEATS = 3
+
+
+def old_scan(table, user_id):
+    """The handler as it was: scan everything with a user_id filter, follow every page, sort in memory."""
+    from boto3.dynamodb.conditions import Attr
+    read = 0
+    response = table.scan(FilterExpression=Attr('user_id').eq(user_id))
+    items, read = response.get('Items', []), read + response['ScannedCount']
+    while 'LastEvaluatedKey' in response:
+        response = table.scan(FilterExpression=Attr('user_id').eq(user_id),
+                              ExclusiveStartKey=response['LastEvaluatedKey'])
+        items.extend(response.get('Items', []))
+        read += response['ScannedCount']
+    return sorted(items, key=lambda x: x.get('scheduled_time_utc', ''), reverse=True), read
+
+
+def fill(table, first_user, last_user):
+    start = datetime.now(timezone.utc)
+    with table.batch_writer() as batch:
+        for user in range(first_user, last_user):
+            for index in range(POSTS_PER_USER):
+                batch.put_item(Item={
+                    'post_id': f'post-{user}-{index}',
+                    'user_id': f'user-{user}',
+                    'caption': f'Benchmark post {index} ' + 'x' * 200,
+                    'platform': ('Instagram', 'Facebook')[index % 2],
+                    'status': ('pending', 'posted')[index % 2],
+                    'scheduled_time_utc': (start + timedelta(hours=index)).isoformat()
+                })
+
+
+def timed(function):
+    best = None
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    user_counts = sorted(int(arg) for arg in sys.argv[1:]) or [10, 100, 400]
+    moto_server, scheduler_server = start_stand_ins()
+    import boto3
+    boto3.client('dynamodb').create_table(
+        TableName=TABLE_NAME,
+        KeySchema=[{'AttributeName': 'post_id', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[{'AttributeName': name, 'AttributeType': 'S'}
+                              for name in ('post_id', 'user_id', 'scheduled_time_utc')],
+        GlobalSecondaryIndexes=[{
+            'IndexName': 'user_id-scheduled_time_utc-index',
+            'KeySchema': [{'AttributeName': 'user_id', 'KeyType': 'HASH'},
+                          {'AttributeName': 'scheduled_time_utc', 'KeyType': 'RANGE'}],
+            'Projection': {'ProjectionType': 'ALL'}
+        }],
+        BillingMode='PAY_PER_REQUEST'
+    )
+    import get_scheduled_posts_lambdaa as handler
+
+    # Count what the new handler reads by wrapping the table's query
+    read_counter = {'items': 0}
+    original_query = handler.table.query
+
+    def counting_query(**kwargs):
+        response = original_query(**kwargs)
+        read_counter['items'] += response['ScannedCount']
+        return response
+    handler.table.query = counting_query
+
+    def new_query(params):
+        read_counter['items'] = 0
+        body = json.loads(handler.lambda_handler({'queryStringParameters': params}, None)['body'])
+        return body, read_counter['items']
+
+    print(f"{POSTS_PER_USER} posts per user; best of {REPEATS}\n")
+    print(f"{'posts':>7}  {'old scan ms':>11} {'items read':>10}  {'query ms':>9} {'items read':>10}  "
+          f"{'filtered ms':>11} {'items read':>10}")
+    filled = 0
+    try:
+        for users in user_counts:
+            fill(handler.table, filled, users)
+            filled = users
+            scan_seconds, (scan_items, scan_read) = timed(lambda: old_scan(handler.table, 'user-0'))
+            query_seconds, (body, query_read) = timed(lambda: new_query({'user_id': 'user-0', 'limit': '20'}))
+            filtered_seconds, (filtered, filtered_read) = timed(lambda: new_query(
+                {'user_id': 'user-0', 'limit': '20', 'status': 'posted', 'platform': 'Facebook'}))
+            assert [p['post_id'] for p in body['posts']] == [p['post_id'] for p in scan_items[:20]]
+            assert all(p['status'] == 'posted' for p in filtered['posts'])
+            print(f"{users * POSTS_PER_USER:>7}  {scan_seconds * 1000:>11.1f} {scan_read:>10}  "
+                  f"{query_seconds * 1000:>9.1f} {query_read:>10}  {filtered_seconds * 1000:>11.1f} {filtered_read:>10}")
+
+        # Walk every page of one user and check nothing is skipped or repeated
+        seen, cursor = [], None
+        while True:
+            params = {'user_id': 'user-0', 'limit': '7'}
+            if cursor:
+                params['cursor'] = cursor
+            page, _ = new_query(params)
+            seen.extend(p['post_id'] for p in page['posts'])
+            cursor = page['next_cursor']
+            if not cursor:
+                break
+        assert len(seen) == len(set(seen)) == POSTS_PER_USER
+        print(f"\npaged through user-0 7 at a time: {len(seen)} posts, no gaps or repeats")
+    finally:
+        scheduler_server.shutdown()
+        moto_server.stop()
+
+
+if __name__ == '__main__':
+    main()
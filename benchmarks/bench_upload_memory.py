@@ -0,0 +1,89 @@
+"""
+Peak-memory benchmark for the image/video upload lambdas: whole-payload decode vs streaming decode.
+
+Runs each handler against an in-process S3 stand-in that discards the bytes (renditions disabled,
+the payload is random bytes), and reports the peak
+Python heap allocated while handling the request (tracemalloc). The request event itself is built
+before measuring, since in Lambda it is already resident when the handler starts.
+
+Usage: python benchmarks/bench_upload_memory.py [size_mb ...]   (default: 10 50 200)
+"""
+import base64
+import json
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ.setdefault("S3_BUCKET_NAME", "benchmark-bucket")
+
+import upload_image_lambda  # noqa: E402
+import upload_video_lambda  # noqa: E402
+from botocore.exceptions import ClientError  # noqa: E402
+
+
+class DiscardingS3Client:
+    """Accepts uploads and throws the bytes away, so only the handler's own memory is measured."""
+
+    def head_object(self, **kwargs):
+        raise ClientError({'Error': {'Code': '404'}}, 'HeadObject')
+
+    def put_object(self, **kwargs):
+        return {}
+
+    def create_multipart_upload(self, **kwargs):
+        return {'UploadId': 'benchmark-upload'}
+
+    def upload_part(self, **kwargs):
+        return {'ETag': f"etag-{kwargs['PartNumber']}"}
+
+    def complete_multipart_upload(self, **kwargs):
+        return {}
+
+    def abort_multipart_upload(self, **kwargs):
+        return {}
+
+
+def measure_peak_mb(handler, event):
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    response = handler(event, None)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    if response['statusCode'] != 200:
+        raise RuntimeError(response['body'])
+    return peak / (1024 * 1024)
+
+
+def main(sizes_mb):
+    upload_image_lambda.s3_client = DiscardingS3Client()
+    upload_video_lambda.s3_client = DiscardingS3Client()
+
+    print(f"{'size':>8} {'lambda':>8} {'legacy':>12} {'stream':>12} {'raw body':>12}")
+    for size_mb in sizes_mb:
+        data_base64 = base64.b64encode(os.urandom(size_mb * 1024 * 1024)).decode('ascii')
+        cases = [
+            ('image', upload_image_lambda.lambda_handler, 'image_data', 'filename', 'photo.jpg'),
+            ('video', upload_video_lambda.lambda_handler, 'video_data_b64', 'file_name', 'clip.mp4'),
+        ]
+        for label, handler, data_field, name_field, file_name in cases:
+            peaks = []
+            for stream in (False, True):
+                event = {'body': json.dumps({
+                    data_field: data_base64, name_field: file_name, 'stream': stream, 'renditions': False
+                })}
+                peaks.append(measure_peak_mb(handler, event))
+                del event
+            raw_event = {
+                'isBase64Encoded': True,
+                'body': data_base64,
+                'queryStringParameters': {name_field: file_name, 'renditions': 'false'}
+            }
+            peaks.append(measure_peak_mb(handler, raw_event))
+            print(f"{size_mb:>6}MB {label:>8} {peaks[0]:>10.1f}MB {peaks[1]:>10.1f}MB {peaks[2]:>10.1f}MB")
+        del data_base64
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [10, 50, 200])
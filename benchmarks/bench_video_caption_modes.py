@@ -0,0 +1,76 @@
+"""
+Bytes moved and wall time for video captioning: full-video mode vs keyframes mode.
+
+Full mode copies the file three times (S3 -> /tmp, /tmp -> GCS, GCS -> Gemini file upload).
+Keyframes mode downloads it once from S3, decodes locally and sends only the sampled JPEG frames.
+Keyframe extraction is measured for real on a synthetic video; transfers are modelled at
+BANDWIDTH_MBPS. Model-side processing and generation time are not included.
+
+Usage: python benchmarks/bench_video_caption_modes.py [duration_seconds ...]   (default: 15 60 180)
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2  # noqa: E402
+import numpy as np  # noqa: E402
+from keyframes import extract_keyframes  # noqa: E402
+
+BANDWIDTH_MBPS = float(os.environ.get("BANDWIDTH_MBPS", 100))
+FPS = 30
+FRAME_SIZE = (1280, 720)
+SCENE_SECONDS = 4
+
+
+def write_synthetic_video(path, duration_seconds):
+    """A new solid-colour scene every few seconds with a moving bar, so both strategies have something to find."""
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), FPS, FRAME_SIZE)
+    rng = np.random.default_rng(0)
+    colour = rng.integers(0, 255, 3)
+    # Moving film grain keeps the bitrate closer to real phone footage than flat colour would
+    grain = rng.integers(0, 10, (FRAME_SIZE[1], FRAME_SIZE[0] * 2, 3), dtype=np.uint8)
+    for frame_index in range(duration_seconds * FPS):
+        if frame_index % (SCENE_SECONDS * FPS) == 0:
+            colour = rng.integers(0, 255, 3)
+        offset = (frame_index * 13) % FRAME_SIZE[0]
+        frame = grain[:, offset:offset + FRAME_SIZE[0]] + colour.astype(np.uint8) // 2
+        x = (frame_index * 8) % FRAME_SIZE[0]
+        frame[:, x:x + 40] = 255
+        writer.write(frame)
+    writer.release()
+
+
+def transfer_seconds(num_bytes):
+    return num_bytes * 8 / (BANDWIDTH_MBPS * 1_000_000)
+
+
+def main(durations):
+    print(f"bandwidth={BANDWIDTH_MBPS} Mbit/s")
+    print(f"{'video':>6} {'size':>9} {'mode':>16} {'bytes moved':>12} {'wall time':>10}")
+    for duration in durations:
+        fd, path = tempfile.mkstemp(suffix='.mp4')
+        os.close(fd)
+        try:
+            write_synthetic_video(path, duration)
+            size = os.path.getsize(path)
+            full_bytes = 3 * size
+            print(f"{duration:>5}s {size / 1e6:>7.1f}MB {'full':>16} {full_bytes / 1e6:>10.1f}MB "
+                  f"{transfer_seconds(full_bytes):>9.2f}s")
+            for strategy in ('uniform', 'scene'):
+                start = time.perf_counter()
+                keyframes = extract_keyframes(path, strategy=strategy)
+                extract_seconds = time.perf_counter() - start
+                frame_bytes = sum(len(frame) for _, frame in keyframes)
+                moved = size + frame_bytes
+                wall = transfer_seconds(size) + extract_seconds + transfer_seconds(frame_bytes)
+                print(f"{duration:>5}s {size / 1e6:>7.1f}MB {'keyframes/' + strategy:>16} {moved / 1e6:>10.1f}MB "
+                      f"{wall:>9.2f}s")
+        finally:
+            os.remove(path)
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [15, 60, 180])
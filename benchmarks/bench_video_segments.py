@@ -0,0 +1,112 @@
+"""
+Caption latency against video length: 'full' (one call over the whole video) versus 'segments' (windows described
+concurrently from sampled frames, then one text-only merge call).
+
+Runs offline against the fake Gemini server with its token-throughput latency model, so model time grows with the
+tokens each call sends (~263 tokens per second of video, 258 per image) and generates. Videos are synthetic
+(OpenCV-written, 320x240 @ 24 fps); segment mode includes the real local decode and frame extraction. Full mode
+counts only the generate call, not the S3 -> GCS -> file API transfer it also needs, so it is flattered here.
+
+Tune with BENCH_INPUT_TPS / BENCH_OUTPUT_TPS / BENCH_BASE_LATENCY and VIDEO_SEGMENT_SECONDS / VIDEO_SEGMENT_FRAMES.
+Usage: python benchmarks/bench_video_segments.py [DURATION_SECONDS ...]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_model_server import start_server  # noqa: E402
+
+INPUT_TPS = float(os.environ.get("BENCH_INPUT_TPS", 8000))
+OUTPUT_TPS = float(os.environ.get("BENCH_OUTPUT_TPS", 150))
+BASE_LATENCY = float(os.environ.get("BENCH_BASE_LATENCY", 0.5))
+CONCURRENCY_LEVELS = (4, 8)
+MODEL = 'gemini-1.5-flash'
+
+server, fake_state = start_server(behaviours={MODEL: {
+    'latency': BASE_LATENCY, 'jitter': 0.05, 'input_tokens_per_second': INPUT_TPS, 'output_tokens_per_second': OUTPUT_TPS
+}})
+ENDPOINT = f"http://127.0.0.1:{server.server_address[1]}"
+os.environ.update({
+    'GEMINI_API_ENDPOINT': ENDPOINT,
+    'GEMINI_MODEL_NAME': MODEL,
+    'VIDEO_MODEL_FALLBACK': '',
+    'MODEL_CALL_DEADLINE_SECONDS': '600',
+})
+
+from caption_schema import STRUCTURED_GENERATION_CONFIG, structured_prompt  # noqa: E402
+from model_router import ModelRouter, configure_gemini  # noqa: E402
+from prompt_templates import render_prompt, generation_config_for  # noqa: E402
+from video_segments import summarize_segments, segment_merge_prompt, VIDEO_SEGMENT_SECONDS  # noqa: E402
+
+
+def write_video(path, duration_seconds, fps=24, size=(320, 240)):
+    """A moving square over a background that changes colour every 5 seconds (so frames differ)."""
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, size)
+    rng = np.random.default_rng(0)
+    background = rng.integers(0, 255, 3)
+    for index in range(int(duration_seconds * fps)):
+        if index % (5 * fps) == 0:
+            background = rng.integers(0, 255, 3)
+        frame = np.empty((size[1], size[0], 3), dtype=np.uint8)
+        frame[:] = background
+        x = (index * 4) % (size[0] - 40)
+        cv2.rectangle(frame, (x, 100), (x + 40, 140), (255, 255, 255), -1)
+        writer.write(frame)
+    writer.release()
+
+
+def caption_request(prompt_parts, style_prompt):
+    config = generation_config_for(style_prompt, STRUCTURED_GENERATION_CONFIG)
+    return router.generate_text(prompt_parts + [structured_prompt(style_prompt.text)], generation_config=config,
+                                deadline_seconds=600)
+
+
+def run_full(duration):
+    video_part = {'file_data': {'file_uri': f"{ENDPOINT}/files/bench.mp4?duration_seconds={duration}",
+                                'mime_type': 'video/mp4'}}
+    started = time.perf_counter()
+    caption_request([video_part], render_prompt('video.high_engagement'))
+    return time.perf_counter() - started
+
+
+def run_segments(video_path, concurrency):
+    started = time.perf_counter()
+    duration, summaries = summarize_segments(video_path, router, concurrency=concurrency)
+    caption_request([segment_merge_prompt(duration, summaries).text], render_prompt('video.high_engagement'))
+    return time.perf_counter() - started, len(summaries)
+
+
+def main():
+    durations = [int(arg) for arg in sys.argv[1:]] or [30, 60, 120, 300, 600]
+    configure_gemini('fake-key')
+    global router
+    router = ModelRouter('video')
+    work_dir = tempfile.mkdtemp(prefix='bench_segments_')
+
+    print(f"model: {BASE_LATENCY}s base + input at {INPUT_TPS:.0f} tok/s + output at {OUTPUT_TPS:.0f} tok/s; "
+          f"segments of {VIDEO_SEGMENT_SECONDS:.0f}s\n")
+    header = f"{'video s':>8}{'full s':>9}" + ''.join(f"{f'segments c={c} s':>19}" for c in CONCURRENCY_LEVELS)
+    print(header + f"{'segments':>10}")
+    try:
+        for duration in durations:
+            video_path = os.path.join(work_dir, f'video_{duration}s.mp4')
+            write_video(video_path, duration)
+            full_seconds = run_full(duration)
+            segment_results = [run_segments(video_path, concurrency) for concurrency in CONCURRENCY_LEVELS]
+            print(f"{duration:>8}{full_seconds:>9.2f}" + ''.join(f"{seconds:>19.2f}" for seconds, _ in segment_results)
+                  + f"{segment_results[0][1]:>10}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+"""
+Local stand-in for the Gemini REST API, for exercising model_router/model_invoker without quota.
+
+Serves POST /v1beta/models/{model}:generateContent and :streamGenerateContent. Each model gets its own
+latency and error rate, changeable at runtime:
+
+    python benchmarks/fake_model_server.py --port 8765 --model gemini-1.5-flash:latency=3,error_rate=0.5
+    curl -X POST localhost:8765/admin/models/gemini-1.5-flash -d '{"latency": 0.2, "error_rate": 0}'
+
+Point the lambdas at it with GEMINI_API_ENDPOINT=http://127.0.0.1:8765 (any GEMINI_API_KEY works).
+Replies are canned captions: JSON when the request asks for application/json, "Caption N:" text otherwise.
+
+Optionally, latency also grows with request size: set input_tokens_per_second / output_tokens_per_second and each
+call adds input_tokens / input rate + reply_tokens / output rate. Text counts ~4 chars per token, an inline image
+258 tokens, and a fileData video VIDEO_TOKENS_PER_SECOND per second of the duration given in its URI's
+duration_seconds query parameter (fake files only need a URI, nothing is uploaded).
+"""
+import argparse
+import json
+import random
+import re
+from urllib.parse import urlparse, parse_qs
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_BEHAVIOUR = {'latency': 0.2, 'jitter': 0.05, 'error_rate': 0.0, 'error_code': 503,
+                     'input_tokens_per_second': 0, 'output_tokens_per_second': 0}
+# Gemini bills images at a flat 258 tokens and video at roughly 263 tokens per second (frames plus audio)
+IMAGE_TOKENS = 258
+VIDEO_TOKENS_PER_SECOND = 263
+
+CANNED_CAPTIONS = [
+    {'text': "Craving something cheesy? 🧀 Tag the friend who owes you a slice 👇 #PizzaNight", 'engagement_score': 9},
+    {'text': "Couch ✅ Pizza ✅ Zero effort ✅ Order now 🍕 #LazySunday", 'engagement_score': 8},
+    {'text': "Drop a 🍕 if you're ordering tonight! #CheeseLovers", 'engagement_score': 8},
+]
+
+_ERROR_STATUS = {429: 'RESOURCE_EXHAUSTED', 500: 'INTERNAL', 503: 'UNAVAILABLE', 504: 'DEADLINE_EXCEEDED'}
+_PATH_RE = re.compile(r'^/v1beta/models/(?P<model>[^:/?]+):(?P<method>generateContent|streamGenerateContent)')
+
+
+class FakeModelState:
+    def __init__(self, behaviours=None):
+        self._behaviours = dict(behaviours or {})
+        self._lock = threading.Lock()
+        self.requests = {}
+
+    def behaviour(self, model):
+        with self._lock:
+            self.requests[model] = self.requests.get(model, 0) + 1
+            return {**DEFAULT_BEHAVIOUR, **self._behaviours.get(model, {})}
+
+    def update(self, model, **changes):
+        with self._lock:
+            self._behaviours[model] = {**self._behaviours.get(model, {}), **changes}
+
+
+def _reply_text(model, request_body):
+    config = request_body.get('generationConfig') or request_body.get('generation_config') or {}
+    if config.get('responseMimeType', config.get('response_mime_type')) == 'application/json':
+        return json.dumps({'captions': CANNED_CAPTIONS})
+    return '\n\n'.join(f"Caption {i}: {c['text']}\nEngagement Score: {c['engagement_score']}/10"
+                       for i, c in enumerate(CANNED_CAPTIONS, 1)) + f"\n\n(served by {model})"
+
+
+def _input_tokens(request_body):
+    tokens = 0
+    for content in request_body.get('contents', []):
+        for part in content.get('parts', []):
+            if 'text' in part:
+                tokens += len(part['text']) // 4
+            elif 'inlineData' in part or 'inline_data' in part:
+                tokens += IMAGE_TOKENS
+            elif 'fileData' in part or 'file_data' in part:
+                file_data = part.get('fileData') or part.get('file_data')
+                query = parse_qs(urlparse(file_data.get('fileUri') or file_data.get('file_uri', '')).query)
+                tokens += int(float(query.get('duration_seconds', [1])[0]) * VIDEO_TOKENS_PER_SECOND)
+    return tokens
+
+
+def _compute_seconds(behaviour, request_body, reply_text):
+    seconds = 0.0
+    if behaviour['input_tokens_per_second']:
+        seconds += _input_tokens(request_body) / behaviour['input_tokens_per_second']
+    if behaviour['output_tokens_per_second']:
+        seconds += len(reply_text) / 4 / behaviour['output_tokens_per_second']
+    return seconds
+
+
+def _candidate(text):
+    return {'candidates': [{'content': {'parts': [{'text': text}], 'role': 'model'}, 'finishReason': 1, 'index': 0}]}
+
+
+def make_handler(state):
+    class FakeGeminiHandler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _send_json(self, status, payload):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            request_body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            if self.path.startswith('/admin/models/'):
+                state.update(self.path[len('/admin/models/'):], **request_body)
+                return self._send_json(200, {'ok': True})
+
+            match = _PATH_RE.match(self.path)
+            if not match:
+                return self._send_json(404, {'error': {'code': 404, 'message': 'Unknown path', 'status': 'NOT_FOUND'}})
+            model = match.group('model')
+            behaviour = state.behaviour(model)
+            time.sleep(max(0.0, random.gauss(behaviour['latency'], behaviour['jitter'])))
+
+            if random.random() < behaviour['error_rate']:
+                code = int(behaviour['error_code'])
+                return self._send_json(code, {'error': {'code': code, 'message': f'Fake {code} from {model}',
+                                                        'status': _ERROR_STATUS.get(code, 'UNKNOWN')}})
+
+            text = _reply_text(model, request_body)
+            time.sleep(_compute_seconds(behaviour, request_body, text))
+            if match.group('method') == 'generateContent':
+                return self._send_json(200, _candidate(text))
+
+            # Streaming: a JSON array of partial responses, split on line boundaries
+            chunks = [_candidate(line + '\n') for line in text.split('\n')]
+            body = json.dumps(chunks).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return FakeGeminiHandler
+
+
+def start_server(port=0, behaviours=None):
+    """Starts the server on a background thread; returns (server, state). server.server_address has the port."""
+    state = FakeModelState(behaviours)
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(state))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+
+def _parse_model_arg(value):
+    name, _, settings = value.partition(':')
+    behaviour = {}
+    for setting in filter(None, settings.split(',')):
+        key, _, number = setting.partition('=')
+        behaviour[key] = float(number)
+    return name, behaviour
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--model', action='append', default=[], type=_parse_model_arg,
+                        help='NAME:latency=SECONDS,jitter=SECONDS,error_rate=0-1,error_code=503,'
+                             'input_tokens_per_second=N,output_tokens_per_second=N')
+    args = parser.parse_args()
+    server, _ = start_server(args.port, dict(args.model))
+    print(f"Fake Gemini API on http://127.0.0.1:{server.server_address[1]} (Ctrl+C to stop)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+import hashlib
+import json
+import os
+import time
+from two_tier_cache import TwoTierCache
+
+# Tier 1: in-process LRU
+CAPTION_CACHE_LRU_SIZE = int(os.environ.get("CAPTION_CACHE_LRU_SIZE", 256))
+# Tier 2: DynamoDB table with a TTL attribute named 'expires_at'. Leave unset to run memory-only.
+CAPTION_CACHE_TABLE_NAME = os.environ.get("CAPTION_CACHE_TABLE_NAME")
+CAPTION_CACHE_TTL_SECONDS = int(os.environ.get("CAPTION_CACHE_TTL_SECONDS", 7 * 24 * 3600))
+
+_cache = TwoTierCache('Caption cache', CAPTION_CACHE_LRU_SIZE, CAPTION_CACHE_TABLE_NAME, extra_stats=('refreshes',))
+cache_stats = _cache.stats
+
+
+def _normalize(value):
+    if isinstance(value, str):
+        return ' '.join(value.split()).lower()
+    return value
+
+
+def prompt_fingerprint(**prompt_params):
+    """Stable fingerprint of everything besides the image that shapes the model output."""
+    normalized = {name: _normalize(value) for name, value in prompt_params.items() if value is not None}
+    return hashlib.sha256(json.dumps(normalized, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def make_cache_key(media_sha256, fingerprint):
+    return f"{media_sha256}:{fingerprint}"
+
+
+def get_cached(cache_key, force_refresh=False):
+    """Returns (value, tier) on a hit, (None, None) on a miss or when force_refresh skips the lookup."""
+    if force_refresh:
+        _cache.count('refreshes')
+        return None, None
+    return _cache.get(cache_key)
+
+
+def put_cached(cache_key, value):
+    """Stores a caption result. A result without captions is not cached, so one bad reply can't pin it for days."""
+    if not value.get('captions'):
+        print(f"Not caching {cache_key}: no captions")
+        return
+    _cache.put(cache_key, value, time.time() + CAPTION_CACHE_TTL_SECONDS)
@@ -0,0 +1,91 @@
+import json
+import os
+from prompt_templates import render_prompt
+
+# 'json': ask Gemini for schema-constrained JSON and decode it in one pass (text heuristics only as a fallback)
+# 'text': the original "Caption 1: ..." free-text format parsed line by line
+CAPTION_OUTPUT_MODE = os.environ.get("CAPTION_OUTPUT_MODE", "json").lower()
+
+CAPTION_RESPONSE_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'captions': {
+            'type': 'array',
+            'items': {
+                'type': 'object',
+                'properties': {
+                    'text': {'type': 'string'},
+                    'engagement_score': {'type': 'integer'},
+                    'strategy': {'type': 'string'},
+                    'target_appeal': {'type': 'string'},
+                    'business_impact': {'type': 'string'}
+                },
+                'required': ['text']
+            }
+        }
+    },
+    'required': ['captions']
+}
+
+STRUCTURED_GENERATION_CONFIG = {
+    'response_mime_type': 'application/json',
+    'response_schema': CAPTION_RESPONSE_SCHEMA
+}
+
+OPTIONAL_TEXT_FIELDS = ('strategy', 'target_appeal', 'business_impact')
+
+
+def structured_prompt(prompt):
+    return prompt + "\n\n" + render_prompt('caption.json_output').text
+
+
+def _validated_score(value):
+    # Scores outside 1-10 (or non-numeric) are dropped rather than failing the whole response
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value != int(value):
+        return None
+    return int(value) if 1 <= value <= 10 else None
+
+
+def looks_like_json(response_text):
+    """True if the reply is meant to be JSON (an object, an array or a markdown code fence), not free text."""
+    return response_text.lstrip().startswith(('{', '[', '```'))
+
+
+def parse_structured_captions(response_text):
+    """
+    Decodes a JSON caption response with a single json.loads and validates it against CAPTION_RESPONSE_SCHEMA.
+    Returns caption dicts in the same shape as the text parser. Invalid entries are dropped; raises ValueError if the
+    response isn't JSON or has no valid caption left.
+    """
+    text = response_text.strip()
+    if text.startswith('```'):
+        # Some models still wrap JSON in a markdown fence
+        text = text.strip('`').strip()
+        if text.startswith('json'):
+            text = text[len('json'):]
+
+    data = json.loads(text)  # json.JSONDecodeError is a ValueError
+    if isinstance(data, dict):
+        data = data.get('captions')
+    if not isinstance(data, list) or not data:
+        raise ValueError("Structured response has no 'captions' list.")
+
+    captions = []
+    for item in data:
+        if not isinstance(item, dict) or not isinstance(item.get('text'), str) or not item['text'].strip():
+            print(f"Dropping invalid caption entry in structured response: {item!r}")
+            continue
+        caption_text = item['text'].strip()
+        caption = {
+            'text': caption_text,
+            'engagement_score': _validated_score(item.get('engagement_score')),
+            'word_count': len(caption_text.split()),
+            'character_count': len(caption_text)
+        }
+        for field in OPTIONAL_TEXT_FIELDS:
+            if isinstance(item.get(field), str) and item[field].strip():
+                caption[field] = item[field].strip()
+        captions.append(caption)
+    if not captions:
+        raise ValueError("Structured response has no valid caption entries.")
+    return captions
@@ -0,0 +1,95 @@
+import json
+import os
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from generate_caption_lambda import BATCH_ITEM_FIELDS, format_sse, iter_caption_events
+from model_router import configure_gemini
+
+# Streaming caption endpoint (app.py's GENERATE_CAPTION_STREAM_API_URL). A Python lambda handler can only return a
+# finished response, so captions are streamed by this small HTTP server instead: deploy it behind the AWS Lambda Web
+# Adapter layer on a Function URL with InvokeMode RESPONSE_STREAM (and AWS_LWA_INVOKE_MODE=response_stream), which
+# forwards every chunk to the client as it is written. Locally it runs as it is: python caption_stream_server.py
+CAPTION_STREAM_PORT = int(os.environ.get("PORT", 8080)) # The Web Adapter proxies to this port
+CAPTION_STREAM_PATH = os.environ.get("CAPTION_STREAM_PATH", "/generate-caption-stream")
+CORS_HEADERS = {'Access-Control-Allow-Origin': '*', 'Access-Control-Allow-Headers': 'Content-Type',
+                'Access-Control-Allow-Methods': 'POST, OPTIONS'}
+
+
+class CaptionStreamHandler(BaseHTTPRequestHandler):
+    """POST {image_s3_url, style, ...} -> text/event-stream of 'caption' events, then 'done' (or 'error')."""
+    protocol_version = 'HTTP/1.1'
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        for name, value in {'Content-Type': 'application/json', **CORS_HEADERS}.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_chunk(self, text):
+        data = text.encode('utf-8')
+        self.wfile.write(f"{len(data):X}\r\n".encode('ascii') + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_OPTIONS(self):
+        self.send_response(204)
+        for name, value in CORS_HEADERS.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_POST(self):
+        if self.path.split('?')[0] != CAPTION_STREAM_PATH:
+            self._send_json(404, {'message': 'Not found.'})
+            return
+        gemini_api_key = os.environ.get("GEMINI_API_KEY")
+        if not gemini_api_key:
+            print("GEMINI_API_KEY not found in environment variables.")
+            self._send_json(500, {'message': 'Gemini API key not configured.'})
+            return
+        configure_gemini(gemini_api_key)
+
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)) or b'null')
+        except ValueError:
+            self._send_json(400, {'message': 'Request body is not valid JSON.'})
+            return
+        if not isinstance(body, dict) or not body.get('image_s3_url'):
+            self._send_json(400, {'message': 'Missing image_s3_url in request body.'})
+            return
+
+        self.send_response(200)
+        for name, value in {'Content-Type': 'text/event-stream', 'Cache-Control': 'no-cache',
+                            'Transfer-Encoding': 'chunked', **CORS_HEADERS}.items():
+            self.send_header(name, value)
+        self.end_headers()
+
+        events = iter_caption_events(**{field: body[field] for field in BATCH_ITEM_FIELDS if field in body})
+        try:
+            try:
+                for event_name, payload in events:
+                    self._send_chunk(format_sse(event_name, payload))
+            except (BrokenPipeError, ConnectionResetError):
+                print("Caption stream client disconnected")
+                return
+            except Exception as e:
+                print(f"Error streaming captions: {e}")
+                self._send_chunk(format_sse('error', {'message': f'Internal server error: {str(e)}'}))
+            self.wfile.write(b"0\r\n\r\n")
+        finally:
+            # Stops the model stream too when the client went away mid-caption
+            events.close()
+
+
+def serve(port=CAPTION_STREAM_PORT):
+    server = ThreadingHTTPServer(('0.0.0.0', port), CaptionStreamHandler)
+    print(f"Caption stream server listening on :{port}{CAPTION_STREAM_PATH}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    serve()
@@ -0,0 +1,171 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+import boto3
+from boto3.dynamodb.conditions import Key
+from botocore.config import Config
+from post_dispatch import DISPATCH_BUCKET_INDEX_NAME, dispatch_at, dispatch_bucket, due_buckets, minute_of
+
+# Runs once a minute from a single recurring EventBridge schedule (rate(1 minute)) when DISPATCH_MODE=bucketed.
+# Each run sends every pending post whose time has come to the poster lambda, one async invoke per post.
+
+# Buckets this far back are re-checked every run, so posts missed by a failed or throttled run still go out
+DISPATCH_LOOKBACK_MINUTES = int(os.environ.get("DISPATCH_LOOKBACK_MINUTES", 15))
+# Concurrent bucket queries and poster invokes
+DISPATCH_MAX_WORKERS = int(os.environ.get("DISPATCH_MAX_WORKERS", 32))
+# Stop starting new invokes this close to the Lambda timeout; whatever is left stays indexed for the next run
+DISPATCH_TIME_MARGIN_SECONDS = float(os.environ.get("DISPATCH_TIME_MARGIN_SECONDS", 10))
+# After an outage longer than the lookback, the next run reaches back to the last minute a run swept completely,
+# up to this far
+DISPATCH_MAX_CATCHUP_MINUTES = int(os.environ.get("DISPATCH_MAX_CATCHUP_MINUTES", 24 * 60))
+# A claimed post is parked in the bucket this many minutes ahead until its invoke is confirmed, so a post whose
+# sweeper died between claim and invoke is found there and sent by a later run
+DISPATCH_CLAIM_LEASE_MINUTES = int(os.environ.get("DISPATCH_CLAIM_LEASE_MINUTES", 5))
+# That last fully swept minute is kept in the posts table under a post_id no post can have; the item has neither
+# user_id nor dispatch_bucket, so no index sees it
+DISPATCH_WATERMARK_POST_ID = '#dispatch_sweeper_watermark'
+
+dynamodb = boto3.resource('dynamodb')
+DYNAMODB_TABLE_NAME = os.environ.get("DYNAMODB_TABLE_NAME", "ScheduledSocialPosts")
+table = dynamodb.Table(DYNAMODB_TABLE_NAME)
+
+lambda_client = boto3.client('lambda', config=Config(max_pool_connections=DISPATCH_MAX_WORKERS))
+
+
+def due_posts(bucket, now_at):
+    """(post_id, bucket) for each post in one bucket whose dispatch_at has passed. The index only projects keys."""
+    due = []
+    query_args = {
+        'IndexName': DISPATCH_BUCKET_INDEX_NAME,
+        'KeyConditionExpression': Key('dispatch_bucket').eq(bucket) & Key('dispatch_at').lte(now_at)
+    }
+    while True:
+        response = table.query(**query_args)
+        due.extend((item['post_id'], bucket) for item in response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            return due
+        query_args['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def claim_post(post_id, bucket, now):
+    """
+    Moves the post to its lease bucket, DISPATCH_CLAIM_LEASE_MINUTES ahead, before it is sent, so overlapping runs
+    can't send it twice. Returns the lease bucket, or None if another run got there first or the post is no longer
+    pending.
+    """
+    lease_bucket = dispatch_bucket(post_id, now + timedelta(minutes=DISPATCH_CLAIM_LEASE_MINUTES))
+    try:
+        table.update_item(
+            Key={'post_id': post_id},
+            UpdateExpression='SET dispatch_bucket = :lease, dispatched_at = :now',
+            ConditionExpression='dispatch_bucket = :bucket AND #status = :pending',
+            ExpressionAttributeNames={'#status': 'status'},
+            ExpressionAttributeValues={':bucket': bucket, ':lease': lease_bucket, ':pending': 'pending',
+                                       ':now': now.isoformat()}
+        )
+        return lease_bucket
+    except table.meta.client.exceptions.ConditionalCheckFailedException:
+        return None
+
+
+def confirm_post(post_id, lease_bucket):
+    """Takes a sent post out of the index. If this fails the lease brings it back; the poster skips posted posts."""
+    try:
+        table.update_item(
+            Key={'post_id': post_id},
+            UpdateExpression='REMOVE dispatch_bucket',
+            ConditionExpression='dispatch_bucket = :lease',
+            ExpressionAttributeValues={':lease': lease_bucket}
+        )
+    except Exception as e:
+        print(f"Could not confirm dispatch of post {post_id}; it will be re-sent after its lease: {e}")
+
+
+def release_post(post_id, lease_bucket, now):
+    """Puts a claimed post in the current minute's bucket after a failed invoke, for the next run to retry."""
+    try:
+        table.update_item(
+            Key={'post_id': post_id},
+            UpdateExpression='SET dispatch_bucket = :bucket REMOVE dispatched_at',
+            ConditionExpression='dispatch_bucket = :lease',
+            ExpressionAttributeValues={':bucket': dispatch_bucket(post_id, now), ':lease': lease_bucket}
+        )
+    except Exception as e:
+        print(f"Could not release post {post_id}; it will be retried after its lease: {e}")
+
+
+def sweep_lookback_minutes(now):
+    """DISPATCH_LOOKBACK_MINUTES, or back to the last fully swept minute if that is older (capped)."""
+    try:
+        mark = table.get_item(Key={'post_id': DISPATCH_WATERMARK_POST_ID}, ConsistentRead=True).get('Item')
+    except Exception as e:
+        print(f"Could not read the dispatch watermark: {e}")
+        mark = None
+    if not mark:
+        return DISPATCH_LOOKBACK_MINUTES
+    swept_through = datetime.strptime(mark['swept_through'], '%Y-%m-%dT%H:%M').replace(tzinfo=timezone.utc)
+    behind = int((now - swept_through).total_seconds() // 60)
+    return min(max(DISPATCH_LOOKBACK_MINUTES, behind), DISPATCH_MAX_CATCHUP_MINUTES)
+
+
+def save_watermark(now):
+    """Records that every bucket up to now's minute has been swept. Only ever moves forward."""
+    minute = minute_of(now)
+    try:
+        table.put_item(
+            Item={'post_id': DISPATCH_WATERMARK_POST_ID, 'swept_through': minute},
+            ConditionExpression='attribute_not_exists(swept_through) OR swept_through < :minute',
+            ExpressionAttributeValues={':minute': minute}
+        )
+    except table.meta.client.exceptions.ConditionalCheckFailedException:
+        pass
+    except Exception as e:
+        print(f"Could not save the dispatch watermark: {e}")
+
+
+def lambda_handler(event, context):
+    target_lambda_arn = os.environ.get("SOCIAL_MEDIA_POSTER_LAMBDA_ARN")
+    if not target_lambda_arn:
+        print("SOCIAL_MEDIA_POSTER_LAMBDA_ARN not configured.")
+        return {'statusCode': 500, 'body': json.dumps({'message': 'SOCIAL_MEDIA_POSTER_LAMBDA_ARN not configured.'})}
+
+    now = datetime.now(timezone.utc)
+    now_at = dispatch_at(now)
+    buckets = due_buckets(now, sweep_lookback_minutes(now))
+
+    def out_of_time():
+        return context is not None and context.get_remaining_time_in_millis() < DISPATCH_TIME_MARGIN_SECONDS * 1000
+
+    def dispatch_one(entry):
+        post_id, bucket = entry
+        if out_of_time():
+            return 'deferred'
+        lease_bucket = claim_post(post_id, bucket, now)
+        if not lease_bucket:
+            return 'skipped'
+        try:
+            # Same payload the per-post EventBridge schedules send
+            lambda_client.invoke(
+                FunctionName=target_lambda_arn,
+                InvocationType='Event',
+                Payload=json.dumps({'post_id': post_id}).encode('utf-8')
+            )
+        except Exception as e:
+            print(f"Failed to invoke poster for post {post_id}: {e}")
+            release_post(post_id, lease_bucket, now)
+            return 'failed'
+        confirm_post(post_id, lease_bucket)
+        return 'dispatched'
+
+    with ThreadPoolExecutor(max_workers=DISPATCH_MAX_WORKERS) as executor:
+        due = [entry for entries in executor.map(lambda bucket: due_posts(bucket, now_at), buckets)
+               for entry in entries]
+        outcomes = list(executor.map(dispatch_one, due))
+
+    counts = {outcome: outcomes.count(outcome) for outcome in ('dispatched', 'skipped', 'failed', 'deferred')}
+    if not counts['deferred']:
+        # Failed posts were moved into the current minute, so everything up to it has been handled
+        save_watermark(now)
+    print(f"Dispatch sweep at {now_at}: {len(due)} due across {len(buckets)} buckets, {counts}")
+    return {'statusCode': 200, 'body': json.dumps({'due': len(due), **counts})}
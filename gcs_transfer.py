@@ -0,0 +1,96 @@
+import os
+import queue
+import threading
+from media_fetch import iter_media_chunks
+
+# GCS resumable upload chunk; must be a multiple of 256 KiB
+GCS_UPLOAD_CHUNK_SIZE = int(os.environ.get("GCS_UPLOAD_CHUNK_SIZE", 8 * 1024 * 1024))
+# S3 read chunk and how many of them may wait for the GCS writer. Peak memory is about
+# TRANSFER_QUEUE_DEPTH * TRANSFER_READ_CHUNK_SIZE + GCS_UPLOAD_CHUNK_SIZE, whatever the video size.
+TRANSFER_READ_CHUNK_SIZE = int(os.environ.get("TRANSFER_READ_CHUNK_SIZE", 1024 * 1024))
+TRANSFER_QUEUE_DEPTH = int(os.environ.get("TRANSFER_QUEUE_DEPTH", 8))
+
+# Staged videos live under this prefix and are removed by a bucket lifecycle rule, not by each request
+GCS_STAGING_PREFIX = os.environ.get("GCS_STAGING_PREFIX", "gemini-staging/")
+GCS_STAGING_RETENTION_DAYS = int(os.environ.get("GCS_STAGING_RETENTION_DAYS", 1))
+
+_END_OF_STREAM = object()
+
+
+def ensure_staging_lifecycle(gcs_bucket, prefix=GCS_STAGING_PREFIX, age_days=GCS_STAGING_RETENTION_DAYS):
+    """
+    Makes sure the bucket deletes objects under prefix after age_days. A one-time deployment step (see __main__
+    below), not request-path code: it needs storage.buckets.update, which the video lambda shouldn't hold, and
+    concurrent read-modify-patch calls from several containers could drop each other's rules.
+    """
+    gcs_bucket.reload()
+    for rule in gcs_bucket.lifecycle_rules:
+        condition = rule.get('condition', {})
+        if rule.get('action', {}).get('type') == 'Delete' and condition.get('matchesPrefix') == [prefix]:
+            print(f"Lifecycle rule for gs://{gcs_bucket.name}/{prefix}* already in place")
+            return
+    gcs_bucket.add_lifecycle_delete_rule(age=age_days, matches_prefix=[prefix])
+    gcs_bucket.patch()
+    print(f"Added lifecycle rule: delete gs://{gcs_bucket.name}/{prefix}* after {age_days} day(s)")
+
+
+def pipe_to_gcs(source_url, gcs_bucket, object_name, content_type=None, chunk_size=GCS_UPLOAD_CHUNK_SIZE,
+                read_chunk_size=TRANSFER_READ_CHUNK_SIZE, queue_depth=TRANSFER_QUEUE_DEPTH):
+    """
+    Copies source_url (S3 or HTTPS) into gs://bucket/object_name without touching local disk.
+    A reader thread pulls GetObject chunks into a bounded queue while this thread feeds a GCS resumable upload,
+    so download and upload overlap. On any error the resumable session is cancelled and nothing is committed.
+    Returns the number of bytes transferred.
+    """
+    chunks = queue.Queue(maxsize=queue_depth)
+    stop = threading.Event()
+
+    def hand_over(item):
+        """Blocks while the writer is behind, but gives up promptly if it has stopped. Returns False if it has."""
+        while not stop.is_set():
+            try:
+                chunks.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def read_source():
+        source = iter_media_chunks(source_url, chunk_size=read_chunk_size)
+        try:
+            for chunk in source:
+                if not hand_over(chunk):
+                    return
+            hand_over(_END_OF_STREAM)
+        except Exception as e:
+            hand_over(e)
+        finally:
+            source.close()  # Releases the S3 connection even if we stopped early
+
+    reader = threading.Thread(target=read_source, daemon=True)
+    reader.start()
+
+    transferred = 0
+    try:
+        blob = gcs_bucket.blob(object_name)
+        # BlobWriter cancels the resumable session if the with-block raises
+        with blob.open('wb', chunk_size=chunk_size, content_type=content_type) as writer:
+            while True:
+                item = chunks.get()
+                if item is _END_OF_STREAM:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                writer.write(item)
+                transferred += len(item)
+    finally:
+        stop.set()
+        reader.join(timeout=5)
+    return transferred
+
+
+if __name__ == '__main__':
+    # Run once per staging bucket at deploy time, with credentials allowed to update it:
+    # GCS_TEMPORARY_BUCKET_NAME=my-bucket python gcs_transfer.py
+    from google.cloud import storage
+    ensure_staging_lifecycle(storage.Client().bucket(os.environ["GCS_TEMPORARY_BUCKET_NAME"]))
@@ -0,0 +1,81 @@
+import os
+import time
+import google.generativeai as genai
+from media_fetch import parse_s3_url, s3_client
+from two_tier_cache import TwoTierCache
+
+# Tier 1: in-process LRU of uploaded Gemini file handles
+GEMINI_FILE_CACHE_LRU_SIZE = int(os.environ.get("GEMINI_FILE_CACHE_LRU_SIZE", 64))
+# Tier 2: DynamoDB table with a TTL attribute named 'expires_at'. Leave unset to run memory-only.
+GEMINI_FILE_CACHE_TABLE_NAME = os.environ.get("GEMINI_FILE_CACHE_TABLE_NAME")
+# Gemini deletes uploaded files on its own (48h today); stop handing out a handle this long before that
+GEMINI_FILE_EXPIRY_MARGIN_SECONDS = int(os.environ.get("GEMINI_FILE_EXPIRY_MARGIN_SECONDS", 3600))
+# Used when the API doesn't report an expiration time
+GEMINI_FILE_DEFAULT_TTL_SECONDS = int(os.environ.get("GEMINI_FILE_DEFAULT_TTL_SECONDS", 47 * 3600))
+# How long to wait for an uploaded video to finish processing before it can be prompted with
+GEMINI_FILE_ACTIVE_TIMEOUT_SECONDS = float(os.environ.get("GEMINI_FILE_ACTIVE_TIMEOUT_SECONDS", 300))
+GEMINI_FILE_POLL_SECONDS = float(os.environ.get("GEMINI_FILE_POLL_SECONDS", 2))
+
+_cache = TwoTierCache('Gemini file cache', GEMINI_FILE_CACHE_LRU_SIZE, GEMINI_FILE_CACHE_TABLE_NAME,
+                      extra_stats=('stale', 'uploads'))
+file_cache_stats = _cache.stats
+
+
+def video_cache_key(video_s3_url, media_sha256=None):
+    """
+    Content key for a video: the client's sha256 only when the object's own sha256 metadata agrees with it,
+    otherwise the S3 ETag and size (the ETag changes whenever the bytes do, even for multipart uploads).
+    A client hash alone could point this request at another video's Gemini file.
+    """
+    bucket, key = parse_s3_url(video_s3_url)
+    head = s3_client.head_object(Bucket=bucket, Key=key)
+    if media_sha256 and head.get('Metadata', {}).get('sha256') == media_sha256:
+        return f"sha256:{media_sha256}"
+    etag = head['ETag'].strip('"')
+    return f"s3etag:{etag}:{head['ContentLength']}"
+
+
+def _store(cache_key, video_file):
+    expiration_time = getattr(video_file, 'expiration_time', None)
+    expires_at = expiration_time.timestamp() if expiration_time else time.time() + GEMINI_FILE_DEFAULT_TTL_SECONDS
+    expires_at = int(expires_at) - GEMINI_FILE_EXPIRY_MARGIN_SECONDS
+    # The entry's TTL matches the file's own lifetime, so both sides expire together
+    _cache.put(cache_key, {'file_name': video_file.name, 'mime_type': video_file.mime_type}, expires_at)
+
+
+def wait_until_active(video_file, timeout_seconds=GEMINI_FILE_ACTIVE_TIMEOUT_SECONDS):
+    """Polls an uploaded file until Gemini has finished processing it; returns the ACTIVE file."""
+    deadline = time.monotonic() + timeout_seconds
+    while video_file.state.name == 'PROCESSING':
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Gemini file {video_file.name} still processing after {timeout_seconds}s")
+        time.sleep(GEMINI_FILE_POLL_SECONDS)
+        video_file = genai.get_file(video_file.name)
+    if video_file.state.name != 'ACTIVE':
+        raise ValueError(f"Gemini file {video_file.name} is {video_file.state.name}")
+    return video_file
+
+
+def get_or_upload_video(cache_key, upload):
+    """
+    Returns (gemini_file, cache_tier). A cached handle is checked with one files.get call; if it is gone or no
+    longer ACTIVE the entry is dropped and upload() runs instead (cache_tier None). upload() must return the
+    genai File it created.
+    """
+    handle, tier = _cache.get(cache_key)
+    if handle:
+        try:
+            video_file = genai.get_file(handle['file_name'])
+            if video_file.state.name == 'ACTIVE':
+                print(f"Reusing Gemini file {video_file.name} for {cache_key} ({tier} hit)")
+                return video_file, tier
+            print(f"Cached Gemini file {handle['file_name']} is {video_file.state.name}; uploading again")
+        except Exception as e:
+            print(f"Cached Gemini file {handle['file_name']} is unusable ({e}); uploading again")
+        _cache.count('stale')
+        _cache.forget(cache_key)
+
+    video_file = wait_until_active(upload())
+    _cache.count('uploads')
+    _store(cache_key, video_file)
+    return video_file, None
@@ -6,9 +6,19 @@ from google.cloud import storage  # NEW: For interacting with Google Cloud Stora
 import tempfile  # NEW: For creating temporary files
 from datetime import datetime, timezone
 import random
-
-s3_client = boto3.client('s3')
-
+import uuid
+import mimetypes
+from media_fetch import parse_s3_url, fetch_to_file
+from gcs_transfer import pipe_to_gcs, GCS_UPLOAD_CHUNK_SIZE, GCS_STAGING_PREFIX
+from gemini_file_cache import video_cache_key, get_or_upload_video, file_cache_stats
+from video_jobs import (claim_job, set_stage, finish_job, VIDEO_CAPTION_JOB_LEASE_SECONDS,
+                        VIDEO_CAPTION_JOB_LEASE_MARGIN_SECONDS)
+from keyframes import extract_keyframes, KEYFRAME_COUNT
+from video_segments import summarize_segments, segment_merge_prompt, segment_options, VIDEO_SEGMENT_FRAMES
+from prompt_templates import render_prompt, generation_config_for
+from model_router import ModelRouter, configure_gemini
+from caption_schema import (CAPTION_OUTPUT_MODE, STRUCTURED_GENERATION_CONFIG, structured_prompt,
+                            parse_structured_captions, looks_like_json)
 
 
 # Initialize Google Cloud Storage client and Gemini model
@@ -31,12 +41,14 @@ try:
     GCS_BUCKET_NAME = os.environ.get("GCS_TEMPORARY_BUCKET_NAME")
     if not GCS_BUCKET_NAME:
         raise ValueError("GCS_TEMPORARY_BUCKET_NAME environment variable is not set.")
+    # Staged videos are cleaned up by the bucket's lifecycle rule instead of a delete per request; the rule is set
+    # once at deploy time (python gcs_transfer.py), not from here
     gcs_bucket = gcs_client.bucket(GCS_BUCKET_NAME)
 
 
-    genai.configure(api_key=os.environ.get("GEMINI_API_KEY"))  # Ensure GEMINI_API_KEY is also set
-    GEMINI_MODEL_NAME = os.environ.get("GEMINI_MODEL_NAME", "gemini-pro-vision")
-    gemini_model = genai.GenerativeModel(GEMINI_MODEL_NAME)
+    configure_gemini(os.environ.get("GEMINI_API_KEY"))  # Ensure GEMINI_API_KEY is also set
+    # Primary model comes from GEMINI_MODEL_NAME, with a fallback behind a circuit breaker
+    video_router = ModelRouter('video')
 
 
     if os.path.exists(google_credentials_path):
@@ -53,132 +65,304 @@ dynamodb = boto3.resource('dynamodb')
 DYNAMODB_TABLE_NAME = os.environ.get("DYNAMODB_TABLE_NAME", "ScheduledSocialPosts")
 table = dynamodb.Table(DYNAMODB_TABLE_NAME)
 
+# Whole-call deadline for one Gemini video request (retries included)
+VIDEO_MODEL_CALL_DEADLINE_SECONDS = float(os.environ.get("VIDEO_MODEL_CALL_DEADLINE_SECONDS", 120))
 
-def generate_video_captions_with_gemini(gcs_video_uri, style, custom_prompt, target_audience, business_goals,
-                                        num_variants):
 
-    print(f"Generating captions for GCS video URI: {gcs_video_uri} with style: {style}")
+def build_video_prompt(style, custom_prompt, target_audience, business_goals, num_variants):
+    """Renders the caption instruction shared by the full-video and keyframe modes from the prompt registry."""
+    if style == 'high_engagement':
+        return render_prompt('video.high_engagement')
+    if style == 'story_style':
+        return render_prompt('video.story_style')
+    if style == 'viral_potential':
+        return render_prompt('video.viral_potential')
+    if style == 'targeted' and target_audience and business_goals:
+        return render_prompt('video.targeted', target_audience=target_audience, business_goals=business_goals)
+    if style == 'A/B Test' and num_variants > 0:
+        return render_prompt('video.ab_test', num_variants=num_variants)
+    if style == 'custom' and custom_prompt:
+        return render_prompt('video.custom', custom_prompt=custom_prompt)  # Custom prompt overrides everything
+    return render_prompt('video.standard')
+
+
+def _parse_video_captions(raw_text):
+    """Simple parsing for numbered or bulleted lists from Gemini's response."""
+    captions = []
+    lines = raw_text.split('\n')
+    for line in lines:
+        line = line.strip()
+        if line.startswith(('1.', '2.', '3.', '-', '*')) or (line and line[0].isdigit() and '.' in line):
+
+            caption_text = line.split('.', 1)[-1].strip() if '.' in line else line.split(' ', 1)[-1].strip()
+            captions.append({'text': caption_text, 'engagement_score': random.randint(70, 99)})  # Mock score
+        elif line:  # If not a numbered list, treat each non-empty line as a caption
+            captions.append({'text': line, 'engagement_score': random.randint(70, 99)})
+
+
+    if not captions and raw_text:
+        captions.append({'text': raw_text, 'engagement_score': random.randint(70, 99)})
+
+    return captions
+
+
+def _video_prompt(prompt):
+    return structured_prompt(prompt.text) if CAPTION_OUTPUT_MODE == 'json' else prompt.text
+
+
+def _generate_and_parse(prompt_parts, prompt):
+    """
+    One model call; schema-constrained JSON in 'json' mode, with the list heuristics only for replies that aren't
+    JSON at all. A JSON reply that fails to decode or validate yields no captions.
+    Returns (captions, name of the model that served them).
+    """
+    if CAPTION_OUTPUT_MODE == 'json':
+        generation_config = generation_config_for(prompt, STRUCTURED_GENERATION_CONFIG)
+    else:
+        generation_config = generation_config_for(prompt)
+    # Deadline and jittered retries; video understanding is slower than images, hence its own deadline
+    raw_text, model_used = video_router.generate_text(prompt_parts, generation_config=generation_config,
+                                                      deadline_seconds=VIDEO_MODEL_CALL_DEADLINE_SECONDS)
+    raw_text = raw_text.strip()
+    print(f"Raw Gemini response: {raw_text}")
+
+    if CAPTION_OUTPUT_MODE == 'json' and looks_like_json(raw_text):
+        try:
+            return parse_structured_captions(raw_text), model_used
+        except ValueError as e:
+            print(f"Structured caption response failed validation: {e}")
+            return [], model_used
+    return _parse_video_captions(raw_text), model_used
+
+
+def upload_staged_video(gcs_object_name, mime_type):
+    """Streams a staged GCS object into the Gemini file API and returns the genai File."""
+    # The Gemini file API takes a path or file object, not a gs:// URI
+    with gcs_bucket.blob(gcs_object_name).open('rb', chunk_size=GCS_UPLOAD_CHUNK_SIZE) as staged_video:
+        return genai.upload_file(staged_video, mime_type=mime_type, display_name=gcs_object_name)
+
+
+def generate_video_captions_with_gemini(video_file, style, custom_prompt, target_audience, business_goals,
+                                        num_variants):
 
+    print(f"Generating captions for Gemini file: {video_file.name} with style: {style}")
 
-    prompt_parts = []
 
-    # Add video input using the GCS URI
-    video_input = genai.upload_file(gcs_video_uri)  # This function implies fetching from a URL/GCS URI
-    prompt_parts.append(video_input)
+    prompt_parts = [video_file]
 
+    prompt = build_video_prompt(style, custom_prompt, target_audience, business_goals, num_variants)
+    prompt_parts.append(_video_prompt(prompt))
 
-    base_prompt = "Generate social media captions for this video."
-    if style == 'high_engagement':
-        base_prompt += " Focus on high engagement, using trending topics and questions to encourage interaction. Provide 3 options."
-    elif style == 'story_style':
-        base_prompt += " Create a narrative or story-telling style caption. Provide 3 options."
-    elif style == 'viral_potential':
-        base_prompt += " Aim for virality with catchy phrases, humor, or strong calls to action. Provide 3 options."
-    elif style == 'targeted' and target_audience and business_goals:
-        base_prompt += f" Target a {target_audience} audience to achieve the goal of {business_goals}. Provide 3 options."
-    elif style == 'A/B Test' and num_variants > 0:
-        base_prompt += f" Generate {num_variants} distinct variants for A/B testing, exploring different angles or tones."
-    elif style == 'custom' and custom_prompt:
-        base_prompt = custom_prompt  # Custom prompt overrides everything
-    else:
-        base_prompt += " Provide 3 standard, descriptive captions."
+    return _generate_and_parse(prompt_parts, prompt)
 
-    prompt_parts.append(base_prompt)
 
-    try:
-        response = gemini_model.generate_content(prompt_parts)
-        response.resolve()  # Ensure the content is available if it was streamed
+def generate_video_captions_from_keyframes(keyframes, style, custom_prompt, target_audience, business_goals,
+                                           num_variants):
+    """Captions a video from a handful of downscaled frames instead of the whole file."""
+    print(f"Generating captions from {len(keyframes)} keyframes with style: {style}")
 
-        raw_text = response.text.strip()
-        print(f"Raw Gemini response: {raw_text}")
+    prompt_parts = [render_prompt(
+        'video.keyframes_intro',
+        frame_count=len(keyframes),
+        timestamps=', '.join(str(timestamp) for timestamp, _ in keyframes)
+    ).text]
+    prompt_parts.extend({'mime_type': 'image/jpeg', 'data': frame_bytes} for _, frame_bytes in keyframes)
+    prompt = build_video_prompt(style, custom_prompt, target_audience, business_goals, num_variants)
+    prompt_parts.append(_video_prompt(prompt))
 
+    return _generate_and_parse(prompt_parts, prompt)
 
-        captions = []
-        # Simple parsing for numbered or bulleted lists from Gemini's response
-        lines = raw_text.split('\n')
-        for line in lines:
-            line = line.strip()
-            if line.startswith(('1.', '2.', '3.', '-', '*')) or (line and line[0].isdigit() and '.' in line):
 
-                caption_text = line.split('.', 1)[-1].strip() if '.' in line else line.split(' ', 1)[-1].strip()
-                captions.append({'text': caption_text, 'engagement_score': random.randint(70, 99)})  # Mock score
-            elif line:  # If not a numbered list, treat each non-empty line as a caption
-                captions.append({'text': line, 'engagement_score': random.randint(70, 99)})
+def caption_from_keyframes(video_s3_url, style, custom_prompt, target_audience, business_goals,
+                           num_variants, num_keyframes, keyframe_strategy, on_stage=None):
+    """Keyframe mode: decode locally, send only sampled frames to the model. No GCS or Gemini file upload."""
+    on_stage = on_stage or (lambda stage: None)
+    # mkstemp gives every invocation its own file, even when two share a sandbox
+    fd, temp_video_path = tempfile.mkstemp(suffix=os.path.splitext(video_s3_url.split('?')[0])[1])
+    os.close(fd)
+    try:
+        on_stage('fetching')
+        fetch_to_file(video_s3_url, temp_video_path)
+        keyframes = extract_keyframes(temp_video_path, num_frames=num_keyframes, strategy=keyframe_strategy)
+        on_stage('generating')
+        captions, model_used = generate_video_captions_from_keyframes(
+            keyframes, style, custom_prompt, target_audience, business_goals, num_variants
+        )
+        return {
+            'captions': captions,
+            'caption_mode': 'keyframes',
+            'model_used': model_used,
+            'keyframe_timestamps': [timestamp for timestamp, _ in keyframes],
+            'bytes_sent_to_model': sum(len(frame_bytes) for _, frame_bytes in keyframes)
+        }
+    finally:
+        if os.path.exists(temp_video_path):
+            os.remove(temp_video_path)
 
 
-        if not captions and raw_text:
-            captions.append({'text': raw_text, 'engagement_score': random.randint(70, 99)})
+def caption_from_segments(video_s3_url, style, custom_prompt, target_audience, business_goals, num_variants,
+                          segment_seconds, segment_concurrency, on_stage=None):
+    """
+    Segmented mode for long videos: describe each time window from a few frames, concurrently, then write the
+    captions from those descriptions in one text-only call. Latency tracks segment_seconds rather than the
+    video length, as long as there are enough concurrent calls to go around.
+    """
+    on_stage = on_stage or (lambda stage: None)
+    fd, temp_video_path = tempfile.mkstemp(suffix=os.path.splitext(video_s3_url.split('?')[0])[1])
+    os.close(fd)
+    try:
+        on_stage('fetching')
+        fetch_to_file(video_s3_url, temp_video_path)
+        on_stage('describing')
+        duration, summaries = summarize_segments(temp_video_path, video_router, segment_seconds,
+                                                 VIDEO_SEGMENT_FRAMES, segment_concurrency)
+    finally:
+        if os.path.exists(temp_video_path):
+            os.remove(temp_video_path)
 
-        return captions
+    on_stage('generating')
+    prompt = build_video_prompt(style, custom_prompt, target_audience, business_goals, num_variants)
+    prompt_parts = [segment_merge_prompt(duration, summaries).text, _video_prompt(prompt)]
+    captions, model_used = _generate_and_parse(prompt_parts, prompt)
+    return {
+        'captions': captions,
+        'caption_mode': 'segments',
+        'model_used': model_used,
+        'video_duration_seconds': duration,
+        'segments': summaries
+    }
+
+
+def caption_full_video(video_s3_url, style, custom_prompt, target_audience, business_goals, num_variants,
+                       media_sha256=None, on_stage=None):
+    """Full mode: the whole video goes to Gemini through the file API, reusing an earlier upload when we can."""
+    on_stage = on_stage or (lambda stage: None)
+    s3_bucket_name, s3_key = parse_s3_url(video_s3_url)
+    content_type = mimetypes.guess_type(s3_key)[0] or 'video/mp4'
+    cache_key = video_cache_key(video_s3_url, media_sha256)
+
+    def stage_and_upload():
+        # --- Steps 1+2 (only without a cached handle): S3 -> GCS -> Gemini file API, no /tmp staging ---
+        # The uuid keeps concurrent invocations for the same key from sharing one object
+        gcs_object_name = (f"{GCS_STAGING_PREFIX}{datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S')}_"
+                           f"{uuid.uuid4().hex}_{os.path.basename(s3_key)}")
+        on_stage('staging')
+        print(f"Streaming video from S3://{s3_bucket_name}/{s3_key} to GCS bucket: {GCS_BUCKET_NAME}...")
+        transferred = pipe_to_gcs(video_s3_url, gcs_bucket, gcs_object_name, content_type)
+        print(f"Video streamed to gs://{GCS_BUCKET_NAME}/{gcs_object_name} ({transferred} bytes)")
+        on_stage('uploading')
+        video_file = upload_staged_video(gcs_object_name, content_type)
+        on_stage('processing')  # Gemini has the bytes; get_or_upload_video waits for it to go ACTIVE
+        return video_file
+
+    # Another style for the same video reuses the earlier upload while Gemini still holds the file
+    video_file, file_cache_tier = get_or_upload_video(cache_key, stage_and_upload)
+
+    # --- Step 3: Generate captions using the uploaded Gemini file ---
+    on_stage('generating')
+    captions, model_used = generate_video_captions_with_gemini(
+        video_file,
+        style,
+        custom_prompt,
+        target_audience,
+        business_goals,
+        num_variants
+    )
+    return {
+        'captions': captions,
+        'caption_mode': 'full',
+        'model_used': model_used,
+        'file_cache': {'hit': file_cache_tier is not None, 'tier': file_cache_tier, 'stats': file_cache_stats}
+    }
+
+
+def caption_video(request, on_stage=None):
+    """
+    Runs one video caption request (the lambda event or a job's stored request) and returns the response body.
+    on_stage(stage) is called as the work moves along, so async jobs can report progress. Raises on failure.
+    """
+    video_s3_url = request.get('video_s3_url')
+    style = request.get('style', 'high_engagement')
+    custom_prompt = request.get('custom_prompt')
+    target_audience = request.get('target_audience')
+    business_goals = request.get('business_goals')
+    num_variants = request.get('num_variants', 3)  # For A/B testing
+    # 'full' sends the whole video to Gemini; 'keyframes' sends a few sampled, downscaled frames;
+    # 'segments' describes time windows concurrently and merges the descriptions (for long videos)
+    caption_mode = request.get('caption_mode', 'full')
+    num_keyframes = request.get('num_keyframes', KEYFRAME_COUNT)
+    keyframe_strategy = request.get('keyframe_strategy', 'uniform')  # 'uniform' or 'scene'
+    media_sha256 = request.get('media_sha256')  # Client content hash; keys the Gemini file cache only if S3 agrees
+    segment_seconds, segment_concurrency = segment_options(request)  # Clamped; ValueError if not numbers
+
+    if caption_mode == 'keyframes':
+        return caption_from_keyframes(video_s3_url, style, custom_prompt, target_audience, business_goals,
+                                      num_variants, num_keyframes, keyframe_strategy, on_stage)
+    if caption_mode == 'segments':
+        return caption_from_segments(video_s3_url, style, custom_prompt, target_audience, business_goals,
+                                     num_variants, segment_seconds, segment_concurrency, on_stage)
+    return caption_full_video(video_s3_url, style, custom_prompt, target_audience, business_goals, num_variants,
+                              media_sha256, on_stage)
+
+
+def run_caption_job(event, context=None):
+    """Worker side of video_caption_jobs_lambda: does the work and records stages and the result in DynamoDB."""
+    job_id = event['job_id']
+    # This invocation can't outlive its own timeout, so the lease can end right after it
+    lease_seconds = (context.get_remaining_time_in_millis() / 1000 + VIDEO_CAPTION_JOB_LEASE_MARGIN_SECONDS
+                     if context else VIDEO_CAPTION_JOB_LEASE_SECONDS)
+    # Async invokes can be delivered more than once; only one delivery at a time does the work, and a retry after
+    # a killed worker takes over once that worker's lease has run out
+    if not claim_job(job_id, lease_seconds):
+        print(f"Video caption job {job_id} is already running or finished; ignoring duplicate delivery")
+        return {'job_id': job_id, 'status': 'duplicate'}
+    try:
+        result = caption_video(event, on_stage=lambda stage: set_stage(job_id, stage))
+        finish_job(job_id, result=result)
+        return {'job_id': job_id, 'status': 'succeeded'}
     except Exception as e:
-        print(f"Error calling Gemini API for video: {e}")
-        return []
+        print(f"Error processing video caption job {job_id}: {e}")
+        finish_job(job_id, error=f'Failed to generate video captions: {str(e)}')
+        return {'job_id': job_id, 'status': 'failed'}
 
 
 def lambda_handler(event, context):
     print(f"Received event: {json.dumps(event)}")
 
-    video_s3_url = event.get('video_s3_url')
-    style = event.get('style', 'high_engagement')
-    custom_prompt = event.get('custom_prompt')
-    target_audience = event.get('target_audience')
-    business_goals = event.get('business_goals')
-    num_variants = event.get('num_variants', 3)  # For A/B testing
+    # Invoked asynchronously by video_caption_jobs_lambda: run as the job worker
+    if event.get('job_id'):
+        return run_caption_job(event, context)
 
+    video_s3_url = event.get('video_s3_url')
     if not video_s3_url:
         return {
             'statusCode': 400,
             'body': json.dumps({'message': 'Missing video_s3_url in event.'})
         }
 
-
-    try:
-        url_parts = video_s3_url.split('/')
-        s3_bucket_name = url_parts[2].split('.')[0]
-        s3_key = '/'.join(url_parts[3:])
-    except Exception as e:
-        print(f"Could not parse S3 URL: {video_s3_url}, Error: {e}")
+    if not parse_s3_url(video_s3_url):
+        print(f"Could not parse S3 URL: {video_s3_url}")
         return {
             'statusCode': 400,
             'body': json.dumps({'message': 'Invalid S3 video URL format.'})
         }
 
-    temp_video_path = None
-    gcs_temp_object_name = None
-    gcs_video_uri = None
-
     try:
-        # --- Step 1: Download video from S3 to Lambda's /tmp directory ---
-        print(f"Downloading video from S3://{s3_bucket_name}/{s3_key} to /tmp...")
-        temp_video_path = os.path.join(tempfile.gettempdir(), os.path.basename(s3_key))
-        s3_client.download_file(s3_bucket_name, s3_key, temp_video_path)
-        print(f"Video downloaded to {temp_video_path}")
-
-        # --- Step 2: Upload video from /tmp to Google Cloud Storage (GCS) ---
-        print(f"Uploading video from /tmp to GCS bucket: {GCS_BUCKET_NAME}...")
-        gcs_temp_object_name = f"temp_gemini_video_{datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S')}_{os.path.basename(s3_key)}"
-        gcs_blob = gcs_bucket.blob(gcs_temp_object_name)
-        gcs_blob.upload_from_filename(temp_video_path)
-        gcs_video_uri = f"gs://{GCS_BUCKET_NAME}/{gcs_temp_object_name}"
-        print(f"Video uploaded to GCS: {gcs_video_uri}")
-
-        # --- Step 3: Generate captions using Gemini from GCS URI ---
-        captions = generate_video_captions_with_gemini(
-            gcs_video_uri,
-            style,
-            custom_prompt,
-            target_audience,
-            business_goals,
-            num_variants
-        )
+        segment_options(event)
+    except ValueError as e:
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'message': str(e)})
+        }
 
+    try:
         return {
             'statusCode': 200,
             'headers': {
                 'Content-Type': 'application/json',
                 'Access-Control-Allow-Origin': '*'
             },
-            'body': json.dumps({'captions': captions})
+            'body': json.dumps(caption_video(event))
         }
 
     except Exception as e:
@@ -191,19 +375,3 @@ def lambda_handler(event, context):
             },
             'body': json.dumps({'message': f'Failed to generate video captions: {str(e)}'})
         }
-    finally:
-        # --- Step 4: Clean up temporary files ---
-        # Remove local temp file
-        if temp_video_path and os.path.exists(temp_video_path):
-            os.remove(temp_video_path)
-            print(f"Cleaned up local temp file: {temp_video_path}")
-
-        # Remove temporary video from GCS
-        if gcs_temp_object_name:
-            try:
-                gcs_blob = gcs_bucket.blob(gcs_temp_object_name)
-                if gcs_blob.exists():
-                    gcs_blob.delete()
-                    print(f"Cleaned up GCS temp object: {gcs_temp_object_name}")
-            except Exception as e:
-                print(f"Error cleaning up GCS object {gcs_temp_object_name}: {e}")
\ No newline at end of file
@@ -1,181 +1,272 @@
 import json
-import google.generativeai as genai
 from PIL import Image
-import requests
 import io
 import os
 import base64 # For converting image from URL to base64 for Gemini if needed
 import uuid # For temporary file names
+import hashlib
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from caption_cache import prompt_fingerprint, make_cache_key, get_cached, put_cached, cache_stats
+from media_fetch import fetch_bytes, verified_sha256
+from rate_limiter import gemini_rate_limiter
+from image_processing import prepare_model_image, model_preprocess_signature, MODEL_IMAGE_PREPROCESS
+from prompt_templates import render_prompt, generation_config_for
+from model_invoker import (ModelDeadlineExceeded, RateLimitTimeout, invoker_stats, MODEL_CALL_DEADLINE_SECONDS,
+                           RETRYABLE_ERRORS)
+from model_router import ModelRouter, configure_gemini, get_model
+from caption_schema import (CAPTION_OUTPUT_MODE, STRUCTURED_GENERATION_CONFIG, structured_prompt,
+                            parse_structured_captions, looks_like_json)
+
+
+configure_gemini(os.environ.get("GEMINI_API_KEY"))
+
+# Primary/fallback Gemini models with a circuit breaker (see model_router.MODEL_ROUTES['caption'])
+caption_router = ModelRouter('caption')
+
+# Bulk captioning: concurrent model calls per invocation (on top of the shared token-bucket rate limit)
+BATCH_CAPTION_MAX_CONCURRENCY = int(os.environ.get("BATCH_CAPTION_MAX_CONCURRENCY", 4))
+BATCH_CAPTION_MAX_RETRIES = int(os.environ.get("BATCH_CAPTION_MAX_RETRIES", 2))
+MAX_BATCH_CAPTION_ITEMS = int(os.environ.get("MAX_BATCH_CAPTION_ITEMS", 200))
+MAX_STYLES_PER_REQUEST = 6
+BATCH_ITEM_FIELDS = ('image_s3_url', 'style', 'custom_prompt', 'target_audience', 'business_goals', 'num_variants',
+                     'media_sha256', 'renditions', 'force_refresh')
+
+# Caption styles backed by a fixed template in the prompt registry
+STYLE_TEMPLATES = {
+    'high_engagement': 'caption.high_engagement',
+    'story_style': 'caption.story_style',
+    'viral_potential': 'caption.viral_potential',
+}
 
+def _caption_entry(caption_text, score):
+    return {
+        'text': caption_text.strip(),
+        'engagement_score': score, # Score might not be present for all styles
+        'word_count': len(caption_text.split()),
+        'character_count': len(caption_text)
+    }
 
-genai.configure(api_key=os.environ.get("GEMINI_API_KEY"))
-
-# Initialize the Gemini model
-model = genai.GenerativeModel('gemini-1.5-flash')
-
-# Engagement-focused prompt templates (copied from your original script)
-engagement_prompts = {
-    'high_engagement': """
-    Analyze this food image and create 3 highly engaging Instagram captions for a food delivery service.
-
-    Requirements for maximum engagement:
-    1. Start with attention-grabbing hooks (questions, bold statements, emojis)
-    2. Include emotional triggers (craving, comfort, satisfaction)
-    3. Add interactive elements (ask questions, encourage comments)
-    4. Use food delivery specific CTAs
-    5. Include trending food hashtags
-    6. Keep it conversational and relatable
-    7. Create FOMO (fear of missing out)
-
-    Format each caption as:
-    Caption 1: [caption text]
-    Engagement Score: [rate 1-10 for potential engagement]
-
-    Focus on captions that make people want to:
-    - Comment about their cravings
-    - Tag friends
-    - Share the post
-    - Place an order immediately
-    """,
-
-    'story_style': """
-    Create 5 Instagram captions for this food image that tell a story and increase engagement.
-
-    Style requirements:
-    1. Use storytelling techniques
-    2. Create relatable scenarios
-    3. Include sensory descriptions (taste, smell, texture)
-    4. Add personal touches
-    5. End with engaging questions
-    6. Use appropriate emojis strategically
-
-    Make people feel like they're experiencing the food through your words.
-    """,
-
-    'viral_potential': """
-    Generate 3 Instagram captions with viral potential for this food delivery image.
-
-    Viral elements to include:
-    1. Trending phrases and slang
-    2. Relatable situations everyone experiences
-    3. Humor or wit
-    4. Universal food experiences
-    5. Shareable moments
-    6. Interactive challenges or questions
-
-    Think about what makes people share food content and incorporate those elements.
-    """
-}
 
-def _parse_captions(response_text):
-    """Parse the generated captions from Gemini response."""
-    captions = []
-    lines = response_text.split('\n')
+class CaptionStreamParser:
+    """
+    Incremental version of the caption parser: feed() response text as it streams in and get back
+    every caption that is complete, i.e. once the next "Caption N:" / "Variant N (...):" line has started.
+    """
 
-    current_caption = ""
-    current_score = None
+    def __init__(self):
+        self._partial_line = ""
+        self._current_caption = ""
+        self._current_score = None
 
-    for line in lines:
+    def _process_line(self, line, completed):
         line = line.strip()
-        # Check for "Caption X:" or "Caption X (Strategy):" to start a new caption
+        # Check for "Caption X:" or "Caption X (Strategy):" / "Variant X (Strategy):" to start a new caption
         if (line.startswith('Caption') or line.startswith('Variant')) and ':' in line:
-            if current_caption: # If there's a current caption being built, save it first
-                captions.append({
-                    'text': current_caption.strip(),
-                    'engagement_score': current_score,
-                    'word_count': len(current_caption.split()),
-                    'character_count': len(current_caption)
-                })
+            if self._current_caption: # If there's a current caption being built, save it first
+                completed.append(_caption_entry(self._current_caption, self._current_score))
 
             # Reset for the new caption
             parts = line.split(':', 1)
-            current_caption = parts[1].strip() if len(parts) > 1 else "" # Get text after colon
-            current_score = None
+            self._current_caption = parts[1].strip() if len(parts) > 1 else "" # Get text after colon
+            self._current_score = None
 
         elif line.startswith('Engagement Score') and ':' in line:
             try:
                 score_str = line.split(':')[1].strip().split('/')[0].strip() # Handle "/10" format
-                current_score = int(score_str)
+                self._current_score = int(score_str)
             except ValueError: # Handle cases where score might not be a clean integer
-                current_score = None
-
-        elif line.startswith('Target Appeal') and ':' in line: # For targeted captions
-            current_caption += "\n" + line
+                self._current_score = None
+
+        elif (line.startswith('Target Appeal') or line.startswith('Business Impact')) and ':' in line: # For targeted captions
+            self._current_caption += "\n" + line
+
+        elif self._current_caption and line and not (line.startswith('Engagement Score') or line.startswith('Target Appeal') or line.startswith('Business Impact') or line.startswith('Variant') or line.startswith('Caption')):
+            self._current_caption += " " + line # Append lines to the current caption
+
+    def feed(self, text):
+        """Consumes a chunk of response text; returns the captions completed by it."""
+        completed = []
+        lines = (self._partial_line + text).split('\n')
+        self._partial_line = lines.pop() # The last piece may be an unfinished line
+        for line in lines:
+            self._process_line(line, completed)
+        return completed
+
+    def close(self):
+        """Flushes the final line and returns whatever captions are left."""
+        completed = []
+        self._process_line(self._partial_line, completed)
+        self._partial_line = ""
+        # Add the last caption if anything was built
+        if self._current_caption:
+            completed.append(_caption_entry(self._current_caption, self._current_score))
+            self._current_caption = ""
+        return completed
 
-        elif line.startswith('Business Impact') and ':' in line: # For targeted captions
-            current_caption += "\n" + line
 
-        elif line.startswith('Variant') and '(' in line and ')' in line and ':' in line: # For A/B test captions strategy
-            if current_caption:
-                captions.append({
-                    'text': current_caption.strip(),
-                    'engagement_score': current_score, # Score might not be present for all styles
-                    'word_count': len(current_caption.split()),
-                    'character_count': len(current_caption)
-                })
-            parts = line.split(':', 1)
-            current_caption = parts[1].strip() if len(parts) > 1 else ""
-            current_score = None # Reset score
-
-        elif current_caption and line and not (line.startswith('Engagement Score') or line.startswith('Target Appeal') or line.startswith('Business Impact') or line.startswith('Variant') or line.startswith('Caption')):
-            current_caption += " " + line # Append lines to the current caption
-
-    # Add the last caption if anything was built
-    if current_caption:
-        captions.append({
-            'text': current_caption.strip(),
-            'engagement_score': current_score,
-            'word_count': len(current_caption.split()),
-            'character_count': len(current_caption)
-        })
-
-    return captions
-
-def generate_targeted_captions(image, target_audience, business_goals):
-    targeted_prompt = f"""
-    Analyze this food delivery image and create 3 Instagram captions optimized for:
-
-    Target Audience: {target_audience}
-    Business Goals: {business_goals}
-
-    Requirements:
-    1. Speak directly to the target audience's interests and pain points
-    2. Align with business goals while maximizing engagement
-    3. Use language and tone that resonates with this specific audience
-    4. Include relevant hashtags for this demographic
-    5. Add CTAs that support the business goals
-    6. Create urgency and desire specific to this audience
-
-    Make each caption feel personally crafted for this audience while driving the desired business outcomes.
-
-    Format as:
-    Caption 1: [caption]
-    Target Appeal: [why this appeals to the audience]
-    Business Impact: [how this supports business goals]
+def _parse_captions(response_text):
+    """Parse the generated captions from Gemini response."""
+    parser = CaptionStreamParser()
+    return parser.feed(response_text) + parser.close()
+
+
+def _prompt_for_style(style, custom_prompt, target_audience, business_goals, num_variants):
+    """Renders the registry template for this style (a RenderedPrompt with its version and token budgets)."""
+    if custom_prompt:
+        return render_prompt('caption.custom', custom_prompt=custom_prompt)
+    if style == 'targeted':
+        return render_prompt('caption.targeted', target_audience=target_audience, business_goals=business_goals)
+    if style == 'A/B Test':
+        return render_prompt('caption.ab_test', num_variants=num_variants)
+    return render_prompt(STYLE_TEMPLATES.get(style, 'caption.high_engagement'))
+
+
+def _generate_response_text(image, style, custom_prompt, target_audience, business_goals, num_variants,
+                            output_mode=CAPTION_OUTPUT_MODE):
+    """Runs the model call for the requested style. Returns (raw response text, name of the model that served it)."""
+    prompt = _prompt_for_style(style, custom_prompt, target_audience, business_goals, num_variants)
+    # Deadline, retries and optional hedging; every attempt draws from the shared Gemini quota
+    if output_mode == 'json':
+        return caption_router.generate_text([structured_prompt(prompt.text), image],
+                                            generation_config=generation_config_for(prompt, STRUCTURED_GENERATION_CONFIG),
+                                            rate_limiter=gemini_rate_limiter)
+    return caption_router.generate_text([prompt.text, image], generation_config=generation_config_for(prompt),
+                                        rate_limiter=gemini_rate_limiter)
+
+
+def parse_caption_response(response_text, output_mode=CAPTION_OUTPUT_MODE):
+    """
+    Validated JSON decode in 'json' mode. The line heuristics are only used for replies that aren't JSON at all
+    (the model ignored the schema); a JSON reply that fails to decode or validate yields no captions.
     """
-    response = model.generate_content([targeted_prompt, image])
-    return response.text
-
-def generate_ab_test_captions(image, num_variants=5):
-    ab_test_prompt = f"""
-    Create {num_variants} distinctly different Instagram captions for this food delivery image.
-    Each caption should test different engagement strategies:
-
-    1. Emotional Appeal - Focus on feelings and comfort
-    2. Urgency/Scarcity - Create FOMO and immediate action
-    3. Social Proof - Emphasize popularity and reviews
-    4. Question/Interactive - Encourage comments and engagement
-    5. Humor/Personality - Use wit and brand personality
-
-    For each caption, explain the strategy being tested.
-
-    Format as:
-    Variant 1 (Strategy): [caption]
-    Variant 2 (Strategy): [caption]
-    etc.
+    if output_mode == 'json' and looks_like_json(response_text):
+        try:
+            return parse_structured_captions(response_text)
+        except ValueError as e:
+            print(f"Structured caption response failed validation: {e}")
+            return []
+    return _parse_captions(response_text)
+
+
+def _caption_cache_key(media_sha256, style, custom_prompt, target_audience, business_goals, num_variants, renditions,
+                       output_mode=CAPTION_OUTPUT_MODE):
+    """Cache key: image content hash + normalized prompt parameters + prompt template version."""
+    fingerprint = prompt_fingerprint(
+        template=_prompt_for_style(style, custom_prompt, target_audience, business_goals, num_variants).template_key,
+        style=style,
+        custom_prompt=custom_prompt,
+        target_audience=target_audience if style == 'targeted' else None,
+        business_goals=business_goals if style == 'targeted' else None,
+        num_variants=num_variants if style == 'A/B Test' else None,
+        source='model_input' if renditions.get('model_input') else 'original',
+        preprocess=model_preprocess_signature(),
+        output_mode=output_mode
+    )
+    return make_cache_key(media_sha256, fingerprint)
+
+
+def _load_model_image(image_bytes):
+    if MODEL_IMAGE_PREPROCESS:
+        # Bounded long edge, no EXIF, re-encoded: far fewer request bytes for the same captions
+        return prepare_model_image(image_bytes)
+    image = Image.open(io.BytesIO(image_bytes))
+    # Image.open only reads the header; decode now so style threads sharing this image never race on the lazy load
+    image.load()
+    return image
+
+
+def caption_image_styles(image_s3_url, styles, custom_prompt=None, target_audience=None, business_goals=None,
+                         num_variants=3, media_sha256=None, renditions=None, force_refresh=False):
     """
-    response = model.generate_content([ab_test_prompt, image])
-    return response.text
+    Captions one image in one or more styles, going through the result cache.
+    The image is downloaded and pre-processed once; model calls for uncached styles run concurrently.
+    Returns {style: result}. With several styles, a style whose model call fails gets {'status': 'error', 'message'}
+    instead of captions and the others are still returned; raises only if every style failed. Raises on download
+    errors, and on model errors for a single style.
+    """
+    renditions = renditions or {}
+    # Read through the pooled S3 client; the small model-input rendition is enough for captioning
+    source_url = renditions.get('model_input') or image_s3_url
+
+    def prompt_for(style):
+        # With several styles, a custom prompt belongs to the 'custom' style only
+        return custom_prompt if len(styles) == 1 or style == 'custom' else None
+
+    image_bytes = None
+    # The client's hash only keys the cache once S3 confirms it; otherwise hash what we download
+    # (a hit still saves the model call)
+    media_sha256 = verified_sha256(source_url, media_sha256)
+    if not media_sha256:
+        image_bytes = fetch_bytes(source_url)
+        media_sha256 = hashlib.sha256(image_bytes).hexdigest()
+
+    results = {}
+    cache_keys = {}
+    uncached_styles = []
+    for style in styles:
+        cache_keys[style] = _caption_cache_key(media_sha256, style, prompt_for(style), target_audience,
+                                               business_goals, num_variants, renditions)
+        cached, cache_tier = get_cached(cache_keys[style], force_refresh)
+        if cached:
+            results[style] = {
+                'captions': cached['captions'],
+                'original_response': cached['original_response'],
+                'model_used': cached.get('model_used'),
+                'style_used': style,
+                'media_sha256': media_sha256,
+                'cache': {'hit': True, 'tier': cache_tier}
+            }
+        else:
+            uncached_styles.append(style)
+
+    if uncached_styles:
+        if image_bytes is None:
+            image_bytes = fetch_bytes(source_url)
+        image = _load_model_image(image_bytes)
+        errors = []
+
+        def run_style(style):
+            try:
+                response_text, model_used = _generate_response_text(image, style, prompt_for(style), target_audience,
+                                                                    business_goals, num_variants)
+            except Exception as e:
+                if len(styles) == 1:
+                    raise
+                print(f"Style {style} failed for {image_s3_url}: {e}")
+                errors.append(e)
+                return style, {'status': 'error', 'message': str(e), 'captions': [], 'style_used': style,
+                               'media_sha256': media_sha256}
+            captions = parse_caption_response(response_text)
+            put_cached(cache_keys[style], {'captions': captions, 'original_response': response_text,
+                                           'model_used': model_used})
+            return style, {
+                'captions': captions,
+                'original_response': response_text,
+                'model_used': model_used,
+                'style_used': style,
+                'media_sha256': media_sha256,
+                'cache': {'hit': False, 'tier': None}
+            }
+
+        if len(uncached_styles) == 1:
+            results.update([run_style(uncached_styles[0])])
+        else:
+            # Total latency is roughly the slowest style rather than the sum
+            with ThreadPoolExecutor(max_workers=len(uncached_styles)) as executor:
+                results.update(executor.map(run_style, uncached_styles))
+        if len(errors) == len(styles):
+            raise errors[-1]
+
+    return {style: results[style] for style in styles}
+
+
+def caption_image(image_s3_url, style='high_engagement', custom_prompt=None, target_audience=None,
+                  business_goals=None, num_variants=3, media_sha256=None, renditions=None, force_refresh=False):
+    """Captions one image in a single style. Raises on download or model errors."""
+    return caption_image_styles(image_s3_url, [style], custom_prompt, target_audience, business_goals, num_variants,
+                                media_sha256, renditions, force_refresh)[style]
 
 
 def lambda_handler(event, context):
@@ -188,7 +279,7 @@ def lambda_handler(event, context):
             'headers': { 'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*' },
             'body': json.dumps({'message': 'Gemini API key not configured.'})
         }
-    genai.configure(api_key=gemini_api_key)
+    configure_gemini(gemini_api_key)
 
     try:
         body = json.loads(event['body'])
@@ -198,6 +289,10 @@ def lambda_handler(event, context):
         target_audience = body.get('target_audience')
         business_goals = body.get('business_goals')
         num_variants = body.get('num_variants', 3)
+        media_sha256 = body.get('media_sha256') # Content hash returned by the upload lambda, if known
+        renditions = body.get('renditions') or {}
+        force_refresh = bool(body.get('force_refresh', False)) # Skip cached captions and call the model again
+        styles = body.get('styles') # Optional list: caption every style in one call
 
         if not image_s3_url:
             return {
@@ -205,29 +300,42 @@ def lambda_handler(event, context):
                 'headers': { 'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*' },
                 'body': json.dumps({'message': 'Missing image_s3_url in request body.'})
             }
+        if styles is not None:
+            if not isinstance(styles, list) or not styles or len(styles) > MAX_STYLES_PER_REQUEST or \
+                    not all(isinstance(name, str) for name in styles):
+                return {
+                    'statusCode': 400,
+                    'headers': { 'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*' },
+                    'body': json.dumps({'message': f'styles must be a list of 1-{MAX_STYLES_PER_REQUEST} style names.'})
+                }
+            styles = list(dict.fromkeys(styles)) # Drop duplicates, keep order
+
+        if styles:
+            # Multi-style fan-out: one download, every style side by side in one response
+            results_by_style = caption_image_styles(image_s3_url, styles, custom_prompt, target_audience,
+                                                    business_goals, num_variants, media_sha256, renditions,
+                                                    force_refresh)
+            return {
+                'statusCode': 200,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': '*'
+                },
+                'body': json.dumps({
+                    'message': 'Captions generated successfully',
+                    'results_by_style': results_by_style,
+                    'captions': [{**caption, 'style': style}
+                                 for style, result in results_by_style.items() for caption in result['captions']],
+                    'style_used': styles,
+                    'failed_styles': [style for style, result in results_by_style.items()
+                                      if result.get('status') == 'error'],
+                    'media_sha256': next(iter(results_by_style.values()))['media_sha256'],
+                    'cache': {'stats': cache_stats}
+                })
+            }
 
-        # Download image from S3 URL
-        image_response = requests.get(image_s3_url)
-        image_response.raise_for_status() # Raise an HTTPError for bad responses (4xx or 5xx)
-        image_bytes = image_response.content
-        image = Image.open(io.BytesIO(image_bytes))
-
-        # Determine which prompt to use
-        if custom_prompt:
-            prompt = custom_prompt
-            response = model.generate_content([prompt, image])
-            response_text = response.text
-        elif style == 'targeted':
-            response_text = generate_targeted_captions(image, target_audience, business_goals)
-        elif style == 'A/B Test':
-            response_text = generate_ab_test_captions(image, num_variants)
-        else:
-            prompt = engagement_prompts.get(style, engagement_prompts['high_engagement'])
-            response = model.generate_content([prompt, image])
-            response_text = response.text
-
-
-        captions = _parse_captions(response_text)
+        result = caption_image(image_s3_url, style, custom_prompt, target_audience, business_goals, num_variants,
+                               media_sha256, renditions, force_refresh)
 
         return {
             'statusCode': 200,
@@ -237,11 +345,20 @@ def lambda_handler(event, context):
             },
             'body': json.dumps({
                 'message': 'Captions generated successfully',
-                'captions': captions,
-                'original_response': response_text,
-                'style_used': style
+                **result,
+                'cache': {**result['cache'], 'stats': cache_stats}
             })
         }
+    except ModelDeadlineExceeded as e:
+        print(f"Caption model call timed out: {e} (stats: {invoker_stats}, routes: {caption_router.snapshot()})")
+        return {
+            'statusCode': 504,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': json.dumps({'message': 'Caption generation timed out. Please try again.'})
+        }
     except Exception as e:
         print(f"Error generating captions: {e}")
         return {
@@ -253,3 +370,174 @@ def lambda_handler(event, context):
             'body': json.dumps({'message': f'Internal server error: {str(e)}'})
         }
 
+
+def iter_caption_events(image_s3_url, style='high_engagement', custom_prompt=None, target_audience=None,
+                        business_goals=None, num_variants=3, media_sha256=None, renditions=None, force_refresh=False):
+    """
+    Streams one caption request as (event_name, payload) pairs: a 'caption' event per caption as soon as
+    its block is complete in the model's streamed output, then a final 'done' event.
+    """
+    renditions = renditions or {}
+    source_url = renditions.get('model_input') or image_s3_url
+
+    image_bytes = None
+    media_sha256 = verified_sha256(source_url, media_sha256)
+    if not media_sha256:
+        image_bytes = fetch_bytes(source_url)
+        media_sha256 = hashlib.sha256(image_bytes).hexdigest()
+
+    # Streaming keeps the free-text format: a partial JSON document can't be shown caption by caption
+    cache_key = _caption_cache_key(media_sha256, style, custom_prompt, target_audience, business_goals,
+                                   num_variants, renditions, output_mode='text')
+    cached, cache_tier = get_cached(cache_key, force_refresh)
+    if cached:
+        for caption in cached['captions']:
+            yield 'caption', caption
+        yield 'done', {'style_used': style, 'media_sha256': media_sha256, 'model_used': cached.get('model_used'),
+                       'cache': {'hit': True, 'tier': cache_tier}}
+        return
+
+    image = _load_model_image(image_bytes if image_bytes is not None else fetch_bytes(source_url))
+    prompt = _prompt_for_style(style, custom_prompt, target_audience, business_goals, num_variants)
+
+    gemini_rate_limiter.acquire()
+    # A stream can only fall back before its first chunk; after that, errors go to the client as they are
+    model_used = caption_router.pick()
+    parser = CaptionStreamParser()
+    captions = []
+    response_chunks = []
+    while True:
+        attempt_model = model_used
+        started = time.monotonic()
+        # pick() may have handed us the breaker's half-open probe slot, so every way out of this attempt must
+        # report back: True/False as ModelRouter.generate_text counts them, None if the client went away mid-stream
+        outcome = None
+        try:
+            for chunk in get_model(attempt_model).generate_content(
+                    [prompt.text, image], generation_config=generation_config_for(prompt),
+                    request_options={'timeout': MODEL_CALL_DEADLINE_SECONDS, 'retry': None}, stream=True):
+                response_chunks.append(chunk.text)
+                for caption in parser.feed(chunk.text):
+                    captions.append(caption)
+                    yield 'caption', caption
+            outcome = True
+        except RETRYABLE_ERRORS as e:
+            outcome = False
+            fallback = caption_router.fallback_for(attempt_model)
+            if response_chunks or fallback is None:
+                raise
+            print(f"{attempt_model} failed before streaming ({e}); falling back to {fallback}")
+            model_used = fallback
+            continue
+        except Exception:
+            outcome = True  # Blocked content or an unparseable chunk: the model itself answered
+            raise
+        finally:
+            if outcome is None:
+                caption_router.release(attempt_model)
+            else:
+                caption_router.record(attempt_model, outcome, time.monotonic() - started)
+        break
+    for caption in parser.close():
+        captions.append(caption)
+        yield 'caption', caption
+
+    put_cached(cache_key, {'captions': captions, 'original_response': ''.join(response_chunks),
+                           'model_used': model_used})
+    yield 'done', {'style_used': style, 'media_sha256': media_sha256, 'model_used': model_used,
+                   'cache': {'hit': False, 'tier': None}}
+
+
+def format_sse(event_name, payload):
+    return f"event: {event_name}\ndata: {json.dumps(payload)}\n\n"
+
+
+def _caption_with_retries(item):
+    """
+    Captions one batch item, retrying transient model errors with jittered exponential backoff. Anything else
+    (a missing object, an undecodable image, a blocked response) fails the item at once. So does a spent deadline
+    or rate limit wait: the invoker and router have already retried and fallen back inside it. Never raises.
+    """
+    started = time.perf_counter()
+    retries = 0
+    while True:
+        try:
+            result = caption_image(**item)
+            return {'status': 'success', 'retries': retries,
+                    'elapsed_ms': round((time.perf_counter() - started) * 1000), **result}
+        except Exception as e:
+            retryable = isinstance(e, RETRYABLE_ERRORS) and not isinstance(e, (ModelDeadlineExceeded, RateLimitTimeout))
+            if not retryable or retries >= BATCH_CAPTION_MAX_RETRIES:
+                return {'status': 'error', 'message': str(e), 'retries': retries, 'style_used': item.get('style'),
+                        'elapsed_ms': round((time.perf_counter() - started) * 1000)}
+            retries += 1
+            print(f"Retry {retries} for {item.get('image_s3_url')} ({item.get('style')}): {e}")
+            time.sleep(min(8.0, 0.5 * 2 ** retries) * random.uniform(0.5, 1.5))
+
+
+def iter_batch_captions(items, max_concurrency=BATCH_CAPTION_MAX_CONCURRENCY):
+    """Yields {'index': i, 'image_s3_url': ..., ...result} for each item as soon as it completes."""
+    with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(items)))) as executor:
+        futures = {executor.submit(_caption_with_retries, item): index for index, item in enumerate(items)}
+        for future in as_completed(futures):
+            index = futures[future]
+            yield {'index': index, 'image_s3_url': items[index]['image_s3_url'], **future.result()}
+
+
+def batch_lambda_handler(event, context):
+    """
+    Captions many images in one invocation.
+    Body: {'items': [{'image_s3_url': ..., 'style': ..., ...}]} or {'media_urls': [...], 'styles': [...]}
+    (every URL x every style), plus optional 'max_concurrency'. Results are listed in completion order.
+    """
+    gemini_api_key = os.environ.get("GEMINI_API_KEY")
+    if not gemini_api_key:
+        print("GEMINI_API_KEY not found in environment variables.")
+        return {
+            'statusCode': 500,
+            'headers': { 'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*' },
+            'body': json.dumps({'message': 'Gemini API key not configured.'})
+        }
+    configure_gemini(gemini_api_key)
+
+    try:
+        body = json.loads(event['body'])
+        items = body.get('items')
+        if items is None and body.get('media_urls'):
+            items = [{'image_s3_url': url, 'style': style}
+                     for url in body['media_urls'] for style in body.get('styles') or ['high_engagement']]
+        if not items or not isinstance(items, list) or len(items) > MAX_BATCH_CAPTION_ITEMS \
+                or not all(isinstance(item, dict) and item.get('image_s3_url') for item in items):
+            return {
+                'statusCode': 400,
+                'headers': { 'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*' },
+                'body': json.dumps({'message': f'Provide 1-{MAX_BATCH_CAPTION_ITEMS} items, each with image_s3_url.'})
+            }
+        items = [{field: item[field] for field in BATCH_ITEM_FIELDS if field in item} for item in items]
+        max_concurrency = min(int(body.get('max_concurrency', BATCH_CAPTION_MAX_CONCURRENCY)),
+                              BATCH_CAPTION_MAX_CONCURRENCY)
+
+        results = []
+        for result in iter_batch_captions(items, max_concurrency):
+            print(f"Batch item {result['index']} finished: {result['status']} after {result['retries']} retries")
+            results.append(result)
+
+        failed_count = sum(1 for result in results if result['status'] == 'error')
+        return {
+            'statusCode': 207 if failed_count else 200, # 207 Multi-Status on partial failure
+            'headers': { 'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*' },
+            'body': json.dumps({
+                'message': f'{len(results) - failed_count} of {len(results)} items captioned',
+                'results': results,
+                'failed_count': failed_count,
+                'total_retries': sum(result['retries'] for result in results),
+                'cache_stats': cache_stats
+            })
+        }
+    except Exception as e:
+        print(f"Error in batch caption generation: {e}")
+        return {
+            'statusCode': 500,
+            'headers': { 'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*' },
+            'body': json.dumps({'message': f'Internal server error: {str(e)}'})
+        }
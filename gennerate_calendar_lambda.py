@@ -1,14 +1,19 @@
 import json
 import os
 import boto3
-import google.generativeai as genai
 import calendar
+from prompt_templates import render_prompt, generation_config_for
+from model_invoker import ModelDeadlineExceeded
+from model_router import ModelRouter, configure_gemini
 
 # Initialize AWS Secrets Manager client
 secrets_client = boto3.client('secretsmanager')
 
 # Environment variables
 GEMINI_API_KEY_SECRET_NAME = os.environ.get("GEMINI_API_KEY_SECRET_NAME", "gemini-api-key") # Default name
+
+# Calendar text generation: primary/fallback models behind a circuit breaker (model_router.MODEL_ROUTES)
+calendar_router = ModelRouter('calendar')
 # In production, use your actual secret name for Gemini API key
 
 def get_gemini_api_key():
@@ -54,30 +59,23 @@ def generate_calendar_lambda_handler(event, context):
                 },
                 'body': json.dumps({'error': 'Gemini API key not configured or found'})
             }
-        genai.configure(api_key=gemini_api_key)
-        model = genai.GenerativeModel('gemini-pro') # Using gemini-pro for text generation
-
-        # Craft the prompt for Gemini
-        prompt = f"""
-        Generate a detailed social media content calendar for hogist food delivery company {calendar.month_name[month]} {year}.
-        Business Description: {business_description}
-        Target Audience: {target_audience}
-        Key Content Themes: {content_themes}
-        Desired Post Frequency: {post_frequency}
+        configure_gemini(gemini_api_key)
 
-        Provide the calendar as a daily plan, specifying the date, a suggested content idea/topic, and a brief note on the type of content (e.g., image, video, carousel, story).
-        Aim for content variety based on the themes.
-        Format the output clearly, ideally in markdown format, using bullet points or a simple list for each day.
-        Example format for a day:
-        **Day X (Day of Week):**
-        - Topic: [Content Idea]
-        - Content Type: [Image/Video/Text/Carousel/Story]
-        - Note: [Brief explanation or call to action]
-        """
+        # Render the calendar prompt; over-long free-text fields are trimmed to the template's token budget
+        prompt = render_prompt(
+            'calendar.monthly_plan',
+            month_name=calendar.month_name[month],
+            year=year,
+            business_description=business_description,
+            target_audience=target_audience,
+            content_themes=content_themes,
+            post_frequency=post_frequency
+        )
 
         # Generate content with Gemini
-        response = model.generate_content(prompt)
-        calendar_plan = response.text
+        # Deadline under API Gateway's 29 s limit, with jittered retries on 429/5xx
+        calendar_plan, model_used = calendar_router.generate_text(prompt.text,
+                                                                  generation_config=generation_config_for(prompt))
 
         return {
             'statusCode': 200,
@@ -85,9 +83,19 @@ def generate_calendar_lambda_handler(event, context):
                 'Content-Type': 'application/json',
                 'Access-Control-Allow-Origin': '*' # CORS
             },
-            'body': json.dumps({'calendar_plan': calendar_plan})
+            'body': json.dumps({'calendar_plan': calendar_plan, 'model_used': model_used})
         }
 
+    except ModelDeadlineExceeded as e:
+        print(f"Calendar model call timed out: {e}")
+        return {
+            'statusCode': 504,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*' # CORS
+            },
+            'body': json.dumps({'error': 'Calendar generation timed out. Please try again.'})
+        }
     except Exception as e:
         print(f"Error in generate_calendar_lambda: {e}")
         return {
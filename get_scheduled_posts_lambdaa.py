@@ -1,37 +1,124 @@
+import base64
+import binascii
 import json
 import boto3
 import os
+from datetime import datetime, timezone
+from boto3.dynamodb.conditions import Attr, Key
 
 dynamodb = boto3.resource('dynamodb')
 DYNAMODB_TABLE_NAME = os.environ.get("DYNAMODB_TABLE_NAME", "ScheduledSocialPosts")
 table = dynamodb.Table(DYNAMODB_TABLE_NAME)
 
+# GSI on the posts table: hash user_id, range scheduled_time_utc (projection ALL), so a page of one user's posts is a
+# single Query instead of a scan of every user's posts
+USER_POSTS_INDEX_NAME = os.environ.get("USER_POSTS_INDEX_NAME", "user_id-scheduled_time_utc-index")
+DEFAULT_PAGE_SIZE = int(os.environ.get("SCHEDULED_POSTS_DEFAULT_PAGE_SIZE", 50))
+MAX_PAGE_SIZE = int(os.environ.get("SCHEDULED_POSTS_MAX_PAGE_SIZE", 200))
+# status/platform filters are applied after the read, so a sparse match can need several Query calls to fill a
+# page; stop after this many and hand back a cursor for the rest
+MAX_QUERY_CALLS = int(os.environ.get("SCHEDULED_POSTS_MAX_QUERY_CALLS", 5))
+
+
+def encode_cursor(last_evaluated_key):
+    return base64.urlsafe_b64encode(json.dumps(last_evaluated_key).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor, user_id):
+    """The ExclusiveStartKey inside a next_cursor. Raises ValueError if it is malformed or another user's."""
+    try:
+        start_key = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, binascii.Error, UnicodeError):
+        raise ValueError('Invalid cursor.')
+    if not isinstance(start_key, dict) or start_key.get('user_id') != user_id or \
+            set(start_key) != {'post_id', 'user_id', 'scheduled_time_utc'}:
+        raise ValueError('Invalid cursor.')
+    return start_key
+
+
+def parse_time_bound(value, name):
+    """A from/to query parameter in the same UTC ISO form schedule_post_lambda stores."""
+    try:
+        moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise ValueError(f'{name} is not an ISO 8601 time: {value}')
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc).isoformat()
+
+
+def build_query(query_params, user_id):
+    """Query kwargs (minus Limit/ExclusiveStartKey) and the page size for the request's filters."""
+    try:
+        limit = int(query_params.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise ValueError('limit must be an integer.')
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f'limit must be between 1 and {MAX_PAGE_SIZE}.')
+
+    # The date range narrows the index read itself; status and platform can only filter what was read
+    key_condition = Key('user_id').eq(user_id)
+    time_from = query_params.get('from')
+    time_to = query_params.get('to')
+    if time_from and time_to:
+        key_condition &= Key('scheduled_time_utc').between(parse_time_bound(time_from, 'from'),
+                                                           parse_time_bound(time_to, 'to'))
+    elif time_from:
+        key_condition &= Key('scheduled_time_utc').gte(parse_time_bound(time_from, 'from'))
+    elif time_to:
+        key_condition &= Key('scheduled_time_utc').lte(parse_time_bound(time_to, 'to'))
+
+    query_args = {
+        'IndexName': USER_POSTS_INDEX_NAME,
+        'KeyConditionExpression': key_condition,
+        'ScanIndexForward': False  # Latest scheduled first, as the old in-memory sort did
+    }
+    filter_expression = None
+    for field in ('status', 'platform'):
+        if query_params.get(field):
+            condition = Attr(field).eq(query_params[field])
+            filter_expression = condition if filter_expression is None else filter_expression & condition
+    if filter_expression is not None:
+        query_args['FilterExpression'] = filter_expression
+    return query_args, limit
+
+
 def lambda_handler(event, context):
+    """
+    GET ?user_id=...&limit=50&cursor=...&status=...&platform=...&from=...&to=...
+    -> {'posts': [...latest scheduled first...], 'next_cursor': str or None}
+    """
     try:
         # In a real application, you would use event['requestContext']['authorizer']['claims']['sub']
         # or similar to get the authenticated user_id. For this demo, we'll use a query parameter.
-        query_params = event.get('queryStringParameters', {})
+        query_params = event.get('queryStringParameters') or {}
         user_id = query_params.get('user_id', 'demo_user_123') # Default for demo
 
-        # Scan the table for items belonging to the user_id
-        # For production, consider using query with a GSI if you need to filter by user_id frequently
-        # and it's not part of the primary key.
-        response = table.scan(
-            FilterExpression=boto3.dynamodb.conditions.Attr('user_id').eq(user_id)
-        )
-        items = response.get('Items', [])
-
-        # Continue scanning if there are more items (pagination)
-        while 'LastEvaluatedKey' in response:
-            response = table.scan(
-                FilterExpression=boto3.dynamodb.conditions.Attr('user_id').eq(user_id),
-                ExclusiveStartKey=response['LastEvaluatedKey']
-            )
-            items.extend(response.get('Items', []))
-
+        try:
+            query_args, limit = build_query(query_params, user_id)
+            if query_params.get('cursor'):
+                query_args['ExclusiveStartKey'] = decode_cursor(query_params['cursor'], user_id)
+        except ValueError as e:
+            return {
+                'statusCode': 400,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': '*'
+                },
+                'body': json.dumps({'message': str(e)})
+            }
 
-        # Sort items by scheduled_time_utc for better display
-        sorted_items = sorted(items, key=lambda x: x.get('scheduled_time_utc', ''), reverse=True)
+        # Each call reads at most what the page still needs, so LastEvaluatedKey is always the last post considered
+        # and resuming from it neither skips nor repeats posts
+        items = []
+        last_evaluated_key = None
+        for _ in range(MAX_QUERY_CALLS):
+            response = table.query(Limit=limit - len(items), **query_args)
+            items.extend(response.get('Items', []))
+            last_evaluated_key = response.get('LastEvaluatedKey')
+            if not last_evaluated_key or len(items) >= limit:
+                break
+            query_args['ExclusiveStartKey'] = last_evaluated_key
 
         return {
             'statusCode': 200,
@@ -39,7 +126,10 @@ def lambda_handler(event, context):
                 'Content-Type': 'application/json',
                 'Access-Control-Allow-Origin': '*'
             },
-            'body': json.dumps(sorted_items)
+            'body': json.dumps({
+                'posts': items,
+                'next_cursor': encode_cursor(last_evaluated_key) if last_evaluated_key else None
+            }, default=str)
         }
     except Exception as e:
         print(f"Error fetching scheduled posts: {e}")
@@ -51,4 +141,3 @@ def lambda_handler(event, context):
             },
             'body': json.dumps({'message': f'Internal server error: {str(e)}'})
         }
-
@@ -0,0 +1,115 @@
+import io
+import os
+from PIL import Image, ImageOps
+
+# Long edge of the rendition sent to the caption model (configurable per deployment)
+MODEL_INPUT_MAX_EDGE = int(os.environ.get("MODEL_INPUT_MAX_EDGE", 768))
+RENDITION_JPEG_QUALITY = int(os.environ.get("RENDITION_JPEG_QUALITY", 85))
+
+# Pre-processing applied to every image right before a model call
+MODEL_IMAGE_PREPROCESS = os.environ.get("MODEL_IMAGE_PREPROCESS", "true").lower() == "true"
+MODEL_IMAGE_FORMAT = os.environ.get("MODEL_IMAGE_FORMAT", "JPEG").upper()  # JPEG or WEBP
+MODEL_IMAGE_QUALITY = int(os.environ.get("MODEL_IMAGE_QUALITY", 85))
+
+INSTAGRAM_FEED_WIDTH = 1080
+INSTAGRAM_PORTRAIT_SIZE = (1080, 1350)  # 4:5
+THUMBNAIL_MAX_EDGE = 320
+
+RENDITION_NAMES = ('feed_1080', 'portrait_4x5', 'thumbnail', 'model_input')
+
+
+def resize_to_long_edge(image, max_edge):
+    """Shrinks the image so its longest side is at most max_edge. Never upscales."""
+    if max(image.size) <= max_edge:
+        return image
+    resized = image.copy()
+    resized.thumbnail((max_edge, max_edge), Image.LANCZOS)
+    return resized
+
+
+def crop_to_aspect(image, aspect_width, aspect_height):
+    """Center-crops the image to the given aspect ratio."""
+    width, height = image.size
+    target_ratio = aspect_width / aspect_height
+    if width / height > target_ratio:
+        new_width = round(height * target_ratio)
+        left = (width - new_width) // 2
+        return image.crop((left, 0, left + new_width, height))
+    new_height = round(width / target_ratio)
+    top = (height - new_height) // 2
+    return image.crop((0, top, width, top + new_height))
+
+
+def encode_image(image, image_format='JPEG', quality=RENDITION_JPEG_QUALITY):
+    """Re-encodes as JPEG or WebP. Saving without exif= drops the EXIF block."""
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    buffer = io.BytesIO()
+    if image_format == 'WEBP':
+        image.save(buffer, format='WEBP', quality=quality, method=4)
+    else:
+        image.save(buffer, format='JPEG', quality=quality, optimize=True)
+    return buffer.getvalue()
+
+
+def encode_jpeg(image, quality=RENDITION_JPEG_QUALITY):
+    return encode_image(image, 'JPEG', quality)
+
+
+def build_renditions(image_bytes, model_input_max_edge=MODEL_INPUT_MAX_EDGE):
+    """
+    Produces the derivatives we store next to every original upload.
+    Returns {rendition_name: jpeg_bytes}. A rendition that fails to render is logged and left out; only a failure
+    to decode the image at all raises.
+    """
+    image = Image.open(io.BytesIO(image_bytes))
+    image = ImageOps.exif_transpose(image)  # Bake in camera rotation before EXIF is stripped
+
+    def feed():
+        if image.width <= INSTAGRAM_FEED_WIDTH:
+            return image
+        return image.resize(
+            (INSTAGRAM_FEED_WIDTH, round(image.height * INSTAGRAM_FEED_WIDTH / image.width)), Image.LANCZOS
+        )
+
+    def portrait():
+        cropped = crop_to_aspect(image, 4, 5)
+        if cropped.width > INSTAGRAM_PORTRAIT_SIZE[0]:
+            cropped = cropped.resize(INSTAGRAM_PORTRAIT_SIZE, Image.LANCZOS)
+        return cropped
+
+    builders = {
+        'feed_1080': feed,
+        'portrait_4x5': portrait,
+        'thumbnail': lambda: resize_to_long_edge(image, THUMBNAIL_MAX_EDGE),
+        'model_input': lambda: resize_to_long_edge(image, model_input_max_edge),
+    }
+    renditions = {}
+    for name, build in builders.items():
+        try:
+            renditions[name] = encode_jpeg(build())
+        except Exception as e:
+            print(f"Could not render {name}: {e}")
+    return renditions
+
+
+def model_preprocess_signature():
+    """Identifies the pre-processing settings, since they change what the model sees (used in cache keys)."""
+    if not MODEL_IMAGE_PREPROCESS:
+        return 'original'
+    return f"{MODEL_INPUT_MAX_EDGE}px/{MODEL_IMAGE_FORMAT}/q{MODEL_IMAGE_QUALITY}"
+
+
+def prepare_model_image(image_bytes, max_edge=MODEL_INPUT_MAX_EDGE, image_format=MODEL_IMAGE_FORMAT,
+                        quality=MODEL_IMAGE_QUALITY):
+    """
+    Bounds the long edge, strips EXIF and re-encodes, returning an inline blob for generate_content.
+    Phone photos shrink from several MB to tens of KB; captions don't need more than ~768px.
+    """
+    image = Image.open(io.BytesIO(image_bytes))
+    # For JPEGs, let the decoder scale down by 1/2..1/8 while decoding, instead of decoding all 12 MP
+    scale = min(1.0, max_edge / max(image.size))
+    image.draft('RGB', (round(image.width * scale), round(image.height * scale)))
+    image = ImageOps.exif_transpose(image)
+    data = encode_image(resize_to_long_edge(image, max_edge), image_format, quality)
+    return {'mime_type': 'image/webp' if image_format == 'WEBP' else 'image/jpeg', 'data': data}
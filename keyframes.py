@@ -0,0 +1,126 @@
+import os
+import cv2
+
+# Defaults for the "keyframes" video captioning mode
+KEYFRAME_COUNT = int(os.environ.get("KEYFRAME_COUNT", 8))
+KEYFRAME_MAX_EDGE = int(os.environ.get("KEYFRAME_MAX_EDGE", 512))
+KEYFRAME_JPEG_QUALITY = int(os.environ.get("KEYFRAME_JPEG_QUALITY", 80))
+# Frames per second examined when looking for scene changes
+SCENE_SAMPLE_FPS = float(os.environ.get("KEYFRAME_SCENE_SAMPLE_FPS", 2))
+
+
+def _downscale(frame, max_edge):
+    height, width = frame.shape[:2]
+    scale = max_edge / max(height, width)
+    if scale >= 1:
+        return frame
+    return cv2.resize(frame, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_AREA)
+
+
+def _encode_jpeg(frame, quality):
+    ok, encoded = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise ValueError("Could not JPEG-encode video frame.")
+    return encoded.tobytes()
+
+
+def _uniform_indices(frame_count, num_frames):
+    # Centre of each of num_frames equal slices, so we skip the usual black first/last frames
+    return [int((i + 0.5) * frame_count / num_frames) for i in range(num_frames)]
+
+
+def _scene_change_indices(capture, frame_count, fps, num_frames):
+    """Picks the sampled frames whose colour histogram differs most from the previous sample."""
+    step = max(1, int(round(fps / SCENE_SAMPLE_FPS)))
+    scores = []
+    previous_hist = None
+    # Read sequentially and only convert every step-th frame; one pass is far cheaper than seeking per sample
+    capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+    for index in range(frame_count):
+        if not capture.grab():
+            break
+        if index % step:
+            continue
+        ok, frame = capture.retrieve()
+        if not ok:
+            break
+        hsv = cv2.cvtColor(_downscale(frame, 160), cv2.COLOR_BGR2HSV)
+        hist = cv2.calcHist([hsv], [0, 1], None, [32, 32], [0, 180, 0, 256])
+        cv2.normalize(hist, hist)
+        # The first sample always counts as a scene start
+        score = 1.0 if previous_hist is None else cv2.compareHist(previous_hist, hist, cv2.HISTCMP_BHATTACHARYYA)
+        scores.append((score, index))
+        previous_hist = hist
+    top = sorted(scores, reverse=True)[:num_frames]
+    return sorted(index for _, index in top)
+
+
+def extract_keyframes(video_path, num_frames=KEYFRAME_COUNT, strategy='uniform', max_edge=KEYFRAME_MAX_EDGE,
+                      quality=KEYFRAME_JPEG_QUALITY):
+    """
+    Samples num_frames representative frames from a local video file.
+    strategy: 'uniform' (evenly spaced) or 'scene' (largest scene changes).
+    Returns a list of (timestamp_seconds, jpeg_bytes) in playback order.
+    """
+    capture = cv2.VideoCapture(video_path)
+    if not capture.isOpened():
+        raise ValueError(f"Could not open video: {video_path}")
+    try:
+        frame_count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+        if frame_count <= 0:
+            raise ValueError("Video has no readable frames.")
+        num_frames = max(1, min(num_frames, frame_count))
+
+        if strategy == 'scene':
+            indices = _scene_change_indices(capture, frame_count, fps, num_frames)
+        else:
+            indices = _uniform_indices(frame_count, num_frames)
+
+        keyframes = []
+        for index in indices:
+            capture.set(cv2.CAP_PROP_POS_FRAMES, index)
+            ok, frame = capture.read()
+            if not ok:
+                continue
+            keyframes.append((round(index / fps, 2), _encode_jpeg(_downscale(frame, max_edge), quality)))
+        return keyframes
+    finally:
+        capture.release()
+
+
+def extract_segment_keyframes(video_path, segment_seconds, frames_per_segment, max_edge=KEYFRAME_MAX_EDGE,
+                              quality=KEYFRAME_JPEG_QUALITY, max_segments=None):
+    """
+    Splits a local video into consecutive windows of segment_seconds and samples frames_per_segment evenly
+    spaced frames from each. Returns (duration_seconds, [(start_seconds, end_seconds, [(timestamp, jpeg_bytes)])]).
+    With max_segments, windows are lengthened as needed so a long video yields at most that many.
+    """
+    capture = cv2.VideoCapture(video_path)
+    if not capture.isOpened():
+        raise ValueError(f"Could not open video: {video_path}")
+    try:
+        frame_count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+        if frame_count <= 0:
+            raise ValueError("Video has no readable frames.")
+        frames_per_window = max(1, int(round(segment_seconds * fps)))
+        if max_segments:
+            frames_per_window = max(frames_per_window, -(-frame_count // max_segments))
+
+        segments = []
+        for first_frame in range(0, frame_count, frames_per_window):
+            window = min(frames_per_window, frame_count - first_frame)
+            frames = []
+            for offset in _uniform_indices(window, max(1, min(frames_per_segment, window))):
+                index = first_frame + offset
+                capture.set(cv2.CAP_PROP_POS_FRAMES, index)
+                ok, frame = capture.read()
+                if not ok:
+                    continue
+                frames.append((round(index / fps, 2), _encode_jpeg(_downscale(frame, max_edge), quality)))
+            if frames:
+                segments.append((round(first_frame / fps, 2), round((first_frame + window) / fps, 2), frames))
+        return round(frame_count / fps, 2), segments
+    finally:
+        capture.release()
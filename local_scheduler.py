@@ -0,0 +1,194 @@
+import heapq
+import itertools
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+try:
+    import fcntl
+except ImportError:  # Windows: no journal lock, so keep to one process by hand
+    fcntl = None
+
+# In-process stand-in for EventBridge one-time schedules (SCHEDULER_BACKEND=local in schedule_post_lambda), for load
+# tests and self-hosted runs. Pending schedules live in a heap ordered by due time; one dispatcher thread sleeps until
+# the earliest is due and hands it to a worker pool that calls the target (by default the poster lambda's handler
+# with the same {post_id} payload EventBridge sends). Every change is appended to a JSON-lines journal, so a restart
+# reloads whatever had not fired yet; schedules whose time passed while the process was down fire immediately.
+# A journal has exactly one owner: the process that schedules into it also fires it. The scheduler holds an exclusive
+# lock on "<state file>.lock" while it is open, so a second process (or instance) on the same journal fails at start
+# instead of double-firing schedules and interleaving writes.
+LOCAL_SCHEDULER_STATE_FILE = os.environ.get("LOCAL_SCHEDULER_STATE_FILE", "local_scheduler_state.jsonl")
+LOCAL_SCHEDULER_WORKERS = int(os.environ.get("LOCAL_SCHEDULER_WORKERS", 16))
+# A target that raises is retried this many times in total, RETRY_SECONDS apart
+LOCAL_SCHEDULER_MAX_ATTEMPTS = int(os.environ.get("LOCAL_SCHEDULER_MAX_ATTEMPTS", 3))
+LOCAL_SCHEDULER_RETRY_SECONDS = float(os.environ.get("LOCAL_SCHEDULER_RETRY_SECONDS", 30))
+# fsync the journal after every write; off by default since it limits scheduling to the disk's sync rate
+LOCAL_SCHEDULER_FSYNC = os.environ.get("LOCAL_SCHEDULER_FSYNC", "false").lower() == "true"
+
+
+def invoke_poster(payload):
+    """Default target: run the poster lambda's handler in this process."""
+    from social_meadia_post_lambda import lambda_handler
+    return lambda_handler(payload, None)
+
+
+class LocalScheduler:
+    """
+    Named one-time schedules, fired once each at (or as soon as possible after) their due time.
+    schedule() on a name that is already pending is a no-op, like EventBridge's ConflictException.
+    """
+
+    def __init__(self, target=invoke_poster, state_file=LOCAL_SCHEDULER_STATE_FILE, workers=LOCAL_SCHEDULER_WORKERS):
+        self.target = target
+        self.state_file = state_file
+        self._heap = []  # (due_epoch, seq, name)
+        self._pending = {}  # name -> {'due', 'payload', 'attempts'}
+        self._seq = itertools.count()
+        self._condition = threading.Condition()
+        self._journal_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='local-scheduler')
+        self._stopped = False
+        self.stats = {'scheduled': 0, 'fired': 0, 'failed': 0, 'retried': 0}
+
+        self._lock_file = None
+        if state_file:
+            self._lock_journal()
+            self._load()
+            self._journal = open(state_file, 'a', encoding='utf-8')
+        else:
+            self._journal = None
+        self._dispatcher = threading.Thread(target=self._run, name='local-scheduler-dispatch', daemon=True)
+        self._dispatcher.start()
+
+    def _lock_journal(self):
+        """Takes the journal's owner lock; raises RuntimeError if another scheduler holds it."""
+        self._lock_file = open(f"{self.state_file}.lock", 'w')
+        if fcntl is None:
+            return
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            self._lock_file.close()
+            self._lock_file = None
+            raise RuntimeError(f"{self.state_file} is already in use by another local scheduler; a journal can "
+                               f"only have one owner process")
+
+    def _load(self):
+        """Replays the journal, then rewrites it with only the pending schedules so it doesn't grow forever."""
+        if os.path.exists(self.state_file):
+            with open(self.state_file, encoding='utf-8') as journal:
+                for line in journal:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # A line cut short by a crash mid-write
+                    if record['op'] == 'add':
+                        self._pending[record['name']] = {'due': record['due'], 'payload': record['payload'],
+                                                         'attempts': record.get('attempts', 0)}
+                    else:
+                        self._pending.pop(record['name'], None)
+        for name, entry in self._pending.items():
+            self._heap.append((entry['due'], next(self._seq), name))
+        heapq.heapify(self._heap)
+
+        compacted = f"{self.state_file}.tmp"
+        with open(compacted, 'w', encoding='utf-8') as journal:
+            for name, entry in self._pending.items():
+                journal.write(json.dumps({'op': 'add', 'name': name, **entry}) + '\n')
+        os.replace(compacted, self.state_file)
+        if self._pending:
+            print(f"Local scheduler: restored {len(self._pending)} pending schedules from {self.state_file}")
+
+    def _write(self, record):
+        with self._journal_lock:
+            if not self._journal:
+                return
+            self._journal.write(json.dumps(record) + '\n')
+            self._journal.flush()
+            if LOCAL_SCHEDULER_FSYNC:
+                os.fsync(self._journal.fileno())
+
+    def schedule(self, name, due_epoch, payload):
+        """Returns False if a schedule with this name is already pending."""
+        with self._condition:
+            if name in self._pending:
+                return False
+            self._pending[name] = {'due': due_epoch, 'payload': payload, 'attempts': 0}
+            self._write({'op': 'add', 'name': name, 'due': due_epoch, 'payload': payload, 'attempts': 0})
+            heapq.heappush(self._heap, (due_epoch, next(self._seq), name))
+            self.stats['scheduled'] += 1
+            # Only the dispatcher's current sleep can be too long, and only if this is now the earliest
+            if self._heap[0][2] == name:
+                self._condition.notify()
+        return True
+
+    def pending_count(self):
+        with self._condition:
+            return len(self._pending)
+
+    def _run(self):
+        with self._condition:
+            while not self._stopped:
+                if not self._heap:
+                    self._condition.wait()
+                    continue
+                wait_seconds = self._heap[0][0] - time.time()
+                if wait_seconds > 0:
+                    self._condition.wait(wait_seconds)
+                    continue
+                _, _, name = heapq.heappop(self._heap)
+                if name in self._pending:
+                    self._executor.submit(self._fire, name, self._pending[name])
+
+    def _fire(self, name, entry):
+        try:
+            self.target(entry['payload'])
+            outcome = 'fired'
+        except Exception as e:
+            entry['attempts'] += 1
+            if entry['attempts'] < LOCAL_SCHEDULER_MAX_ATTEMPTS:
+                print(f"Local schedule {name} failed (attempt {entry['attempts']}), retrying: {e}")
+                with self._condition:
+                    entry['due'] = time.time() + LOCAL_SCHEDULER_RETRY_SECONDS
+                    self._write({'op': 'add', 'name': name, **entry})
+                    heapq.heappush(self._heap, (entry['due'], next(self._seq), name))
+                    self.stats['retried'] += 1
+                    self._condition.notify()
+                return
+            print(f"Local schedule {name} failed after {entry['attempts']} attempts: {e}")
+            outcome = 'failed'
+        with self._condition:
+            self.stats[outcome] += 1
+            self._pending.pop(name, None)
+            self._write({'op': 'done', 'name': name})
+
+    def close(self, wait=True):
+        """Stops firing. Anything not yet fired stays in the journal for the next start."""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        self._dispatcher.join()
+        # Queued-but-unstarted firings are dropped here; they were never journalled as done, so they reload
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+        if self._journal:
+            with self._journal_lock:
+                self._journal.close()
+                self._journal = None
+        if self._lock_file:
+            self._lock_file.close()  # Releases the owner lock
+            self._lock_file = None
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_local_scheduler():
+    """The process-wide scheduler, started (and its journal replayed) on first use."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = LocalScheduler()
+        return _scheduler
+
@@ -0,0 +1,113 @@
+import os
+import re
+from urllib.parse import urlparse, unquote
+import boto3
+import requests
+from botocore.config import Config
+
+# One pooled client per container, shared by every lambda that reads caption source media
+MEDIA_FETCH_POOL_SIZE = int(os.environ.get("MEDIA_FETCH_POOL_SIZE", 16))
+MEDIA_FETCH_CHUNK_SIZE = int(os.environ.get("MEDIA_FETCH_CHUNK_SIZE", 1024 * 1024))
+
+s3_client = boto3.client('s3', config=Config(
+    max_pool_connections=MEDIA_FETCH_POOL_SIZE,
+    retries={'max_attempts': 3, 'mode': 'adaptive'}
+))
+
+# Fallback for media that isn't in S3 (keep-alive pool instead of a new TLS handshake per call)
+http_session = requests.Session()
+http_session.mount('https://', requests.adapters.HTTPAdapter(pool_maxsize=MEDIA_FETCH_POOL_SIZE))
+
+# bucket.s3.amazonaws.com, bucket.s3.ap-southeast-2.amazonaws.com, bucket.s3-ap-southeast-2.amazonaws.com
+_VIRTUAL_HOST_RE = re.compile(r'^(?P<bucket>.+)\.s3(?:[.-](?:dualstack\.)?[a-z0-9-]+)?\.amazonaws\.com$')
+# s3.amazonaws.com/bucket/key, s3.ap-southeast-2.amazonaws.com/bucket/key
+_PATH_STYLE_HOST_RE = re.compile(r'^s3(?:[.-](?:dualstack\.)?[a-z0-9-]+)?\.amazonaws\.com$')
+
+
+def parse_s3_url(url):
+    """
+    Returns (bucket, key) for s3:// URIs and virtual-hosted or path-style S3 HTTPS URLs,
+    or None if the URL doesn't point at S3. Query strings (e.g. presigned signatures) are ignored.
+    """
+    parsed = urlparse(url)
+    if parsed.scheme == 's3':
+        bucket, key = parsed.netloc, unquote(parsed.path.lstrip('/'))
+    elif parsed.scheme in ('http', 'https'):
+        host = (parsed.hostname or '').lower()
+        path = unquote(parsed.path.lstrip('/'))
+        virtual_host = _VIRTUAL_HOST_RE.match(host)
+        if virtual_host:
+            bucket, key = virtual_host.group('bucket'), path
+        elif _PATH_STYLE_HOST_RE.match(host) and '/' in path:
+            bucket, key = path.split('/', 1)
+        else:
+            return None
+    else:
+        return None
+    if not bucket or not key:
+        return None
+    return bucket, key
+
+
+def iter_media_chunks(url, byte_range=None, chunk_size=MEDIA_FETCH_CHUNK_SIZE):
+    """
+    Streams the object in chunks. byte_range is an inclusive (start, end) tuple; end may be None.
+    S3 URLs go through the pooled boto3 client, so private objects work too.
+    """
+    range_header = None
+    if byte_range:
+        start, end = byte_range
+        range_header = f"bytes={start}-{'' if end is None else end}"
+
+    location = parse_s3_url(url)
+    if location:
+        bucket, key = location
+        params = {'Bucket': bucket, 'Key': key}
+        if range_header:
+            params['Range'] = range_header
+        body = s3_client.get_object(**params)['Body']
+        try:
+            yield from body.iter_chunks(chunk_size)
+        finally:
+            body.close()
+    else:
+        headers = {'Range': range_header} if range_header else {}
+        with http_session.get(url, headers=headers, stream=True, timeout=30) as response:
+            response.raise_for_status()
+            yield from response.iter_content(chunk_size)
+
+
+def fetch_bytes(url, byte_range=None):
+    """Reads the whole object (or a byte range) into memory."""
+    buffer = bytearray()
+    for chunk in iter_media_chunks(url, byte_range):
+        buffer.extend(chunk)
+    return bytes(buffer)
+
+
+def fetch_to_file(url, path):
+    """Streams the object to a local path (for libraries that need a real file, like OpenCV)."""
+    with open(path, 'wb') as local_file:
+        for chunk in iter_media_chunks(url):
+            local_file.write(chunk)
+    return path
+
+
+def verified_sha256(url, claimed_sha256):
+    """
+    The client's content hash if the object's own sha256 metadata (written by the upload lambda) agrees with it,
+    otherwise None so the caller hashes the bytes itself. A client-supplied hash is never trusted on its own.
+    """
+    location = parse_s3_url(url) if claimed_sha256 else None
+    if not location:
+        return None
+    bucket, key = location
+    try:
+        stored = s3_client.head_object(Bucket=bucket, Key=key).get('Metadata', {}).get('sha256')
+    except Exception as e:
+        print(f"Could not read the stored hash of {url}: {e}")
+        return None
+    if stored != claimed_sha256:
+        print(f"media_sha256 {claimed_sha256} does not match the stored hash of {url}; hashing the bytes instead")
+        return None
+    return stored
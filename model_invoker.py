@@ -0,0 +1,170 @@
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from google.api_core import exceptions as google_exceptions
+
+# Whole-call deadline (all attempts, backoff and hedges), kept under API Gateway's 29 s integration timeout
+MODEL_CALL_DEADLINE_SECONDS = float(os.environ.get("MODEL_CALL_DEADLINE_SECONDS", 25))
+MODEL_CALL_MAX_RETRIES = int(os.environ.get("MODEL_CALL_MAX_RETRIES", 2))
+MODEL_RETRY_BASE_DELAY_SECONDS = float(os.environ.get("MODEL_RETRY_BASE_DELAY_SECONDS", 0.5))
+MODEL_RETRY_MAX_DELAY_SECONDS = float(os.environ.get("MODEL_RETRY_MAX_DELAY_SECONDS", 4))
+# Hedging: if the first request hasn't answered after the observed p95 latency, send a duplicate and take the first
+MODEL_HEDGING_ENABLED = os.environ.get("MODEL_HEDGING_ENABLED", "false").lower() == "true"
+MODEL_HEDGE_PERCENTILE = float(os.environ.get("MODEL_HEDGE_PERCENTILE", 95))
+# Used until enough latencies have been recorded, and as a floor so a fast streak can't make every call hedge
+MODEL_HEDGE_MIN_DELAY_SECONDS = float(os.environ.get("MODEL_HEDGE_MIN_DELAY_SECONDS", 2))
+MODEL_HEDGE_DEFAULT_DELAY_SECONDS = float(os.environ.get("MODEL_HEDGE_DEFAULT_DELAY_SECONDS", 8))
+MODEL_LATENCY_WINDOW = int(os.environ.get("MODEL_LATENCY_WINDOW", 200))
+MODEL_LATENCY_MIN_SAMPLES = 20
+
+RETRYABLE_ERRORS = (
+    google_exceptions.ResourceExhausted,
+    google_exceptions.TooManyRequests,
+    google_exceptions.InternalServerError,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.GatewayTimeout,
+    google_exceptions.DeadlineExceeded,
+    ConnectionError,
+    TimeoutError,
+)
+
+# Attempts run on this shared pool so the caller can stop waiting at the deadline (or hedge) without blocking
+_executor = ThreadPoolExecutor(max_workers=int(os.environ.get("MODEL_INVOKER_MAX_WORKERS", 16)))
+
+# Per-container counters, in the same spirit as caption_cache.cache_stats
+invoker_stats = {'calls': 0, 'attempts': 0, 'retries': 0, 'hedges': 0, 'hedge_wins': 0, 'deadline_exceeded': 0}
+_stats_lock = threading.Lock()
+
+
+class ModelDeadlineExceeded(TimeoutError):
+    """Raised when no attempt answered before the call's deadline."""
+
+
+class RateLimitTimeout(ModelDeadlineExceeded):
+    """Raised when the deadline ran out while waiting for a rate limit token, before the model was ever called."""
+
+
+class LatencyTracker:
+    """Sliding window of successful attempt latencies, used to pick the hedge delay."""
+
+    def __init__(self, window=MODEL_LATENCY_WINDOW):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, percent):
+        """Returns the percentile in seconds, or None until MODEL_LATENCY_MIN_SAMPLES have been recorded."""
+        with self._lock:
+            if len(self._samples) < MODEL_LATENCY_MIN_SAMPLES:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+_latency_trackers = {}
+_trackers_lock = threading.Lock()
+
+
+def latency_tracker(name):
+    with _trackers_lock:
+        if name not in _latency_trackers:
+            _latency_trackers[name] = LatencyTracker()
+        return _latency_trackers[name]
+
+
+def _count(stat, amount=1):
+    with _stats_lock:
+        invoker_stats[stat] += amount
+
+
+def _hedge_delay(tracker):
+    p95 = tracker.percentile(MODEL_HEDGE_PERCENTILE)
+    if p95 is None:
+        return MODEL_HEDGE_DEFAULT_DELAY_SECONDS
+    return max(MODEL_HEDGE_MIN_DELAY_SECONDS, p95)
+
+
+def _is_retryable(error):
+    return isinstance(error, RETRYABLE_ERRORS)
+
+
+def generate_text(model, contents, generation_config=None, deadline_seconds=MODEL_CALL_DEADLINE_SECONDS,
+                  max_retries=MODEL_CALL_MAX_RETRIES, hedge=MODEL_HEDGING_ENABLED, rate_limiter=None):
+    """
+    Calls model.generate_content(contents) and returns the response text, within deadline_seconds overall.
+    Retryable errors (429/5xx/timeouts) are retried with full-jitter exponential backoff; other errors are raised
+    as-is. With hedge=True a duplicate request is sent once the first has run longer than the recent p95.
+    Every request, hedges included, takes a token from rate_limiter when one is given.
+    Raises ModelDeadlineExceeded if nothing answered in time, RateLimitTimeout if no request was even sent.
+    """
+    deadline = time.monotonic() + deadline_seconds
+    tracker = latency_tracker(getattr(model, 'model_name', 'default'))
+    model_called = threading.Event()
+    _count('calls')
+
+    def remaining():
+        return deadline - time.monotonic()
+
+    def attempt():
+        if rate_limiter is not None and not rate_limiter.acquire(timeout=max(0.0, remaining())):
+            raise RateLimitTimeout("Deadline reached while waiting for a model rate limit token.")
+        model_called.set()
+        _count('attempts')
+        started = time.monotonic()
+        response = model.generate_content(
+            contents,
+            generation_config=generation_config,
+            # retry=None: the SDK's own retry loop would ignore the deadline and keep retrying 503s for minutes
+            request_options={'timeout': max(1.0, remaining()), 'retry': None}
+        )
+        text = response.text  # Raises here (not in the caller) if the response was blocked or empty
+        tracker.record(time.monotonic() - started)
+        return text
+
+    retries = 0
+    while True:
+        primary = _executor.submit(attempt)
+        pending = {primary}
+        hedged = not hedge
+        errors = []
+        while pending and remaining() > 0:
+            timeout = remaining() if hedged else min(remaining(), _hedge_delay(tracker))
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    text = future.result()
+                except Exception as e:
+                    errors.append(e)
+                    continue
+                if future is not primary:
+                    _count('hedge_wins')
+                return text
+            if not hedged and pending:
+                # The first request is slower than the recent p95: race a duplicate against it
+                hedged = True
+                pending.add(_executor.submit(attempt))
+                _count('hedges')
+
+        if pending:
+            # Abandoned attempts finish in the background; their request timeout bounds how long
+            _count('deadline_exceeded')
+            if not model_called.is_set():
+                raise RateLimitTimeout(f"Waited {deadline_seconds} s for a model rate limit token.")
+            raise ModelDeadlineExceeded(f"Model call did not complete within {deadline_seconds} s.")
+        last_error = errors[-1]
+        if isinstance(last_error, RateLimitTimeout) or not _is_retryable(last_error) or retries >= max_retries:
+            raise last_error
+        retries += 1
+        _count('retries')
+        backoff = random.uniform(0, min(MODEL_RETRY_MAX_DELAY_SECONDS, MODEL_RETRY_BASE_DELAY_SECONDS * 2 ** retries))
+        if backoff >= remaining():
+            _count('deadline_exceeded')
+            raise ModelDeadlineExceeded(f"Model call did not complete within {deadline_seconds} s ({last_error}).")
+        print(f"Retrying model call ({retries}/{max_retries}) in {backoff:.2f}s after: {last_error}")
+        time.sleep(backoff)
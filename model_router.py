@@ -0,0 +1,240 @@
+import os
+import threading
+import time
+from collections import deque
+import google.generativeai as genai
+from model_invoker import generate_text, RateLimitTimeout, RETRYABLE_ERRORS, MODEL_CALL_DEADLINE_SECONDS
+
+# Point every Gemini client at another endpoint (e.g. benchmarks/fake_model_server.py) over plain REST
+GEMINI_API_ENDPOINT = os.environ.get("GEMINI_API_ENDPOINT")
+
+# Primary and fallback model per task. Set a fallback to "" to disable it.
+MODEL_ROUTES = {
+    'caption': {
+        'primary': os.environ.get("CAPTION_MODEL_PRIMARY", "gemini-1.5-flash"),
+        'fallback': os.environ.get("CAPTION_MODEL_FALLBACK", "gemini-1.5-flash-8b"),
+        'latency_slo_seconds': float(os.environ.get("CAPTION_MODEL_LATENCY_SLO_SECONDS", 10)),
+    },
+    'video': {
+        'primary': os.environ.get("GEMINI_MODEL_NAME", "gemini-1.5-flash"),
+        'fallback': os.environ.get("VIDEO_MODEL_FALLBACK", "gemini-1.5-flash-8b"),
+        'latency_slo_seconds': float(os.environ.get("VIDEO_MODEL_LATENCY_SLO_SECONDS", 60)),
+    },
+    'calendar': {
+        'primary': os.environ.get("CALENDAR_MODEL_PRIMARY", "gemini-pro"),
+        'fallback': os.environ.get("CALENDAR_MODEL_FALLBACK", "gemini-1.5-flash"),
+        'latency_slo_seconds': float(os.environ.get("CALENDAR_MODEL_LATENCY_SLO_SECONDS", 20)),
+    },
+}
+
+# Breaker trips when, over the last BREAKER_WINDOW_CALLS calls within BREAKER_WINDOW_SECONDS (and at least
+# BREAKER_MIN_CALLS calls), the error rate reaches BREAKER_ERROR_RATE or p95 latency exceeds the task's latency SLO.
+# The call cap keeps a long healthy history from masking a sudden outage.
+BREAKER_WINDOW_SECONDS = float(os.environ.get("BREAKER_WINDOW_SECONDS", 60))
+BREAKER_WINDOW_CALLS = int(os.environ.get("BREAKER_WINDOW_CALLS", 20))
+BREAKER_MIN_CALLS = int(os.environ.get("BREAKER_MIN_CALLS", 10))
+BREAKER_ERROR_RATE = float(os.environ.get("BREAKER_ERROR_RATE", 0.5))
+BREAKER_COOLDOWN_SECONDS = float(os.environ.get("BREAKER_COOLDOWN_SECONDS", 30))
+# Share of the call deadline the primary may use while a fallback is available
+ROUTER_PRIMARY_DEADLINE_SHARE = float(os.environ.get("ROUTER_PRIMARY_DEADLINE_SHARE", 0.6))
+
+
+def configure_gemini(api_key):
+    """genai.configure, honouring GEMINI_API_ENDPOINT for local fake servers."""
+    if GEMINI_API_ENDPOINT:
+        genai.configure(api_key=api_key, transport='rest', client_options={'api_endpoint': GEMINI_API_ENDPOINT})
+    else:
+        genai.configure(api_key=api_key)
+
+
+class CircuitBreaker:
+    """
+    Closed: calls flow. Open: calls skip this model until the cooldown passes. Half-open: one probe call is let
+    through; success closes the breaker, failure re-opens it.
+    """
+
+    def __init__(self, name, latency_slo_seconds):
+        self.name = name
+        self.latency_slo_seconds = latency_slo_seconds
+        self.state = 'closed'
+        self._calls = deque(maxlen=BREAKER_WINDOW_CALLS)  # (finished_at, ok, latency_seconds)
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and time.monotonic() - self._opened_at >= BREAKER_COOLDOWN_SECONDS:
+                self.state = 'half_open'
+                self._probe_in_flight = False
+            if self.state == 'half_open' and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def _trim(self, now):
+        while self._calls and now - self._calls[0][0] > BREAKER_WINDOW_SECONDS:
+            self._calls.popleft()
+
+    def _error_rate_and_p95(self):
+        errors = sum(1 for _, ok, _ in self._calls if not ok)
+        latencies = sorted(latency for _, _, latency in self._calls)
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else 0.0
+        return errors / len(self._calls) if self._calls else 0.0, p95
+
+    def record(self, ok, latency_seconds):
+        now = time.monotonic()
+        with self._lock:
+            if self.state == 'half_open':
+                self._probe_in_flight = False
+                if ok and latency_seconds <= self.latency_slo_seconds:
+                    print(f"Circuit breaker for {self.name} closed after a healthy probe")
+                    self.state = 'closed'
+                    self._calls.clear()
+                else:
+                    self.state = 'open'
+                    self._opened_at = now
+                return
+            self._calls.append((now, ok, latency_seconds))
+            self._trim(now)
+            if self.state == 'closed' and len(self._calls) >= BREAKER_MIN_CALLS:
+                error_rate, p95 = self._error_rate_and_p95()
+                if error_rate >= BREAKER_ERROR_RATE or p95 > self.latency_slo_seconds:
+                    print(f"Circuit breaker for {self.name} opened: error rate {error_rate:.0%}, p95 {p95:.2f}s "
+                          f"(SLO {self.latency_slo_seconds}s) over {len(self._calls)} calls")
+                    self.state = 'open'
+                    self._opened_at = now
+
+    def release(self):
+        """Gives back a half-open probe slot from a call that ended without saying anything about the model."""
+        with self._lock:
+            if self.state == 'half_open':
+                self._probe_in_flight = False
+
+    def snapshot(self):
+        with self._lock:
+            self._trim(time.monotonic())
+            error_rate, p95 = self._error_rate_and_p95()
+            return {'state': self.state, 'calls': len(self._calls), 'error_rate': round(error_rate, 3),
+                    'p95_seconds': round(p95, 3)}
+
+
+class LimiterWaitTimer:
+    """Wraps a rate limiter and adds up the time spent waiting on it, so breakers only judge the model's own time."""
+
+    def __init__(self, limiter):
+        self.limiter = limiter
+        self.waited_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout=None):
+        started = time.monotonic()
+        try:
+            return self.limiter.acquire(timeout=timeout)
+        finally:
+            with self._lock:
+                self.waited_seconds += time.monotonic() - started
+
+
+_models = {}
+_breakers = {}
+_registry_lock = threading.Lock()
+
+# Per-container count of responses served by each model
+route_stats = {}
+
+
+def get_model(model_name):
+    with _registry_lock:
+        if model_name not in _models:
+            _models[model_name] = genai.GenerativeModel(model_name)
+        return _models[model_name]
+
+
+def get_breaker(model_name, latency_slo_seconds):
+    with _registry_lock:
+        if model_name not in _breakers:
+            _breakers[model_name] = CircuitBreaker(model_name, latency_slo_seconds)
+        return _breakers[model_name]
+
+
+class ModelRouter:
+    """Sends a task's model calls to its primary model, or to the fallback while the primary's breaker is open."""
+
+    def __init__(self, task):
+        route = MODEL_ROUTES[task]
+        self.task = task
+        self.latency_slo_seconds = route['latency_slo_seconds']
+        self.candidates = [name for name in (route['primary'], route['fallback']) if name]
+
+    def pick(self):
+        """Name of the model to use right now. The last candidate is always allowed, breaker or not."""
+        for name in self.candidates[:-1]:
+            if get_breaker(name, self.latency_slo_seconds).allow():
+                return name
+        return self.candidates[-1]
+
+    def fallback_for(self, model_name):
+        """The candidate after model_name, or None if it is the last one."""
+        index = self.candidates.index(model_name)
+        return self.candidates[index + 1] if index + 1 < len(self.candidates) else None
+
+    def record(self, model_name, ok, latency_seconds):
+        get_breaker(model_name, self.latency_slo_seconds).record(ok, latency_seconds)
+        if ok:
+            with _registry_lock:
+                route_stats[model_name] = route_stats.get(model_name, 0) + 1
+
+    def release(self, model_name):
+        """For a call abandoned midway: frees a half-open probe slot without counting a success or failure."""
+        get_breaker(model_name, self.latency_slo_seconds).release()
+
+    def generate_text(self, contents, generation_config=None, deadline_seconds=MODEL_CALL_DEADLINE_SECONDS,
+                      **invoker_options):
+        """
+        Returns (response_text, model_name). Falls through to the next candidate when a model is unhealthy:
+        its breaker is open, or the call failed with a retryable error / ran out of its share of the deadline.
+        Other errors (bad request, blocked content) mean the model is up, so they are raised unchanged.
+        Time spent waiting on invoker_options['rate_limiter'] is ours, not the model's: it is left out of the
+        breaker's latency, and running out of deadline there is raised without counting against the model.
+        """
+        deadline = time.monotonic() + deadline_seconds
+        rate_limiter = invoker_options.pop('rate_limiter', None)
+        last_error = None
+        for index, name in enumerate(self.candidates):
+            is_last = index == len(self.candidates) - 1
+            if not is_last and not get_breaker(name, self.latency_slo_seconds).allow():
+                print(f"Skipping {name} for {self.task}: circuit breaker open")
+                continue
+            remaining = deadline - time.monotonic()
+            budget = remaining if is_last else remaining * ROUTER_PRIMARY_DEADLINE_SHARE
+            limiter = LimiterWaitTimer(rate_limiter) if rate_limiter is not None else None
+            started = time.monotonic()
+
+            def model_seconds():
+                return max(0.0, time.monotonic() - started - (limiter.waited_seconds if limiter else 0.0))
+
+            try:
+                text = generate_text(get_model(name), contents, generation_config=generation_config,
+                                     deadline_seconds=budget, rate_limiter=limiter, **invoker_options)
+            except RateLimitTimeout:
+                # The limiter is shared by every model, so neither a fallback nor the breaker can help here
+                get_breaker(name, self.latency_slo_seconds).release()
+                raise
+            except RETRYABLE_ERRORS as e:
+                self.record(name, False, model_seconds())
+                last_error = e
+                if not is_last:
+                    print(f"{name} failed for {self.task} ({e}); falling back to {self.candidates[index + 1]}")
+                continue
+            except Exception:
+                get_breaker(name, self.latency_slo_seconds).record(True, model_seconds())
+                raise
+            self.record(name, True, model_seconds())
+            return text, name
+        raise last_error
+
+    def snapshot(self):
+        return {name: get_breaker(name, self.latency_slo_seconds).snapshot() for name in self.candidates}
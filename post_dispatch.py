@@ -0,0 +1,55 @@
+import os
+import zlib
+from datetime import datetime, timedelta, timezone
+
+# How scheduled posts reach the poster lambda, chosen per deployment:
+#   'per_post' - one one-time EventBridge schedule per post (social-post-{post_id}); exact to the second
+#   'bucketed' - posts carry a minute bucket on a sparse GSI and dispatch_sweeper_lambda, run every minute by one
+#                recurring schedule, queries the due buckets and invokes the poster; no per-post schedules
+DISPATCH_MODE = os.environ.get("DISPATCH_MODE", "per_post")
+DISPATCH_MODES = ('per_post', 'bucketed')
+
+# GSI on the posts table: hash dispatch_bucket, range dispatch_at. Only posts waiting to go out carry
+# dispatch_bucket, so the index holds pending bucketed posts and nothing else.
+DISPATCH_BUCKET_INDEX_NAME = os.environ.get("DISPATCH_BUCKET_INDEX_NAME", "dispatch_bucket-dispatch_at-index")
+# Spreads one minute's posts over this many index partitions ("2025-07-01T10:30#3") so a busy minute doesn't
+# concentrate its writes on a single GSI key. The sweeper queries every shard. Raise it freely; lowering it strands
+# pending posts already written to the shards that disappear.
+DISPATCH_BUCKET_SHARDS = int(os.environ.get("DISPATCH_BUCKET_SHARDS", 4))
+
+if DISPATCH_MODE not in DISPATCH_MODES:
+    raise ValueError(f"DISPATCH_MODE must be one of {DISPATCH_MODES}, got {DISPATCH_MODE!r}")
+
+
+def dispatch_at(scheduled_datetime_utc):
+    """Fixed-width UTC timestamp, so the index's range key sorts and compares as time."""
+    return scheduled_datetime_utc.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def minute_of(moment):
+    return moment.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M')
+
+
+def dispatch_bucket(post_id, scheduled_datetime_utc):
+    shard = zlib.crc32(post_id.encode('utf-8')) % DISPATCH_BUCKET_SHARDS
+    return f"{minute_of(scheduled_datetime_utc)}#{shard}"
+
+
+def dispatch_fields(post_id, scheduled_datetime_utc, now=None):
+    """
+    Attributes a bucketed-mode post item needs to be found by the sweeper. A time that has already passed goes in
+    the current minute's bucket (dispatch_at keeps the real time): the sweeper only looks back so far.
+    """
+    now = now or datetime.now(timezone.utc)
+    return {
+        'dispatch_bucket': dispatch_bucket(post_id, max(scheduled_datetime_utc, now)),
+        'dispatch_at': dispatch_at(scheduled_datetime_utc)
+    }
+
+
+def due_buckets(now, lookback_minutes):
+    """Every bucket key from lookback_minutes ago up to and including the current minute, oldest first."""
+    now = now.astimezone(timezone.utc)
+    return [f"{minute_of(now - timedelta(minutes=offset))}#{shard}"
+            for offset in range(lookback_minutes, -1, -1)
+            for shard in range(DISPATCH_BUCKET_SHARDS)]
@@ -0,0 +1,268 @@
+import math
+import string
+import textwrap
+from collections import namedtuple
+
+# Gemini averages roughly 4 characters of English per token; close enough for budgeting without a tokenizer call
+CHARS_PER_TOKEN = 4
+
+RenderedPrompt = namedtuple('RenderedPrompt', ['text', 'template_key', 'input_tokens', 'max_output_tokens',
+                                               'truncated_fields'])
+
+
+class PromptBudgetError(ValueError):
+    """Raised when a rendered prompt is still over its template's input budget after field truncation."""
+
+
+def estimate_tokens(text):
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def truncate_to_tokens(text, max_tokens):
+    """Cuts text to about max_tokens, at a word boundary where possible."""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    if ' ' in cut:
+        cut = cut.rsplit(' ', 1)[0]
+    return cut.rstrip()
+
+
+class PromptTemplate:
+    """
+    A versioned prompt with token budgets. The text is dedented and split into literal/field segments once,
+    at import; render() only joins strings. Bump version whenever the wording changes so cached results
+    generated from the old wording stop matching.
+    """
+
+    def __init__(self, name, version, text, max_input_tokens, max_output_tokens, field_token_limits=None):
+        self.name = name
+        self.version = version
+        self.key = f"{name}@v{version}"
+        self.max_input_tokens = max_input_tokens
+        self.max_output_tokens = max_output_tokens
+        self.field_token_limits = field_token_limits or {}
+        self._segments = [(literal, field) for literal, field, _, _ in string.Formatter().parse(
+            textwrap.dedent(text).strip())]
+        self.fields = tuple(field for _, field in self._segments if field)
+        unknown_limits = set(self.field_token_limits) - set(self.fields)
+        if unknown_limits:
+            raise ValueError(f"Template {self.key} has limits for unknown fields: {sorted(unknown_limits)}")
+
+    def render(self, **values):
+        missing = [field for field in self.fields if field not in values]
+        if missing:
+            raise ValueError(f"Template {self.key} is missing fields: {missing}")
+
+        parts = []
+        truncated_fields = []
+        for literal, field in self._segments:
+            parts.append(literal)
+            if field:
+                value = str(values[field]).strip()
+                limit = self.field_token_limits.get(field)
+                if limit and estimate_tokens(value) > limit:
+                    value = truncate_to_tokens(value, limit)
+                    truncated_fields.append(field)
+                parts.append(value)
+        text = ''.join(parts)
+
+        input_tokens = estimate_tokens(text)
+        if input_tokens > self.max_input_tokens:
+            raise PromptBudgetError(
+                f"Prompt {self.key} needs ~{input_tokens} input tokens, over its budget of {self.max_input_tokens}."
+            )
+        if truncated_fields:
+            print(f"Prompt {self.key}: truncated over-long {', '.join(truncated_fields)} to fit the token budget")
+        return RenderedPrompt(text, self.key, input_tokens, self.max_output_tokens, truncated_fields)
+
+
+_TEMPLATES = [
+    # --- Image captions (generate_caption_lambda) ---
+    PromptTemplate('caption.high_engagement', 1, """
+        Analyze this food image and create 3 highly engaging Instagram captions for a food delivery service.
+
+        Requirements for maximum engagement:
+        1. Start with attention-grabbing hooks (questions, bold statements, emojis)
+        2. Include emotional triggers (craving, comfort, satisfaction)
+        3. Add interactive elements (ask questions, encourage comments)
+        4. Use food delivery specific CTAs
+        5. Include trending food hashtags
+        6. Keep it conversational and relatable
+        7. Create FOMO (fear of missing out)
+
+        Format each caption as:
+        Caption 1: [caption text]
+        Engagement Score: [rate 1-10 for potential engagement]
+
+        Focus on captions that make people want to:
+        - Comment about their cravings
+        - Tag friends
+        - Share the post
+        - Place an order immediately
+        """, max_input_tokens=400, max_output_tokens=1024),
+
+    PromptTemplate('caption.story_style', 1, """
+        Create 5 Instagram captions for this food image that tell a story and increase engagement.
+
+        Style requirements:
+        1. Use storytelling techniques
+        2. Create relatable scenarios
+        3. Include sensory descriptions (taste, smell, texture)
+        4. Add personal touches
+        5. End with engaging questions
+        6. Use appropriate emojis strategically
+
+        Make people feel like they're experiencing the food through your words.
+        """, max_input_tokens=400, max_output_tokens=1536),
+
+    PromptTemplate('caption.viral_potential', 1, """
+        Generate 3 Instagram captions with viral potential for this food delivery image.
+
+        Viral elements to include:
+        1. Trending phrases and slang
+        2. Relatable situations everyone experiences
+        3. Humor or wit
+        4. Universal food experiences
+        5. Shareable moments
+        6. Interactive challenges or questions
+
+        Think about what makes people share food content and incorporate those elements.
+        """, max_input_tokens=400, max_output_tokens=1024),
+
+    PromptTemplate('caption.targeted', 1, """
+        Analyze this food delivery image and create 3 Instagram captions optimized for:
+
+        Target Audience: {target_audience}
+        Business Goals: {business_goals}
+
+        Requirements:
+        1. Speak directly to the target audience's interests and pain points
+        2. Align with business goals while maximizing engagement
+        3. Use language and tone that resonates with this specific audience
+        4. Include relevant hashtags for this demographic
+        5. Add CTAs that support the business goals
+        6. Create urgency and desire specific to this audience
+
+        Make each caption feel personally crafted for this audience while driving the desired business outcomes.
+
+        Format as:
+        Caption 1: [caption]
+        Target Appeal: [why this appeals to the audience]
+        Business Impact: [how this supports business goals]
+        """, max_input_tokens=600, max_output_tokens=1536,
+        field_token_limits={'target_audience': 60, 'business_goals': 80}),
+
+    PromptTemplate('caption.ab_test', 1, """
+        Create {num_variants} distinctly different Instagram captions for this food delivery image.
+        Each caption should test different engagement strategies:
+
+        1. Emotional Appeal - Focus on feelings and comfort
+        2. Urgency/Scarcity - Create FOMO and immediate action
+        3. Social Proof - Emphasize popularity and reviews
+        4. Question/Interactive - Encourage comments and engagement
+        5. Humor/Personality - Use wit and brand personality
+
+        For each caption, explain the strategy being tested.
+
+        Format as:
+        Variant 1 (Strategy): [caption]
+        Variant 2 (Strategy): [caption]
+        etc.
+        """, max_input_tokens=400, max_output_tokens=1536, field_token_limits={'num_variants': 4}),
+
+    PromptTemplate('caption.custom', 1, "{custom_prompt}", max_input_tokens=1200, max_output_tokens=1536,
+                   field_token_limits={'custom_prompt': 1200}),
+
+    PromptTemplate('caption.json_output', 1, """
+        Return the captions as JSON matching the response schema, ignoring any other output format described above:
+        one object per caption in "captions", the caption itself in "text" (no "Caption 1:" style labels),
+        a 1-10 engagement rating in "engagement_score", and "strategy", "target_appeal" and "business_impact"
+        whenever the instructions ask for them.
+        """, max_input_tokens=150, max_output_tokens=0),
+
+    # --- Video captions (geneerate_video_caption_lambda) ---
+    PromptTemplate('video.high_engagement', 1, """
+        Generate social media captions for this video. Focus on high engagement, using trending topics and questions to encourage interaction. Provide 3 options.
+        """, max_input_tokens=200, max_output_tokens=1024),
+
+    PromptTemplate('video.story_style', 1, """
+        Generate social media captions for this video. Create a narrative or story-telling style caption. Provide 3 options.
+        """, max_input_tokens=200, max_output_tokens=1024),
+
+    PromptTemplate('video.viral_potential', 1, """
+        Generate social media captions for this video. Aim for virality with catchy phrases, humor, or strong calls to action. Provide 3 options.
+        """, max_input_tokens=200, max_output_tokens=1024),
+
+    PromptTemplate('video.targeted', 1, """
+        Generate social media captions for this video. Target a {target_audience} audience to achieve the goal of {business_goals}. Provide 3 options.
+        """, max_input_tokens=400, max_output_tokens=1024,
+        field_token_limits={'target_audience': 60, 'business_goals': 80}),
+
+    PromptTemplate('video.ab_test', 1, """
+        Generate social media captions for this video. Generate {num_variants} distinct variants for A/B testing, exploring different angles or tones.
+        """, max_input_tokens=200, max_output_tokens=1536, field_token_limits={'num_variants': 4}),
+
+    PromptTemplate('video.standard', 1, """
+        Generate social media captions for this video. Provide 3 standard, descriptive captions.
+        """, max_input_tokens=200, max_output_tokens=1024),
+
+    PromptTemplate('video.custom', 1, "{custom_prompt}", max_input_tokens=1200, max_output_tokens=1536,
+                   field_token_limits={'custom_prompt': 1200}),
+
+    PromptTemplate('video.keyframes_intro', 1, """
+        The following {frame_count} images are frames sampled in playback order from a single video (timestamps in seconds: {timestamps}).
+        """, max_input_tokens=400, max_output_tokens=0),
+
+    # Segmented mode: one short description per time window, then one text-only merge into captions
+    PromptTemplate('video.segment_summary', 1, """
+        The following {frame_count} images are frames sampled in playback order from seconds {start} to {end} of a {duration}-second video (timestamps in seconds: {timestamps}).
+        Describe this part of the video in 2-3 sentences: who or what is shown, what happens, the setting and mood, and any visible text, products or branding. Do not write captions.
+        """, max_input_tokens=400, max_output_tokens=200),
+
+    PromptTemplate('video.segment_merge', 1, """
+        The video itself is not attached. Instead, here are descriptions of its {segment_count} consecutive segments, in playback order ({duration} seconds in total):
+        {segment_summaries}
+
+        Treat these descriptions as the video and follow the instructions below.
+        """, max_input_tokens=8000, max_output_tokens=0, field_token_limits={'segment_summaries': 7600}),
+
+    # --- Content calendar (gennerate_calendar_lambda) ---
+    PromptTemplate('calendar.monthly_plan', 1, """
+        Generate a detailed social media content calendar for hogist food delivery company {month_name} {year}.
+        Business Description: {business_description}
+        Target Audience: {target_audience}
+        Key Content Themes: {content_themes}
+        Desired Post Frequency: {post_frequency}
+
+        Provide the calendar as a daily plan, specifying the date, a suggested content idea/topic, and a brief note on the type of content (e.g., image, video, carousel, story).
+        Aim for content variety based on the themes.
+        Format the output clearly, ideally in markdown format, using bullet points or a simple list for each day.
+        Example format for a day:
+        **Day X (Day of Week):**
+        - Topic: [Content Idea]
+        - Content Type: [Image/Video/Text/Carousel/Story]
+        - Note: [Brief explanation or call to action]
+        """, max_input_tokens=1000, max_output_tokens=4096,
+        field_token_limits={'business_description': 300, 'target_audience': 60, 'content_themes': 150,
+                            'post_frequency': 30}),
+]
+
+PROMPT_TEMPLATES = {template.name: template for template in _TEMPLATES}
+
+
+def get_template(name):
+    return PROMPT_TEMPLATES[name]
+
+
+def render_prompt(name, **values):
+    return PROMPT_TEMPLATES[name].render(**values)
+
+
+def generation_config_for(rendered_prompt, base_config=None):
+    """Adds the template's output budget (max_output_tokens) to a generation_config dict."""
+    config = dict(base_config or {})
+    if rendered_prompt.max_output_tokens:
+        config['max_output_tokens'] = rendered_prompt.max_output_tokens
+    return config
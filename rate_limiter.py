@@ -0,0 +1,40 @@
+import os
+import threading
+import time
+
+# Gemini quota for this deployment; shared by every thread in the container
+GEMINI_REQUESTS_PER_MINUTE = float(os.environ.get("GEMINI_REQUESTS_PER_MINUTE", 60))
+GEMINI_BURST = int(os.environ.get("GEMINI_BURST", 5))
+
+
+class TokenBucket:
+    """Thread-safe token bucket: refills at rate_per_second up to capacity; acquire() blocks until a token is free."""
+
+    def __init__(self, rate_per_second, capacity):
+        self.rate_per_second = rate_per_second
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.rate_per_second)
+        self._last_refill = now
+
+    def acquire(self, timeout=None):
+        """Takes one token, waiting if necessary. Returns False if timeout (seconds) runs out first."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate_per_second
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+gemini_rate_limiter = TokenBucket(GEMINI_REQUESTS_PER_MINUTE / 60.0, GEMINI_BURST)
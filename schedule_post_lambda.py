@@ -1,83 +1,135 @@
 import json
 import boto3
+import hashlib
 import uuid
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from post_dispatch import DISPATCH_MODE, dispatch_fields
+
+# Bulk scheduling: posts per request, and how many posts are stored and scheduled at once
+MAX_BULK_POSTS = int(os.environ.get("MAX_BULK_POSTS", 500))
+SCHEDULE_MAX_WORKERS = int(os.environ.get("SCHEDULE_MAX_WORKERS", 8))
+# Where per-post schedules are created: 'eventbridge' (EventBridge Scheduler) or 'local' (local_scheduler's in-process
+# engine, for load tests and self-hosted runs without EventBridge)
+SCHEDULER_BACKEND = os.environ.get("SCHEDULER_BACKEND", "eventbridge")
+# Adaptive retries rate-limit the client itself when the Scheduler API throttles, shared by all workers
+SCHEDULER_MAX_ATTEMPTS = int(os.environ.get("SCHEDULER_MAX_ATTEMPTS", 8))
+
+# post_id is uuid5(POST_ID_NAMESPACE, user_id:idempotency_key), so a re-submitted request maps to the post it created
+POST_ID_NAMESPACE = uuid.UUID('9a81b5eb-e779-47a6-8a5f-59f984703bab')
+MAX_IDEMPOTENCY_KEY_LENGTH = 256
 
 dynamodb = boto3.resource('dynamodb')
 # Replace with your DynamoDB table name
 DYNAMODB_TABLE_NAME = os.environ.get("DYNAMODB_TABLE_NAME", "ScheduledSocialPosts")
 table = dynamodb.Table(DYNAMODB_TABLE_NAME)
 
-eventbridge_client = boto3.client('scheduler')
+eventbridge_client = boto3.client('scheduler', config=Config(
+    max_pool_connections=SCHEDULE_MAX_WORKERS,
+    retries={'max_attempts': SCHEDULER_MAX_ATTEMPTS, 'mode': 'adaptive'}
+))
 
 
-def lambda_handler(event, context):
-    try:
-        body = json.loads(event['body'])
+def build_post_item(body):
+    """
+    Validates one post request and returns (item, scheduled_datetime_utc) ready for DynamoDB.
+    Raises ValueError with a user-facing message when required fields are missing or malformed.
+    """
+    # CHANGED: Renamed from image_s3_url to media_s3_url
+    media_s3_url = body.get('media_s3_url')
 
-        # CHANGED: Renamed from image_s3_url to media_s3_url
-        media_s3_url = body.get('media_s3_url')
+    caption = body.get('caption')
+    platform = body.get('platform')
+    scheduled_time_utc_str = body.get('scheduled_time_utc')  # ISO format string
+    user_id = body.get('user_id', 'anonymous')  # Get user ID, default to anonymous
 
-        caption = body.get('caption')
-        platform = body.get('platform')
-        scheduled_time_utc_str = body.get('scheduled_time_utc')  # ISO format string
-        user_id = body.get('user_id', 'anonymous')  # Get user ID, default to anonymous
+    # NEW: Added media_type (e.g., 'image', 'video'), defaulting to 'image'
+    media_type = body.get('media_type', 'image')
 
-        # NEW: Added media_type (e.g., 'image', 'video'), defaulting to 'image'
-        media_type = body.get('media_type', 'image')
+    # Content hash from the upload lambda; lets us tie posts of the same media together
+    media_sha256 = body.get('media_sha256')
 
-        # CHANGED: Updated validation to use media_s3_url
-        if not all([media_s3_url, caption, platform, scheduled_time_utc_str, media_type]):
-            return {
-                'statusCode': 400,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({
-                                       'message': 'Missing required fields (media_s3_url, caption, platform, scheduled_time_utc, media_type).'})
-            }
+    # Rendition URLs from the upload lambda (feed_1080, portrait_4x5, thumbnail, model_input)
+    renditions = body.get('renditions')
 
-        # Convert scheduled time string to datetime object
+    # Optional client-chosen key for retries (e.g. one per click of "Schedule Post")
+    idempotency_key = body.get('idempotency_key')
+    if idempotency_key is not None and (not isinstance(idempotency_key, str) or
+                                        not 0 < len(idempotency_key) <= MAX_IDEMPOTENCY_KEY_LENGTH):
+        raise ValueError(f'idempotency_key must be a string of 1-{MAX_IDEMPOTENCY_KEY_LENGTH} characters.')
+
+    # CHANGED: Updated validation to use media_s3_url
+    if not all([media_s3_url, caption, platform, scheduled_time_utc_str, media_type]):
+        raise ValueError('Missing required fields (media_s3_url, caption, platform, scheduled_time_utc, media_type).')
+
+    # Convert scheduled time string to datetime object
+    try:
         scheduled_datetime_utc = datetime.fromisoformat(scheduled_time_utc_str.replace('Z', '+00:00'))
-        # Ensure it's timezone-aware UTC
-        if scheduled_datetime_utc.tzinfo is None:
-            scheduled_datetime_utc = scheduled_datetime_utc.replace(tzinfo=timezone.utc)
-        else:
-            scheduled_datetime_utc = scheduled_datetime_utc.astimezone(timezone.utc)
-
-        post_id = str(uuid.uuid4())
-        creation_time = datetime.now(timezone.utc).isoformat()
-
-        # Store post details in DynamoDB
-        item = {
-            'post_id': post_id,
-            'user_id': user_id,
-            'media_s3_url': media_s3_url,  # CHANGED: Storing as generic media_s3_url
-            'media_type': media_type,  # NEW: Storing media type
-            'caption': caption,
-            'platform': platform,
-            'scheduled_time_utc': scheduled_time_utc_str,
-            'creation_time_utc': creation_time,
-            'status': 'pending'  # Initial status
-        }
-        table.put_item(Item=item)
+    except ValueError:
+        raise ValueError(f'scheduled_time_utc is not an ISO 8601 time: {scheduled_time_utc_str}')
+    # Ensure it's timezone-aware UTC
+    if scheduled_datetime_utc.tzinfo is None:
+        scheduled_datetime_utc = scheduled_datetime_utc.replace(tzinfo=timezone.utc)
+    else:
+        scheduled_datetime_utc = scheduled_datetime_utc.astimezone(timezone.utc)
 
-        # --- Create EventBridge Schedule ---
-        # The ARN of the social_media_poster_lambda will be passed as an environment variable
-        # Or you can construct it if you know the region and account ID
-        target_lambda_arn = os.environ.get("SOCIAL_MEDIA_POSTER_LAMBDA_ARN")
-        if not target_lambda_arn:
-            return {
-                'statusCode': 500,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'message': 'SOCIAL_MEDIA_POSTER_LAMBDA_ARN not configured.'})
-            }
+    # What makes two requests the same post. Without a client key it is also the idempotency key, so re-submitting
+    # the same media, caption, platform and time finds the existing post instead of minting a new one.
+    request_fingerprint = hashlib.sha256(json.dumps(
+        [user_id, media_s3_url, media_type, caption, platform, scheduled_datetime_utc.isoformat()]
+    ).encode('utf-8')).hexdigest()
+    idempotency_key = idempotency_key or request_fingerprint
+    post_id = str(uuid.uuid5(POST_ID_NAMESPACE, f"{user_id}:{idempotency_key}"))
+    creation_time = datetime.now(timezone.utc).isoformat()
+
+    item = {
+        'post_id': post_id,
+        'user_id': user_id,
+        'media_s3_url': media_s3_url,  # CHANGED: Storing as generic media_s3_url
+        'media_type': media_type,  # NEW: Storing media type
+        'caption': caption,
+        'platform': platform,
+        # Normalised to UTC ISO so the user_id-scheduled_time_utc index sorts and range-filters as time
+        'scheduled_time_utc': scheduled_datetime_utc.isoformat(),
+        'creation_time_utc': creation_time,
+        'status': 'pending',  # Initial status
+        'idempotency_key': idempotency_key,
+        'request_fingerprint': request_fingerprint
+    }
+    if media_sha256:
+        item['media_sha256'] = media_sha256
+    if renditions:
+        item['renditions'] = renditions
+        # Lets the scheduled-posts view skip the original; falls back to it if the thumbnail couldn't be made
+        item['thumbnail_url'] = renditions.get('thumbnail') or media_s3_url
+    if DISPATCH_MODE == 'bucketed':
+        # Picked up by dispatch_sweeper_lambda instead of a schedule of its own
+        item.update(dispatch_fields(post_id, scheduled_datetime_utc))
+    return item, scheduled_datetime_utc
 
-        schedule_name = f"social-post-{post_id}"
-        # EventBridge Scheduler expects a string for the schedule expression
-        # For one-time schedules, use 'at(YYYY-MM-DDTHH:MM:SS)'
-        schedule_expression = f"at({scheduled_datetime_utc.strftime('%Y-%m-%dT%H:%M:%S')})"
 
-        eventbridge_client.create_schedule(
+def create_post_schedule(post_id, platform, scheduled_datetime_utc, target_lambda_arn):
+    """
+    One-time schedule that invokes the poster lambda with the post_id, on SCHEDULER_BACKEND.
+    Returns how many retries botocore needed (throttling included). A schedule that already exists counts as
+    created, so a retried request doesn't fail on its own earlier attempt.
+    """
+    schedule_name = f"social-post-{post_id}"
+    if SCHEDULER_BACKEND == 'local':
+        # The local engine calls the poster handler in-process, so target_lambda_arn isn't used
+        from local_scheduler import get_local_scheduler
+        get_local_scheduler().schedule(schedule_name, scheduled_datetime_utc.timestamp(), {'post_id': post_id})
+        return 0
+
+    # EventBridge Scheduler expects a string for the schedule expression
+    # For one-time schedules, use 'at(YYYY-MM-DDTHH:MM:SS)'
+    schedule_expression = f"at({scheduled_datetime_utc.strftime('%Y-%m-%dT%H:%M:%S')})"
+
+    try:
+        response = eventbridge_client.create_schedule(
             Name=schedule_name,
             Description=f"Schedule for social media post {post_id} on {platform}",
             ScheduleExpression=schedule_expression,
@@ -89,6 +141,121 @@ def lambda_handler(event, context):
             },
             State='ENABLED'
         )
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') == 'ConflictException':
+            return e.response.get('ResponseMetadata', {}).get('RetryAttempts', 0)
+        raise
+    return response.get('ResponseMetadata', {}).get('RetryAttempts', 0)
+
+
+def put_post_item(item):
+    """
+    Writes a new post. If a post with the same post_id is already stored (a replayed request), nothing is written
+    and the stored item is returned instead; otherwise returns None.
+    """
+    try:
+        table.put_item(Item=item, ConditionExpression='attribute_not_exists(post_id)')
+        return None
+    except table.meta.client.exceptions.ConditionalCheckFailedException:
+        return table.get_item(Key={'post_id': item['post_id']}, ConsistentRead=True).get('Item') or {}
+
+
+def replay_conflict(item, existing):
+    """Error message when a client idempotency_key is reused for a different post, else None."""
+    if existing.get('request_fingerprint') != item['request_fingerprint']:
+        return f"idempotency_key {item['idempotency_key']} was already used for a different post."
+    return None
+
+
+def needs_schedule_retry(existing):
+    """A replay only redoes work when the first attempt stored the post but could not create its schedule."""
+    return DISPATCH_MODE == 'per_post' and existing.get('status') == 'schedule_failed'
+
+
+def mark_schedule_failed(post_id, error):
+    # The item is already stored; mark it so it doesn't sit in 'pending' with nothing to fire it
+    try:
+        table.update_item(
+            Key={'post_id': post_id},
+            UpdateExpression='SET #status = :failed, error_message = :error',
+            ExpressionAttributeNames={'#status': 'status'},
+            ExpressionAttributeValues={':failed': 'schedule_failed', ':error': str(error)}
+        )
+    except Exception as update_error:
+        print(f"Could not mark post {post_id} as schedule_failed: {update_error}")
+
+
+def clear_schedule_failed(post_id):
+    """Back to 'pending' once a replay has created the schedule the first attempt couldn't."""
+    try:
+        table.update_item(
+            Key={'post_id': post_id},
+            UpdateExpression='SET #status = :pending REMOVE error_message',
+            ConditionExpression='#status = :failed',
+            ExpressionAttributeNames={'#status': 'status'},
+            ExpressionAttributeValues={':pending': 'pending', ':failed': 'schedule_failed'}
+        )
+    except table.meta.client.exceptions.ConditionalCheckFailedException:
+        pass
+
+
+def lambda_handler(event, context):
+    try:
+        body = json.loads(event['body'])
+
+        try:
+            item, scheduled_datetime_utc = build_post_item(body)
+        except ValueError as e:
+            return {
+                'statusCode': 400,
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'body': json.dumps({'message': str(e)})
+            }
+        post_id = item['post_id']
+
+        # The ARN of the social_media_poster_lambda will be passed as an environment variable
+        # Or you can construct it if you know the region and account ID
+        target_lambda_arn = os.environ.get("SOCIAL_MEDIA_POSTER_LAMBDA_ARN")
+        if DISPATCH_MODE == 'per_post' and SCHEDULER_BACKEND == 'eventbridge' and not target_lambda_arn:
+            return {
+                'statusCode': 500,
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'body': json.dumps({'message': 'SOCIAL_MEDIA_POSTER_LAMBDA_ARN not configured.'})
+            }
+
+        # Store post details in DynamoDB, unless this same request already did
+        existing = put_post_item(item)
+        if existing is not None:
+            conflict = replay_conflict(item, existing)
+            if conflict:
+                return {
+                    'statusCode': 409,
+                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                    'body': json.dumps({'status': 'error', 'message': conflict})
+                }
+            if not needs_schedule_retry(existing):
+                print(f"Replayed schedule request for post {post_id}; nothing new created")
+                return {
+                    'statusCode': 200,
+                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                    'body': json.dumps({
+                        'status': 'success',
+                        'message': 'Post already scheduled',
+                        'post_id': post_id,
+                        'replayed': True
+                    })
+                }
+
+        # --- Create EventBridge Schedule ---
+        # Only in per_post mode; bucketed posts are already findable by the sweeper through dispatch_bucket
+        if DISPATCH_MODE == 'per_post':
+            try:
+                create_post_schedule(post_id, item['platform'], scheduled_datetime_utc, target_lambda_arn)
+            except Exception as e:
+                mark_schedule_failed(post_id, e)
+                raise
+            if existing is not None:
+                clear_schedule_failed(post_id)
 
         return {
             'statusCode': 200,
@@ -99,7 +266,9 @@ def lambda_handler(event, context):
             'body': json.dumps({
                 'status': 'success',
                 'message': 'Post scheduled successfully',
-                'post_id': post_id
+                'post_id': post_id,
+                # A replay that had to re-create its missing schedule did new work, so it isn't reported as one
+                'replayed': False
             })
         }
     except Exception as e:
@@ -111,4 +280,114 @@ def lambda_handler(event, context):
                 'Access-Control-Allow-Origin': '*'
             },
             'body': json.dumps({'status': 'error', 'message': f'Internal server error: {str(e)}'})
-        }
\ No newline at end of file
+        }
+
+
+def bulk_lambda_handler(event, context):
+    """
+    Schedules many posts in one request.
+    Body: {'posts': [{same fields as a single schedule request}, ...]}
+    Valid posts are stored with conditional puts and (in per_post dispatch mode) scheduled, SCHEDULE_MAX_WORKERS
+    at a time; one bad post does not fail the rest. Posts that already exist (replays) are not written or
+    scheduled again. Results come back in request order.
+    """
+    try:
+        body = json.loads(event['body'])
+        posts = body.get('posts')
+        if not posts or not isinstance(posts, list) or len(posts) > MAX_BULK_POSTS:
+            return {
+                'statusCode': 400,
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'body': json.dumps({'message': f'posts must be a non-empty list of at most {MAX_BULK_POSTS} posts.'})
+            }
+
+        target_lambda_arn = os.environ.get("SOCIAL_MEDIA_POSTER_LAMBDA_ARN")
+        if DISPATCH_MODE == 'per_post' and SCHEDULER_BACKEND == 'eventbridge' and not target_lambda_arn:
+            return {
+                'statusCode': 500,
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'body': json.dumps({'message': 'SOCIAL_MEDIA_POSTER_LAMBDA_ARN not configured.'})
+            }
+
+        results = [None] * len(posts)
+        valid = []  # (index, item, scheduled_datetime_utc)
+        first_index = {}  # post_id -> index of its first occurrence in this request
+        duplicates = []  # (index, first index) for posts repeated within the request
+        for index, post in enumerate(posts):
+            try:
+                if not isinstance(post, dict):
+                    raise ValueError('Each post must be an object.')
+                item, scheduled_datetime_utc = build_post_item(post)
+                if item['post_id'] in first_index:
+                    first = valid[first_index[item['post_id']]][1]
+                    conflict = replay_conflict(item, first)
+                    if conflict:
+                        raise ValueError(conflict)
+                    duplicates.append((index, valid[first_index[item['post_id']]][0]))
+                    continue
+                first_index[item['post_id']] = len(valid)
+                valid.append((index, item, scheduled_datetime_utc))
+            except ValueError as e:
+                results[index] = {'index': index, 'status': 'error', 'message': str(e)}
+
+        def store_and_schedule(entry):
+            """
+            The conditional put decides new vs replay atomically, so concurrent submissions of the same posts can't
+            overwrite a post that is already stored (and maybe claimed or posted).
+            """
+            index, item, scheduled_datetime_utc = entry
+            post_id = item['post_id']
+            try:
+                stored = put_post_item(item)
+            except Exception as e:
+                print(f"Error storing post {post_id} (index {index}): {e}")
+                return {'index': index, 'status': 'error', 'post_id': post_id,
+                        'message': f'Could not store the post: {e}'}
+            if stored is not None:
+                # Replay of an earlier request: nothing to redo unless its schedule failed last time
+                conflict = replay_conflict(item, stored)
+                if conflict:
+                    return {'index': index, 'status': 'error', 'message': conflict}
+                if not needs_schedule_retry(stored):
+                    return {'index': index, 'status': 'success', 'post_id': post_id,
+                            'scheduled_time_utc': item['scheduled_time_utc'], 'retries': 0, 'replayed': True}
+            if DISPATCH_MODE != 'per_post':
+                return {'index': index, 'status': 'success', 'post_id': post_id,
+                        'scheduled_time_utc': item['scheduled_time_utc'], 'retries': 0, 'replayed': False}
+            try:
+                retries = create_post_schedule(post_id, item['platform'], scheduled_datetime_utc, target_lambda_arn)
+            except Exception as e:
+                print(f"Error creating schedule for post {post_id} (index {index}): {e}")
+                mark_schedule_failed(post_id, e)
+                return {'index': index, 'status': 'error', 'post_id': post_id, 'message': str(e)}
+            if stored is not None:
+                clear_schedule_failed(post_id)
+            return {'index': index, 'status': 'success', 'post_id': post_id,
+                    'scheduled_time_utc': item['scheduled_time_utc'], 'retries': retries, 'replayed': False}
+
+        if valid:
+            with ThreadPoolExecutor(max_workers=min(SCHEDULE_MAX_WORKERS, len(valid))) as executor:
+                for result in executor.map(store_and_schedule, valid):
+                    results[result['index']] = result
+
+        for index, first in duplicates:
+            results[index] = {**results[first], 'index': index, 'retries': 0, 'replayed': True}
+
+        failed = [result for result in results if result['status'] == 'error']
+        return {
+            'statusCode': 207 if failed else 200, # 207 Multi-Status on partial failure
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({
+                'message': f'{len(results) - len(failed)} of {len(results)} posts scheduled',
+                'results': results,
+                'failed_count': len(failed),
+                'total_retries': sum(result.get('retries', 0) for result in results)
+            })
+        }
+    except Exception as e:
+        print(f"Error in bulk scheduling: {e}")
+        return {
+            'statusCode': 500,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'message': f'Internal server error: {str(e)}'})
+        }
@@ -252,6 +252,8 @@ def lambda_handler(event, context):
         media_s3_url = item.get('media_s3_url')
         # 'media_type' tells us if it's an 'image' or 'video', default to 'image' for older entries
         media_type = item.get('media_type', 'image')
+        # Instagram feed rendition (1080px wide) from the upload pipeline, when the post has one
+        feed_media_url = (item.get('renditions') or {}).get('feed_1080') or media_s3_url
 
         caption = item.get('caption')
         platform = item.get('platform')
@@ -287,7 +289,7 @@ def lambda_handler(event, context):
 
         if platform == "Instagram":
             if media_type == "image":
-                success, message = post_to_instagram_image(media_s3_url, caption, all_credentials)
+                success, message = post_to_instagram_image(feed_media_url, caption, all_credentials)
             elif media_type == "video":
                 success, message = post_to_instagram_video(media_s3_url, caption, all_credentials)
             else:
@@ -295,7 +297,7 @@ def lambda_handler(event, context):
                 print(message)
         elif platform == "Facebook":
             if media_type == "image":
-                success, message = post_to_facebook_image(media_s3_url, caption, all_credentials)
+                success, message = post_to_facebook_image(feed_media_url, caption, all_credentials)
             elif media_type == "video":
                 success, message = post_to_facebook_video(media_s3_url, caption, all_credentials)
             else:
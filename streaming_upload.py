@@ -0,0 +1,61 @@
+import base64
+import hashlib
+import os
+
+# Decoded bytes per multipart part. Must be at least 5 MiB (the S3 minimum for non-final parts);
+# rounded down to a multiple of 3 so each slice maps to whole base64 quads.
+STREAM_PART_SIZE = int(os.environ.get("UPLOAD_STREAM_PART_SIZE", 8 * 1024 * 1024))
+
+
+def iter_base64_chunks(data_base64, chunk_size=STREAM_PART_SIZE):
+    """
+    Decodes a base64 string in fixed-size slices, yielding at most chunk_size bytes at a time.
+    Expects unwrapped base64 (no line breaks), as produced by base64.b64encode.
+    """
+    step = (chunk_size // 3) * 4
+    for start in range(0, len(data_base64), step):
+        yield base64.b64decode(data_base64[start:start + step])
+
+
+def sha256_base64(data_base64, chunk_size=STREAM_PART_SIZE):
+    """Hex SHA-256 of the decoded content, computed slice by slice."""
+    digest = hashlib.sha256()
+    for chunk in iter_base64_chunks(data_base64, chunk_size):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def upload_base64_streaming(s3_client, data_base64, bucket, key, content_type, part_size=STREAM_PART_SIZE,
+                            metadata=None):
+    """
+    Uploads base64 data to S3 without ever materialising the whole decoded file.
+    Each decoded slice becomes one multipart part, so peak memory is a single part on top of the input.
+    Returns the number of decoded bytes written.
+    """
+    # Small files fit in one part: a plain put_object saves the multipart round trips
+    if len(data_base64) <= (part_size // 3) * 4:
+        body = base64.b64decode(data_base64)
+        s3_client.put_object(Bucket=bucket, Key=key, Body=body, ContentType=content_type, Metadata=metadata or {})
+        return len(body)
+
+    upload_id = s3_client.create_multipart_upload(
+        Bucket=bucket, Key=key, ContentType=content_type, Metadata=metadata or {}
+    )['UploadId']
+    parts = []
+    total_bytes = 0
+    try:
+        for part_number, chunk in enumerate(iter_base64_chunks(data_base64, part_size), start=1):
+            response = s3_client.upload_part(
+                Bucket=bucket, Key=key, UploadId=upload_id, PartNumber=part_number, Body=chunk
+            )
+            parts.append({'PartNumber': part_number, 'ETag': response['ETag']})
+            total_bytes += len(chunk)
+
+        s3_client.complete_multipart_upload(
+            Bucket=bucket, Key=key, UploadId=upload_id, MultipartUpload={'Parts': parts}
+        )
+    except Exception:
+        s3_client.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id)
+        raise
+
+    return total_bytes
@@ -0,0 +1,79 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+import boto3
+
+
+class TwoTierCache:
+    """
+    In-process LRU (tier 1, survives across warm invocations of the same container) in front of an optional
+    DynamoDB table (tier 2) with a TTL attribute named 'expires_at'. Values must be JSON-serializable.
+    """
+
+    def __init__(self, name, lru_size, table_name=None, extra_stats=()):
+        self.name = name
+        self.lru_size = lru_size
+        self._lru = OrderedDict()  # cache_key -> (value, expires_at)
+        self._lru_lock = threading.Lock()
+        self._table = boto3.resource('dynamodb').Table(table_name) if table_name else None
+        # Per-container counters, returned with every response so hit rates show up in logs
+        self.stats = dict.fromkeys(('memory_hits', 'dynamodb_hits', 'misses') + tuple(extra_stats), 0)
+        self._stats_lock = threading.Lock()
+
+    def count(self, stat):
+        # Callers read the cache from several threads at once
+        with self._stats_lock:
+            self.stats[stat] += 1
+
+    def _remember(self, cache_key, value, expires_at):
+        with self._lru_lock:
+            self._lru[cache_key] = (value, expires_at)
+            self._lru.move_to_end(cache_key)
+            while len(self._lru) > self.lru_size:
+                self._lru.popitem(last=False)
+
+    def get(self, cache_key):
+        """Returns (value, tier) for an unexpired entry, (None, None) otherwise."""
+        now = time.time()
+        with self._lru_lock:
+            entry = self._lru.get(cache_key)
+            if entry and entry[1] > now:
+                self._lru.move_to_end(cache_key)
+                self.count('memory_hits')
+                return entry[0], 'memory'
+
+        if self._table is not None:
+            try:
+                item = self._table.get_item(Key={'cache_key': cache_key}).get('Item')
+                # DynamoDB deletes expired items lazily, so check the TTL ourselves
+                if item and int(item.get('expires_at', 0)) > now:
+                    value = json.loads(item['payload'])
+                    self._remember(cache_key, value, int(item['expires_at']))
+                    self.count('dynamodb_hits')
+                    return value, 'dynamodb'
+            except Exception as e:
+                print(f"{self.name} read failed for {cache_key}: {e}")
+
+        self.count('misses')
+        return None, None
+
+    def put(self, cache_key, value, expires_at):
+        """Stores value in both tiers until expires_at (epoch seconds)."""
+        expires_at = int(expires_at)
+        self._remember(cache_key, value, expires_at)
+        if self._table is not None:
+            try:
+                self._table.put_item(Item={'cache_key': cache_key, 'payload': json.dumps(value),
+                                           'expires_at': expires_at})
+            except Exception as e:
+                print(f"{self.name} write failed for {cache_key}: {e}")
+
+    def forget(self, cache_key):
+        with self._lru_lock:
+            self._lru.pop(cache_key, None)
+        if self._table is not None:
+            try:
+                self._table.delete_item(Key={'cache_key': cache_key})
+            except Exception as e:
+                print(f"{self.name} delete failed for {cache_key}: {e}")
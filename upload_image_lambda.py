@@ -1,20 +1,147 @@
 import json
 import boto3
 import base64
-import uuid
+import hashlib
 import os
+from concurrent.futures import ThreadPoolExecutor
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from streaming_upload import upload_base64_streaming, sha256_base64
+from image_processing import build_renditions, RENDITION_NAMES
 
-s3_client = boto3.client('s3')
+# Bounded worker pool for batch uploads
+UPLOAD_MAX_WORKERS = int(os.environ.get("UPLOAD_MAX_WORKERS", 8))
+MAX_BATCH_FILES = int(os.environ.get("MAX_BATCH_FILES", 100))
+
+# Each batch worker may also write 4 renditions in parallel, so size the connection pool for both
+s3_client = boto3.client('s3', config=Config(max_pool_connections=UPLOAD_MAX_WORKERS * 5))
 
 # Replace with your S3 bucket name
 S3_BUCKET_NAME = os.environ.get("S3_BUCKET_NAME", "your-unique-image-upload-bucket-name")
 
+# When enabled, base64 payloads are decoded slice by slice into a multipart upload instead of all at once
+UPLOAD_STREAMING_MODE = os.environ.get("UPLOAD_STREAMING_MODE", "false").lower() == "true"
+
+# Feed/4:5/thumbnail/model-input derivatives written next to each original
+GENERATE_RENDITIONS = os.environ.get("GENERATE_RENDITIONS", "true").lower() == "true"
+
+
+def object_exists(s3_key):
+    """
+    HEADs the key so a re-upload of identical content can skip the write.
+    The Lambda role needs s3:ListBucket, otherwise S3 answers 403 instead of 404 for missing keys.
+    """
+    try:
+        s3_client.head_object(Bucket=S3_BUCKET_NAME, Key=s3_key)
+        return True
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+            return False
+        raise
+
+
+def store_renditions(content_sha256, image_bytes):
+    """
+    Renders and uploads the platform derivatives, returning {rendition_name: s3_url}.
+    The original is already stored by now, so a rendition that can't be rendered or written is logged and left
+    out rather than failing the upload; consumers fall back to the original for anything missing.
+    """
+    try:
+        renditions = build_renditions(image_bytes)
+    except Exception as e:
+        print(f"Could not decode {content_sha256} for renditions; keeping the original only: {e}")
+        return {}
+
+    def put_rendition(item):
+        name, rendition_bytes = item
+        s3_key = f"renditions/{content_sha256}/{name}.jpg"
+        try:
+            s3_client.put_object(Bucket=S3_BUCKET_NAME, Key=s3_key, Body=rendition_bytes, ContentType='image/jpeg',
+                                 Metadata={'sha256': content_sha256})
+        except Exception as e:
+            print(f"Could not store rendition {name} of {content_sha256}: {e}")
+            return name, None
+        return name, f"https://{S3_BUCKET_NAME}.s3.amazonaws.com/{s3_key}"
+
+    if not renditions:
+        return {}
+    with ThreadPoolExecutor(max_workers=len(renditions)) as executor:
+        return {name: url for name, url in executor.map(put_rendition, renditions.items()) if url}
+
+
+def existing_rendition_urls(content_sha256):
+    """
+    Returns the stored rendition URLs for already-seen content, or None if any are missing (never rendered, or an
+    earlier upload could only store some of them) so they get rendered again.
+    """
+    prefix = f"renditions/{content_sha256}/"
+    response = s3_client.list_objects_v2(Bucket=S3_BUCKET_NAME, Prefix=prefix)
+    stored = {obj['Key'][len(prefix):-len('.jpg')] for obj in response.get('Contents', [])}
+    if not set(RENDITION_NAMES) <= stored:
+        return None
+    return {name: f"https://{S3_BUCKET_NAME}.s3.amazonaws.com/{prefix}{name}.jpg" for name in RENDITION_NAMES}
+
+
+def store_image(image_data_base64, filename, stream=UPLOAD_STREAMING_MODE, generate_renditions=GENERATE_RENDITIONS):
+    """Stores one base64 image (deduplicated by content hash) and returns its upload result."""
+    # Content-addressed key: identical images always map to the same object
+    file_extension = filename.split('.')[-1].lower() if '.' in filename else 'png'
+    if stream:
+        content_sha256 = sha256_base64(image_data_base64)
+    else:
+        # Decode base64 image data
+        image_bytes = base64.b64decode(image_data_base64)
+        content_sha256 = hashlib.sha256(image_bytes).hexdigest()
+    s3_key = f"uploads/{content_sha256}.{file_extension}" # Store in an 'uploads' folder
+    content_type = f'image/{file_extension}'
+
+    # Upload to S3 unless this exact content is already stored
+    deduplicated = object_exists(s3_key)
+    if deduplicated:
+        print(f"Content {content_sha256} already stored at {s3_key}; skipping upload.")
+    elif stream:
+        upload_base64_streaming(s3_client, image_data_base64, S3_BUCKET_NAME, s3_key, content_type,
+                                metadata={'sha256': content_sha256})
+    else:
+        s3_client.put_object(Bucket=S3_BUCKET_NAME, Key=s3_key, Body=image_bytes, ContentType=content_type,
+                             Metadata={'sha256': content_sha256})
+
+    # Generate the S3 URL
+    s3_url = f"https://{S3_BUCKET_NAME}.s3.amazonaws.com/{s3_key}"
+
+    renditions = {}
+    if generate_renditions:
+        renditions = existing_rendition_urls(content_sha256) if deduplicated else None
+        if renditions is None:
+            if stream:
+                # PIL needs the whole file anyway; decode only now, after the original has been streamed out
+                image_bytes = base64.b64decode(image_data_base64)
+            renditions = store_renditions(content_sha256, image_bytes)
+
+    return {
+        's3_url': s3_url,
+        'content_sha256': content_sha256, # Stable media identity for caption/schedule calls
+        'deduplicated': deduplicated,
+        'renditions': renditions
+    }
+
+
 def lambda_handler(event, context):
     try:
-        # Parse the request body
-        body = json.loads(event['body'])
-        image_data_base64 = body.get('image_data')
-        filename = body.get('filename', 'uploaded_image.png')
+        if event.get('isBase64Encoded'):
+            # Raw binary upload: API Gateway hands us the file itself as base64, metadata comes in the query string
+            query_params = event.get('queryStringParameters') or {}
+            image_data_base64 = event['body']
+            filename = query_params.get('filename', 'uploaded_image.png')
+            stream = True
+            generate_renditions = query_params.get('renditions', str(GENERATE_RENDITIONS)).lower() == 'true'
+        else:
+            # Parse the request body
+            body = json.loads(event['body'])
+            image_data_base64 = body.pop('image_data', None)
+            filename = body.get('filename', 'uploaded_image.png')
+            stream = body.get('stream', UPLOAD_STREAMING_MODE)
+            generate_renditions = body.get('renditions', GENERATE_RENDITIONS)
 
         if not image_data_base64:
             return {
@@ -22,19 +149,7 @@ def lambda_handler(event, context):
                 'body': json.dumps({'message': 'Missing image_data in request body.'})
             }
 
-        # Decode base64 image data
-        image_bytes = base64.b64decode(image_data_base64)
-
-        # Generate a unique filename for S3
-        file_extension = filename.split('.')[-1] if '.' in filename else 'png'
-        unique_filename = f"{uuid.uuid4()}.{file_extension}"
-        s3_key = f"uploads/{unique_filename}" # Store in an 'uploads' folder
-
-        # Upload to S3
-        s3_client.put_object(Bucket=S3_BUCKET_NAME, Key=s3_key, Body=image_bytes, ContentType=f'image/{file_extension}')
-
-        # Generate the S3 URL
-        s3_url = f"https://{S3_BUCKET_NAME}.s3.amazonaws.com/{s3_key}"
+        result = store_image(image_data_base64, filename, stream, generate_renditions)
 
         return {
             'statusCode': 200,
@@ -43,8 +158,8 @@ def lambda_handler(event, context):
                 'Access-Control-Allow-Origin': '*' # IMPORTANT for CORS with Streamlit
             },
             'body': json.dumps({
-                'message': 'Image uploaded successfully',
-                's3_url': s3_url
+                'message': 'Image already uploaded' if result['deduplicated'] else 'Image uploaded successfully',
+                **result
             })
         }
     except Exception as e:
@@ -58,3 +173,56 @@ def lambda_handler(event, context):
             'body': json.dumps({'message': f'Internal server error: {str(e)}'})
         }
 
+
+def batch_lambda_handler(event, context):
+    """
+    Uploads many images in one request.
+    Body: {'files': [{'image_data': <base64>, 'filename': 'a.jpg'}, ...], 'renditions': bool}
+    Files are written concurrently; one bad file does not fail the rest.
+    """
+    try:
+        body = json.loads(event['body'])
+        files = body.pop('files', None)
+        stream = body.get('stream', UPLOAD_STREAMING_MODE)
+        generate_renditions = body.get('renditions', GENERATE_RENDITIONS)
+
+        if not files or not isinstance(files, list) or len(files) > MAX_BATCH_FILES:
+            return {
+                'statusCode': 400,
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'body': json.dumps({'message': f'files must be a non-empty list of at most {MAX_BATCH_FILES} images.'})
+            }
+
+        def upload_one(indexed_file):
+            index, file_entry = indexed_file
+            filename = file_entry.get('filename', 'uploaded_image.png')
+            image_data_base64 = file_entry.pop('image_data', None)
+            if not image_data_base64:
+                return {'index': index, 'filename': filename, 'status': 'error', 'message': 'Missing image_data.'}
+            try:
+                result = store_image(image_data_base64, filename, stream, generate_renditions)
+                return {'index': index, 'filename': filename, 'status': 'success', **result}
+            except Exception as e:
+                print(f"Error uploading {filename} (index {index}): {e}")
+                return {'index': index, 'filename': filename, 'status': 'error', 'message': str(e)}
+
+        with ThreadPoolExecutor(max_workers=min(UPLOAD_MAX_WORKERS, len(files))) as executor:
+            results = list(executor.map(upload_one, enumerate(files)))
+
+        failed = [result for result in results if result['status'] == 'error']
+        return {
+            'statusCode': 207 if failed else 200, # 207 Multi-Status on partial failure
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({
+                'message': f'{len(results) - len(failed)} of {len(results)} images uploaded',
+                'results': results,
+                'failed_count': len(failed)
+            })
+        }
+    except Exception as e:
+        print(f"Error in batch upload: {e}")
+        return {
+            'statusCode': 500,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'message': f'Internal server error: {str(e)}'})
+        }
@@ -3,12 +3,92 @@ import boto3
 import uuid
 import os
 import base64
+import math
+from concurrent.futures import ThreadPoolExecutor
+from streaming_upload import upload_base64_streaming
 
 s3_client = boto3.client('s3')
 
 # Environment variable for your S3 bucket name
 S3_BUCKET_NAME = os.environ.get("S3_BUCKET_NAME")
 
+# Multipart upload sessions: the client PUTs each part straight to S3 with a presigned URL,
+# so the video bytes never pass through API Gateway or this Lambda.
+VIDEO_UPLOAD_PART_SIZE = int(os.environ.get("VIDEO_UPLOAD_PART_SIZE", 8 * 1024 * 1024))
+PRESIGNED_URL_EXPIRY_SECONDS = int(os.environ.get("PRESIGNED_URL_EXPIRY_SECONDS", 3600))
+S3_MIN_PART_SIZE = 5 * 1024 * 1024  # S3 rejects non-final parts smaller than 5 MiB
+S3_MAX_PARTS = 10000
+
+# Bounded worker pool for batch session start/complete calls
+UPLOAD_MAX_WORKERS = int(os.environ.get("UPLOAD_MAX_WORKERS", 8))
+MAX_BATCH_FILES = int(os.environ.get("MAX_BATCH_FILES", 100))
+
+# When enabled, base64 payloads are decoded slice by slice into a multipart upload instead of all at once
+UPLOAD_STREAMING_MODE = os.environ.get("UPLOAD_STREAMING_MODE", "false").lower() == "true"
+
+
+def start_multipart_upload(file_name, file_size):
+    """Creates an S3 multipart upload and presigns one PUT URL per part."""
+    file_extension = os.path.splitext(file_name)[1]
+    s3_key = f"videos/{uuid.uuid4()}{file_extension}"
+
+    # Grow the part size for very large files so we stay under the S3 part limit
+    part_size = max(VIDEO_UPLOAD_PART_SIZE, S3_MIN_PART_SIZE, math.ceil(file_size / S3_MAX_PARTS))
+    num_parts = max(1, math.ceil(file_size / part_size))
+
+    upload = s3_client.create_multipart_upload(
+        Bucket=S3_BUCKET_NAME,
+        Key=s3_key,
+        ContentType=f"video/{file_extension.lstrip('.')}"
+    )
+    upload_id = upload['UploadId']
+
+    parts = []
+    for part_number in range(1, num_parts + 1):
+        url = s3_client.generate_presigned_url(
+            'upload_part',
+            Params={'Bucket': S3_BUCKET_NAME, 'Key': s3_key, 'UploadId': upload_id, 'PartNumber': part_number},
+            ExpiresIn=PRESIGNED_URL_EXPIRY_SECONDS
+        )
+        parts.append({'part_number': part_number, 'url': url})
+
+    return {
+        'upload_id': upload_id,
+        's3_key': s3_key,
+        'part_size': part_size,
+        'parts': parts
+    }
+
+
+def complete_multipart_upload(upload_id, s3_key, parts):
+    """Stitches the uploaded parts together and returns the final video URL."""
+    # S3 requires the part list in ascending PartNumber order
+    multipart_parts = sorted(
+        ({'PartNumber': int(part['PartNumber']), 'ETag': part['ETag']} for part in parts),
+        key=lambda part: part['PartNumber']
+    )
+    s3_client.complete_multipart_upload(
+        Bucket=S3_BUCKET_NAME,
+        Key=s3_key,
+        UploadId=upload_id,
+        MultipartUpload={'Parts': multipart_parts}
+    )
+    return f"https://{S3_BUCKET_NAME}.s3.amazonaws.com/{s3_key}"
+
+
+def run_batch(items, operation):
+    """Applies operation to every item on the worker pool, collecting per-item results and errors."""
+    def run_one(indexed_item):
+        index, item = indexed_item
+        try:
+            return {'index': index, 'status': 'success', **operation(item)}
+        except Exception as e:
+            print(f"Error in batch item {index}: {e}")
+            return {'index': index, 'status': 'error', 'message': str(e)}
+
+    with ThreadPoolExecutor(max_workers=min(UPLOAD_MAX_WORKERS, len(items))) as executor:
+        return list(executor.map(run_one, enumerate(items)))
+
 
 def lambda_handler(event, context):
     try:
@@ -19,9 +99,100 @@ def lambda_handler(event, context):
                 'body': json.dumps({'message': 'S3_BUCKET_NAME environment variable not set.'})
             }
 
-        body = json.loads(event['body'])
-        video_data_b64 = body.get('video_data_b64')
+        if event.get('isBase64Encoded'):
+            # Raw binary upload: API Gateway hands us the file itself as base64, metadata comes in the query string
+            query_params = event.get('queryStringParameters') or {}
+            body = {'video_data_b64': event['body'], 'file_name': query_params.get('file_name'), 'stream': True}
+        else:
+            body = json.loads(event['body'])
+        action = body.get('action')
+
+        # --- Upload session API (presigned multipart) ---
+        if action == 'start_upload':
+            file_name = body.get('file_name')
+            file_size = body.get('file_size')
+            if not file_name or not isinstance(file_size, int) or file_size <= 0:
+                return {
+                    'statusCode': 400,
+                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                    'body': json.dumps({'message': 'Missing file_name or a positive integer file_size.'})
+                }
+            session = start_multipart_upload(file_name, file_size)
+            return {
+                'statusCode': 200,
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'body': json.dumps({'status': 'success', **session})
+            }
+
+        if action == 'complete_upload':
+            upload_id = body.get('upload_id')
+            s3_key = body.get('s3_key')
+            parts = body.get('parts')
+            if not upload_id or not s3_key or not parts:
+                return {
+                    'statusCode': 400,
+                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                    'body': json.dumps({'message': 'Missing upload_id, s3_key or parts.'})
+                }
+            video_s3_url = complete_multipart_upload(upload_id, s3_key, parts)
+            return {
+                'statusCode': 200,
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'body': json.dumps({
+                    'status': 'success',
+                    'message': 'Video uploaded successfully',
+                    'video_s3_url': video_s3_url
+                })
+            }
+
+        if action in ('start_batch_upload', 'complete_batch_upload'):
+            # Many upload sessions in one round trip: files=[{file_name, file_size}] to start,
+            # uploads=[{upload_id, s3_key, parts}] to complete
+            items = body.get('files') if action == 'start_batch_upload' else body.get('uploads')
+            if not items or not isinstance(items, list) or len(items) > MAX_BATCH_FILES:
+                return {
+                    'statusCode': 400,
+                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                    'body': json.dumps({'message': f'Expected a non-empty list of at most {MAX_BATCH_FILES} items.'})
+                }
+            if action == 'start_batch_upload':
+                results = run_batch(items, lambda item: {
+                    'file_name': item['file_name'],
+                    **start_multipart_upload(item['file_name'], int(item['file_size']))
+                })
+            else:
+                results = run_batch(items, lambda item: {
+                    's3_key': item['s3_key'],
+                    'video_s3_url': complete_multipart_upload(item['upload_id'], item['s3_key'], item['parts'])
+                })
+            failed_count = sum(1 for result in results if result['status'] == 'error')
+            return {
+                'statusCode': 207 if failed_count else 200, # 207 Multi-Status on partial failure
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'body': json.dumps({'status': 'success', 'results': results, 'failed_count': failed_count})
+            }
+
+        if action == 'abort_upload':
+            upload_id = body.get('upload_id')
+            s3_key = body.get('s3_key')
+            if not upload_id or not s3_key:
+                return {
+                    'statusCode': 400,
+                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                    'body': json.dumps({'message': 'Missing upload_id or s3_key.'})
+                }
+            # Frees the storage held by any parts that were already uploaded
+            s3_client.abort_multipart_upload(Bucket=S3_BUCKET_NAME, Key=s3_key, UploadId=upload_id)
+            return {
+                'statusCode': 200,
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'body': json.dumps({'status': 'success', 'message': 'Upload aborted'})
+            }
+
+        # --- Legacy path: whole video inlined as base64 in the request body ---
+        video_data_b64 = body.pop('video_data_b64', None)
         file_name = body.get('file_name')
+        stream = body.get('stream', UPLOAD_STREAMING_MODE)
 
         if not video_data_b64 or not file_name:
             return {
@@ -30,20 +201,23 @@ def lambda_handler(event, context):
                 'body': json.dumps({'message': 'Missing video_data_b64 or file_name.'})
             }
 
-        # Decode base64 video data
-        video_bytes = base64.b64decode(video_data_b64)
-
         # Generate a unique file name for S3
         file_extension = os.path.splitext(file_name)[1]  # e.g., .mp4, .mov
         unique_file_name = f"videos/{uuid.uuid4()}{file_extension}"  # Store in 'videos/' folder
 
         # Upload video to S3
-        s3_client.put_object(
-            Bucket=S3_BUCKET_NAME,
-            Key=unique_file_name,
-            Body=video_bytes,
-            ContentType=f"video/{file_extension.lstrip('.')}"  # Set appropriate content type
-        )
+        content_type = f"video/{file_extension.lstrip('.')}"  # Set appropriate content type
+        if stream:
+            upload_base64_streaming(s3_client, video_data_b64, S3_BUCKET_NAME, unique_file_name, content_type)
+        else:
+            # Decode base64 video data
+            video_bytes = base64.b64decode(video_data_b64)
+            s3_client.put_object(
+                Bucket=S3_BUCKET_NAME,
+                Key=unique_file_name,
+                Body=video_bytes,
+                ContentType=content_type
+            )
 
         video_s3_url = f"https://{S3_BUCKET_NAME}.s3.amazonaws.com/{unique_file_name}"
         # For public access (if S3 bucket policy allows GetObject), this URL will work.
@@ -0,0 +1,129 @@
+import json
+import os
+import boto3
+from media_fetch import parse_s3_url
+from video_jobs import create_job, get_job, finish_job
+from video_segments import segment_options
+
+# Submit/status front end for video captioning. Kept free of GCS and Gemini so it answers in milliseconds;
+# the work runs in the video caption lambda (geneerate_video_caption_lambda), invoked asynchronously.
+VIDEO_CAPTION_WORKER_FUNCTION_NAME = os.environ.get("VIDEO_CAPTION_WORKER_FUNCTION_NAME", "generate_video_caption_lambda")
+
+lambda_client = boto3.client('lambda')
+
+# What a job request may carry through to the worker
+JOB_REQUEST_FIELDS = ('video_s3_url', 'style', 'custom_prompt', 'target_audience', 'business_goals', 'num_variants',
+                      'caption_mode', 'num_keyframes', 'keyframe_strategy', 'media_sha256', 'segment_seconds',
+                      'segment_concurrency')
+
+
+def submit_job(body):
+    video_s3_url = body.get('video_s3_url')
+    if not video_s3_url:
+        return {
+            'statusCode': 400,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': json.dumps({'message': 'Missing video_s3_url in request body.'})
+        }
+    if not parse_s3_url(video_s3_url):
+        return {
+            'statusCode': 400,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': json.dumps({'message': 'Invalid S3 video URL format.'})
+        }
+    try:
+        segment_options(body)
+    except ValueError as e:
+        return {
+            'statusCode': 400,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': json.dumps({'message': str(e)})
+        }
+
+    request = {field: body[field] for field in JOB_REQUEST_FIELDS if body.get(field) is not None}
+    job_id = create_job(request)
+    try:
+        # InvocationType='Event' queues the work and returns at once (202 from Lambda)
+        lambda_client.invoke(
+            FunctionName=VIDEO_CAPTION_WORKER_FUNCTION_NAME,
+            InvocationType='Event',
+            Payload=json.dumps({'job_id': job_id, **request}).encode('utf-8')
+        )
+    except Exception as e:
+        print(f"Failed to start video caption job {job_id}: {e}")
+        finish_job(job_id, error=f'Could not start the caption worker: {e}')
+        return {
+            'statusCode': 500,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': json.dumps({'message': f'Failed to start video caption job: {str(e)}', 'job_id': job_id})
+        }
+
+    print(f"Queued video caption job {job_id} for {video_s3_url}")
+    return {
+        'statusCode': 202,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*'
+        },
+        'body': json.dumps({'job_id': job_id, 'status': 'queued', 'stage': 'queued'})
+    }
+
+
+def lambda_handler(event, context):
+    """POST {video caption request} -> 202 {job_id}; GET ?job_id=... -> the job's status, stage and result."""
+    try:
+        if event.get('httpMethod') == 'GET':
+            query_params = event.get('queryStringParameters') or {}
+            path_params = event.get('pathParameters') or {}
+            job_id = path_params.get('job_id') or query_params.get('job_id')
+            if not job_id:
+                return {
+                    'statusCode': 400,
+                    'headers': {
+                        'Content-Type': 'application/json',
+                        'Access-Control-Allow-Origin': '*'
+                    },
+                    'body': json.dumps({'message': 'Missing job_id.'})
+                }
+            job = get_job(job_id)
+            if not job:
+                return {
+                    'statusCode': 404,
+                    'headers': {
+                        'Content-Type': 'application/json',
+                        'Access-Control-Allow-Origin': '*'
+                    },
+                    'body': json.dumps({'message': f'Video caption job {job_id} not found.'})
+                }
+            return {
+                'statusCode': 200,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': '*'
+                },
+                'body': json.dumps(job)
+            }
+
+        return submit_job(json.loads(event.get('body') or '{}'))
+    except Exception as e:
+        print(f"Error handling video caption job request: {e}")
+        return {
+            'statusCode': 500,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': json.dumps({'message': f'Internal server error: {str(e)}'})
+        }
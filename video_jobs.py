@@ -0,0 +1,125 @@
+import json
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+import boto3
+
+# One item per video caption job: job_id (hash key), status, stage, request/result JSON, expires_at (TTL)
+VIDEO_CAPTION_JOBS_TABLE_NAME = os.environ.get("VIDEO_CAPTION_JOBS_TABLE_NAME", "VideoCaptionJobs")
+VIDEO_CAPTION_JOB_TTL_SECONDS = int(os.environ.get("VIDEO_CAPTION_JOB_TTL_SECONDS", 7 * 24 * 3600))
+# A worker holds a running job until lease_expires_at (epoch seconds): its remaining Lambda time plus this margin,
+# or VIDEO_CAPTION_JOB_LEASE_SECONDS when that isn't known. A worker killed by a timeout or OOM never finishes the
+# job, so once the lease runs out Lambda's async retry may claim it again.
+VIDEO_CAPTION_JOB_LEASE_SECONDS = int(os.environ.get("VIDEO_CAPTION_JOB_LEASE_SECONDS", 960))
+VIDEO_CAPTION_JOB_LEASE_MARGIN_SECONDS = int(os.environ.get("VIDEO_CAPTION_JOB_LEASE_MARGIN_SECONDS", 30))
+# Past the lease by this long, no retry is coming (Lambda retries async invokes within ~3 minutes), so status
+# reads settle the job as failed instead of leaving it running forever
+VIDEO_CAPTION_JOB_STALE_GRACE_SECONDS = int(os.environ.get("VIDEO_CAPTION_JOB_STALE_GRACE_SECONDS", 300))
+
+jobs_table = boto3.resource('dynamodb').Table(VIDEO_CAPTION_JOBS_TABLE_NAME)
+
+# status moves queued -> running -> succeeded | failed. stage says what a running job is doing right now:
+# queued, fetching + describing (keyframes, segments) or staging/uploading/processing (full video), generating, done
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def create_job(request):
+    job_id = str(uuid.uuid4())
+    jobs_table.put_item(Item={
+        'job_id': job_id,
+        'status': 'queued',
+        'stage': 'queued',
+        'request': json.dumps(request),
+        'created_at': _now(),
+        'updated_at': _now(),
+        'expires_at': int(time.time()) + VIDEO_CAPTION_JOB_TTL_SECONDS
+    })
+    return job_id
+
+
+def claim_job(job_id, lease_seconds=VIDEO_CAPTION_JOB_LEASE_SECONDS):
+    """
+    Moves a queued job, or a running one whose lease has run out, to running under a new lease.
+    False if another worker still holds it or it has finished (e.g. a redelivered async invoke).
+    """
+    now = int(time.time())
+    try:
+        jobs_table.update_item(
+            Key={'job_id': job_id},
+            UpdateExpression='SET #status = :running, updated_at = :now, lease_expires_at = :lease ADD attempts :one',
+            ConditionExpression='#status = :queued OR (#status = :running AND lease_expires_at < :epoch)',
+            ExpressionAttributeNames={'#status': 'status'},
+            ExpressionAttributeValues={':running': 'running', ':queued': 'queued', ':now': _now(),
+                                       ':lease': now + int(lease_seconds), ':epoch': now, ':one': 1}
+        )
+        return True
+    except jobs_table.meta.client.exceptions.ConditionalCheckFailedException:
+        return False
+
+
+def set_stage(job_id, stage):
+    print(f"Video caption job {job_id}: {stage}")
+    jobs_table.update_item(
+        Key={'job_id': job_id},
+        UpdateExpression='SET #stage = :stage, updated_at = :now',
+        ExpressionAttributeNames={'#stage': 'stage'},
+        ExpressionAttributeValues={':stage': stage, ':now': _now()}
+    )
+
+
+def finish_job(job_id, result=None, error=None):
+    """Records the result body on success, or the error message on failure."""
+    if error:
+        status, field, value = 'failed', 'error', str(error)
+    else:
+        # Stored as JSON, like the caption cache, so captions round-trip without Decimal conversion
+        status, field, value = 'succeeded', 'result', json.dumps(result)
+    print(f"Video caption job {job_id}: {status}")
+    jobs_table.update_item(
+        Key={'job_id': job_id},
+        UpdateExpression='SET #status = :status, #stage = :stage, updated_at = :now, #field = :value',
+        ExpressionAttributeNames={'#status': 'status', '#stage': 'stage', '#field': field},
+        ExpressionAttributeValues={':status': status, ':stage': 'done', ':now': _now(), ':value': value}
+    )
+
+
+def _fail_stale_job(item):
+    """Settles a running job whose worker is gone as failed. Returns the job item as it now stands."""
+    job_id = item['job_id']
+    print(f"Video caption job {job_id}: lease expired at {item['lease_expires_at']}, marking failed")
+    try:
+        # Conditional on the lease we saw, so a worker that claimed the job meanwhile keeps it
+        return jobs_table.update_item(
+            Key={'job_id': job_id},
+            UpdateExpression='SET #status = :failed, #stage = :stage, updated_at = :now, #error = :error',
+            ConditionExpression='#status = :running AND lease_expires_at = :lease',
+            ExpressionAttributeNames={'#status': 'status', '#stage': 'stage', '#error': 'error'},
+            ExpressionAttributeValues={':failed': 'failed', ':stage': 'done', ':now': _now(),
+                                       ':error': 'The caption worker stopped before finishing (timeout or out of '
+                                                 'memory).', ':running': 'running',
+                                       ':lease': item['lease_expires_at']},
+            ReturnValues='ALL_NEW'
+        )['Attributes']
+    except jobs_table.meta.client.exceptions.ConditionalCheckFailedException:
+        return jobs_table.get_item(Key={'job_id': job_id}, ConsistentRead=True).get('Item')
+
+
+def get_job(job_id):
+    """The public view of a job, or None if it doesn't exist (or has expired)."""
+    item = jobs_table.get_item(Key={'job_id': job_id}, ConsistentRead=True).get('Item')
+    # DynamoDB deletes expired items lazily, so check the TTL ourselves
+    if not item or int(item.get('expires_at', 0)) <= time.time():
+        return None
+    if item['status'] == 'running' and 'lease_expires_at' in item and \
+            int(item['lease_expires_at']) + VIDEO_CAPTION_JOB_STALE_GRACE_SECONDS < time.time():
+        item = _fail_stale_job(item)
+    job = {key: item[key] for key in ('job_id', 'status', 'stage', 'created_at', 'updated_at') if key in item}
+    if 'result' in item:
+        job['result'] = json.loads(item['result'])
+    if 'error' in item:
+        job['error'] = item['error']
+    return job
@@ -0,0 +1,96 @@
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+from keyframes import extract_segment_keyframes
+from prompt_templates import render_prompt, generation_config_for
+
+# Segmented video captioning: window length, frames sampled per window, and how many windows are described at once
+VIDEO_SEGMENT_SECONDS = float(os.environ.get("VIDEO_SEGMENT_SECONDS", 30))
+VIDEO_SEGMENT_FRAMES = int(os.environ.get("VIDEO_SEGMENT_FRAMES", 4))
+VIDEO_SEGMENT_CONCURRENCY = int(os.environ.get("VIDEO_SEGMENT_CONCURRENCY", 4))
+# Bounds for the per-request segment_seconds / segment_concurrency, and a cap on windows per video (longer videos
+# get longer windows), so one request can't fan out into thousands of model calls or threads
+VIDEO_SEGMENT_MIN_SECONDS = float(os.environ.get("VIDEO_SEGMENT_MIN_SECONDS", 5))
+VIDEO_SEGMENT_MAX_SECONDS = float(os.environ.get("VIDEO_SEGMENT_MAX_SECONDS", 300))
+VIDEO_SEGMENT_MAX_CONCURRENCY = int(os.environ.get("VIDEO_SEGMENT_MAX_CONCURRENCY", 16))
+VIDEO_MAX_SEGMENTS = int(os.environ.get("VIDEO_MAX_SEGMENTS", 60))
+# Deadline for each segment description; they are small image prompts, so much shorter than a full-video call
+VIDEO_SEGMENT_CALL_DEADLINE_SECONDS = float(os.environ.get("VIDEO_SEGMENT_CALL_DEADLINE_SECONDS", 30))
+
+
+def segment_options(request):
+    """
+    (segment_seconds, segment_concurrency) for a caption request, clamped to the allowed bounds.
+    Raises ValueError if either is given but isn't a number.
+    """
+    try:
+        segment_seconds = float(request.get('segment_seconds', VIDEO_SEGMENT_SECONDS))
+        segment_concurrency = int(request.get('segment_concurrency', VIDEO_SEGMENT_CONCURRENCY))
+    except (TypeError, ValueError):
+        raise ValueError('segment_seconds and segment_concurrency must be numbers.')
+    if not math.isfinite(segment_seconds):
+        raise ValueError('segment_seconds must be a finite number.')
+    return (min(max(segment_seconds, VIDEO_SEGMENT_MIN_SECONDS), VIDEO_SEGMENT_MAX_SECONDS),
+            min(max(segment_concurrency, 1), VIDEO_SEGMENT_MAX_CONCURRENCY))
+
+
+def summarize_segment(router, duration, segment):
+    """Describes one (start, end, frames) window; returns the description text."""
+    start, end, frames = segment
+    prompt = render_prompt(
+        'video.segment_summary',
+        frame_count=len(frames),
+        start=start,
+        end=end,
+        duration=duration,
+        timestamps=', '.join(str(timestamp) for timestamp, _ in frames)
+    )
+    prompt_parts = [prompt.text]
+    prompt_parts.extend({'mime_type': 'image/jpeg', 'data': frame_bytes} for _, frame_bytes in frames)
+    text, _ = router.generate_text(prompt_parts, generation_config=generation_config_for(prompt),
+                                   deadline_seconds=VIDEO_SEGMENT_CALL_DEADLINE_SECONDS)
+    return text.strip()
+
+
+def summarize_segments(video_path, router, segment_seconds=VIDEO_SEGMENT_SECONDS,
+                       frames_per_segment=VIDEO_SEGMENT_FRAMES, concurrency=VIDEO_SEGMENT_CONCURRENCY):
+    """
+    Splits a local video into windows and describes up to `concurrency` of them at a time.
+    Returns (duration_seconds, [{'start', 'end', 'summary'}]) in playback order. A window whose call fails is
+    left out; if every window fails the last error is raised.
+    """
+    duration, segments = extract_segment_keyframes(video_path, segment_seconds, frames_per_segment,
+                                                   max_segments=VIDEO_MAX_SEGMENTS)
+    if not segments:
+        raise ValueError("Video has no readable frames.")
+    print(f"Describing {len(segments)} segments of {segments[0][1] - segments[0][0]}s ({duration}s video), "
+          f"{concurrency} at a time")
+
+    def run_one(segment):
+        try:
+            return summarize_segment(router, duration, segment), None
+        except Exception as e:
+            print(f"Segment {segment[0]}-{segment[1]}s failed: {e}")
+            return None, e
+
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(segments)))) as executor:
+        outcomes = list(executor.map(run_one, segments))
+
+    summaries = [{'start': start, 'end': end, 'summary': summary}
+                 for (start, end, _), (summary, _) in zip(segments, outcomes) if summary]
+    if not summaries:
+        errors = [error for _, error in outcomes if error]
+        if errors:
+            raise errors[-1]
+        raise ValueError("The model returned an empty description for every segment.")
+    return duration, summaries
+
+
+def segment_merge_prompt(duration, summaries):
+    """The text that stands in for the video in the final caption prompt."""
+    return render_prompt(
+        'video.segment_merge',
+        segment_count=len(summaries),
+        duration=duration,
+        segment_summaries='\n'.join(f"[{s['start']}s-{s['end']}s] {s['summary']}" for s in summaries)
+    )